@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatSession, ChatMessage, Destination, EcoTip, LocalArtisan
+from .models import ChatSession, ChatMessage, Destination, EcoTip, LocalArtisan, UserProfile
 
 @admin.register(ChatSession)
 class ChatSessionAdmin(admin.ModelAdmin):
@@ -28,4 +28,9 @@ class EcoTipAdmin(admin.ModelAdmin):
 class LocalArtisanAdmin(admin.ModelAdmin):
     list_display = ['name', 'craft_type', 'location']
     list_filter = ['craft_type']
-    search_fields = ['name', 'craft_type', 'location']
\ No newline at end of file
+    search_fields = ['name', 'craft_type', 'location']
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    list_display = ['user_id', 'updated_at']
+    search_fields = ['user_id']
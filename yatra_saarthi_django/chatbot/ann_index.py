@@ -0,0 +1,399 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_store import NumpyVectorStore, filter_positions
+
+INDEX_META_FILE = 'index.json'
+TOMBSTONES_FILE = 'tombstones.json'
+PARTITIONS_FILE = 'partitions.json'
+
+
+class StringTableWriter:
+    """Appends strings to a UTF-8 blob with an offsets array, for memory-mapped lookup"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._handle = open(self.path.with_suffix('.bin'), 'wb')
+        self._offsets = [0]
+
+    def append(self, value: str):
+        data = value.encode('utf-8')
+        self._handle.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._handle.close()
+        np.save(self.path.with_suffix('.offsets.npy'), np.asarray(self._offsets, dtype=np.int64))
+
+
+class StringTable:
+    """Read side of StringTableWriter; strings are decoded only when looked up"""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        self.offsets = np.load(path.with_suffix('.offsets.npy'), mmap_mode='r')
+        size = os.path.getsize(path.with_suffix('.bin'))
+        self.blob = np.memmap(path.with_suffix('.bin'), dtype=np.uint8, mode='r') if size else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        return bytes(self.blob[self.offsets[position]:self.offsets[position + 1]]).decode('utf-8')
+
+
+def spherical_kmeans(sample: np.ndarray, nlist: int, iterations: int, seed: int = 0) -> np.ndarray:
+    """Centroids (unit length) of normalized vectors under cosine similarity"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1, norms)
+    return centroids.astype(np.float32)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid for every vector, computed in chunks"""
+    result = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        result[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return result
+
+
+def build_ivf_index(path, vectors: np.ndarray, nlist: Optional[int] = None, iterations: int = 20,
+                    sample_size: int = 100_000, chunk_size: int = 65536, seed: int = 0,
+                    refine_dtype: Optional[str] = 'float16') -> Dict[str, Any]:
+    """Build an IVF index with int8 codes from normalized vectors (an array or a memmap)
+
+    Vectors are clustered into nlist inverted lists by spherical k-means on
+    a sample, then stored grouped by list as int8 codes with one scale per
+    dimension. Unless refine_dtype is None, the vectors are also stored in
+    that dtype, in the same order, for re-ranking the int8 candidates.
+    Only the sample and one chunk are held in memory at a time. The caller
+    writes the ids/documents/metadatas string tables alongside, in the
+    original vector order.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    count, dim = vectors.shape
+    nlist = nlist or max(1, min(count, int(4 * np.sqrt(count))))
+    rng = np.random.default_rng(seed)
+
+    sample_rows = np.sort(rng.choice(count, min(count, max(sample_size, nlist)), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = spherical_kmeans(sample, nlist, iterations, seed)
+    # One scale per dimension, from the sample's largest magnitude
+    scales = (np.abs(sample).max(axis=0) / 127).astype(np.float32)
+    scales[scales == 0] = 1.0
+
+    assignment = assign(vectors, centroids, chunk_size)
+    order = np.argsort(assignment, kind='stable').astype(np.int64)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+    codes = np.lib.format.open_memmap(path / 'codes.npy', mode='w+', dtype=np.int8, shape=(count, dim))
+    refine = None
+    if refine_dtype is not None:
+        refine = np.lib.format.open_memmap(path / 'refine.npy', mode='w+', dtype=np.dtype(refine_dtype), shape=(count, dim))
+    for start in range(0, count, chunk_size):
+        rows = order[start:start + chunk_size]
+        chunk = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+        # Reading sorted rows is sequential; put them back in list order
+        chunk = chunk[np.argsort(np.argsort(rows))]
+        codes[start:start + len(rows)] = np.clip(np.rint(chunk / scales), -127, 127).astype(np.int8)
+        if refine is not None:
+            refine[start:start + len(rows)] = chunk
+    codes.flush()
+    del codes
+    if refine is not None:
+        refine.flush()
+        del refine
+
+    np.save(path / 'centroids.npy', centroids)
+    np.save(path / 'scales.npy', scales)
+    np.save(path / 'offsets.npy', offsets)
+    np.save(path / 'order.npy', order)
+    # Code position of every original row, for searches restricted to a partition
+    positions = np.empty(count, dtype=np.int64)
+    positions[order] = np.arange(count, dtype=np.int64)
+    np.save(path / 'positions.npy', positions)
+    meta = {"count": int(count), "dim": int(dim), "nlist": int(nlist), "codec": "int8",
+            "refine_dtype": np.dtype(refine_dtype).name if refine_dtype is not None else None}
+    with open(path / INDEX_META_FILE, 'w', encoding='utf-8') as handle:
+        json.dump(meta, handle)
+    return meta
+
+
+class IVFIndex:
+    """Memory-mapped IVF index built by build_ivf_index
+
+    A query scores the centroids, then only the nprobe closest inverted
+    lists, against int8 codes. nprobe trades recall for latency: with
+    nprobe == nlist the search is exhaustive over the quantized vectors.
+    search_rows scans only the given rows instead, for filtered queries.
+
+    The int8 scores cap recall below 1 however many lists are probed. If
+    the index was built with refine vectors, the top ``k * refine``
+    candidates are re-scored against them, read from the memory-mapped
+    file, and the scores returned are exact for that dtype. refine <= 1
+    turns this off.
+    """
+
+    def __init__(self, path, nprobe: int = 16, refine: int = 4):
+        path = Path(path)
+        with open(path / INDEX_META_FILE, encoding='utf-8') as handle:
+            self.meta = json.load(handle)
+        self.nprobe = nprobe
+        self.refine = refine
+        self.centroids = np.load(path / 'centroids.npy')
+        self.scales = np.load(path / 'scales.npy')
+        self.offsets = np.load(path / 'offsets.npy')
+        self.order = np.load(path / 'order.npy', mmap_mode='r')
+        self.codes = np.load(path / 'codes.npy', mmap_mode='r')
+        self.positions = np.load(path / 'positions.npy', mmap_mode='r')
+        self.refine_vectors = None
+        if self.meta.get('refine_dtype'):
+            self.refine_vectors = np.load(path / 'refine.npy', mmap_mode='r')
+
+    def __len__(self):
+        return self.meta['count']
+
+    def bytes_per_vector(self) -> float:
+        """Size of every array the index loads, mapped or not, divided by the number of vectors"""
+        total = (self.codes.nbytes + self.order.nbytes + self.positions.nbytes + self.centroids.nbytes
+                 + self.offsets.nbytes + self.scales.nbytes)
+        if self.refine_vectors is not None:
+            total += self.refine_vectors.nbytes
+        return total / max(1, len(self))
+
+    def _top(self, query: np.ndarray, positions: np.ndarray, scores: np.ndarray, k: int,
+             refine: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices into positions of the top k by score, and their scores, re-ranked if refine applies"""
+        refine = self.refine if refine is None else refine
+        candidates = None
+        if self.refine_vectors is not None and refine > 1:
+            shortlist = min(k * refine, len(scores))
+            candidates = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            # Read the candidate vectors in file order
+            candidates = candidates[np.argsort(positions[candidates])]
+            scores = np.asarray(self.refine_vectors[positions[candidates]], dtype=np.float32) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (top if candidates is None else candidates[top]), scores[top]
+
+    def search(self, query: Sequence[float], k: int, nprobe: Optional[int] = None,
+               refine: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Original row numbers and approximate cosine scores of the top k vectors"""
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        scaled_query = query * self.scales
+        positions, scores = [], []
+        for inverted_list in probe:
+            start, end = self.offsets[inverted_list], self.offsets[inverted_list + 1]
+            if start == end:
+                continue
+            scores.append(self.codes[start:end] @ scaled_query)
+            positions.append(np.arange(start, end))
+        if not scores:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        positions = np.concatenate(positions)
+        top, scores = self._top(query, positions, np.concatenate(scores), k, refine)
+        return np.asarray(self.order[positions[top]]), scores
+
+    def search_rows(self, query: Sequence[float], k: int, rows: np.ndarray,
+                    refine: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Like search, but exhaustive over the given original rows only"""
+        if not len(rows):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        positions = np.asarray(self.positions[rows])
+        # Read the codes in file order
+        ordering = np.argsort(positions)
+        rows, positions = np.asarray(rows)[ordering], positions[ordering]
+        scores = self.codes[positions] @ (query * self.scales)
+        top, scores = self._top(query, positions, scores, k, refine)
+        return rows[top], scores
+
+
+class AnnVectorStore:
+    """Offline-built IVF index plus a small exact store for live changes
+
+    The bulk corpus is built offline (build_ann_index) and only read by the
+    workers. Documents synced from the database, or upserted later, go to
+    an exact NumpyVectorStore that shadows the base index; deleted base
+    documents are masked by tombstones. Queries merge both by score.
+    Filtered queries scan only the base rows in the matching partitions,
+    written by write_string_tables for the indexed metadata fields.
+    Exposes the same collection API as the other stores.
+    """
+
+    def __init__(self, path, delta_path, nprobe: int = 16, dtype: str = 'float32', retire_seconds: float = 300,
+                 refine: int = 4):
+        self.path = Path(path)
+        self.delta = NumpyVectorStore(delta_path, dtype=dtype, retire_seconds=retire_seconds)
+        self.index = None
+        if (self.path / INDEX_META_FILE).exists():
+            self.index = IVFIndex(self.path, nprobe, refine)
+            self.ids = StringTable(self.path / 'ids')
+            self.documents = StringTable(self.path / 'documents')
+            self.metadatas = StringTable(self.path / 'metadatas')
+            self.partitions = {}
+            if (self.path / PARTITIONS_FILE).exists():
+                with open(self.path / PARTITIONS_FILE, encoding='utf-8') as handle:
+                    self.partitions = json.load(handle)
+                self.partition_rows = np.load(self.path / 'partition_rows.npy', mmap_mode='r')
+        self._tombstones = set()
+        self._tombstones_mtime = None
+
+    @property
+    def tombstones_path(self) -> Path:
+        return self.delta.path / TOMBSTONES_FILE
+
+    def _load_tombstones(self):
+        try:
+            stat = os.stat(self.tombstones_path)
+        except FileNotFoundError:
+            return self._tombstones
+        if (stat.st_ino, stat.st_mtime_ns) != self._tombstones_mtime:
+            with open(self.tombstones_path, encoding='utf-8') as handle:
+                self._tombstones = set(json.load(handle))
+            self._tombstones_mtime = (stat.st_ino, stat.st_mtime_ns)
+        return self._tombstones
+
+    def bytes_per_vector(self) -> float:
+        """Per-row cost of the base corpus: the index plus the partition rows and string table offsets
+
+        The string blobs are left out, as they hold the documents themselves.
+        """
+        if self.index is None:
+            return 0.0
+        total = sum(table.offsets.nbytes for table in (self.ids, self.documents, self.metadatas))
+        if self.partitions:
+            total += self.partition_rows.nbytes
+        return self.index.bytes_per_vector() + total / max(1, len(self.index))
+
+    @property
+    def lists_all_documents(self) -> bool:
+        """Whether get() returns the whole corpus; the offline-built base is not enumerated"""
+        return self.index is None
+
+    def count(self) -> int:
+        return (len(self.index) if self.index else 0) + self.delta.count()
+
+    def _lookup(self, field: str, value: Any) -> np.ndarray:
+        """Base rows whose metadata has field == value"""
+        if field not in self.partitions:
+            raise ValueError(f"Metadata field {field!r} is not indexed in {self.path}")
+        span = self.partitions[field].get(str(value))
+        if span is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.partition_rows[span[0]:span[1]])
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ('metadatas', 'documents')) -> Dict[str, Any]:
+        """Documents of the live store; the offline-built corpus is not enumerated"""
+        return self.delta.get(ids=ids, include=include)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.delta.upsert(ids, documents, metadatas, embeddings)
+
+    def delete(self, ids: Sequence[str]):
+        self.delta.delete(ids)
+        if self.index is None:
+            return
+        # Under the delta store's lock so that concurrent deletes from other
+        # processes are merged, not overwritten
+        with self.delta.write_lock():
+            tombstones = self._load_tombstones() | set(ids)
+            tmp_path = self.tombstones_path.with_suffix(f".{uuid.uuid4().hex[:12]}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump(sorted(tombstones), handle)
+            os.replace(tmp_path, self.tombstones_path)
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              include: Sequence[str] = ('documents', 'metadatas', 'distances'),
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        # One version of the live store, so its results and the ids it shadows agree
+        delta = self.delta.snapshot()
+        live = delta.query(query_embeddings, n_results, where=where)
+        if self.index is None:
+            return live
+
+        tombstones = self._load_tombstones()
+        rows = filter_positions(where, self._lookup) if where else None
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for row, query in enumerate(query_embeddings):
+            candidates = list(zip(live['distances'][row], live['ids'][row], live['documents'][row], live['metadatas'][row]))
+            # Fetch extra rows so that masked ones do not leave the result short
+            limit = n_results + len(tombstones) + len(candidates)
+            if rows is None:
+                hits, scores = self.index.search(query, limit)
+            else:
+                hits, scores = self.index.search_rows(query, limit, rows)
+            for position, score in zip(hits.tolist(), scores.tolist()):
+                doc_id = self.ids[position]
+                if doc_id in tombstones or doc_id in delta.positions:
+                    continue
+                candidates.append((1 - score, doc_id, self.documents[position], json.loads(self.metadatas[position])))
+            candidates.sort(key=lambda candidate: candidate[0])
+            candidates = candidates[:n_results]
+            result['distances'].append([candidate[0] for candidate in candidates])
+            result['ids'].append([candidate[1] for candidate in candidates])
+            result['documents'].append([candidate[2] for candidate in candidates])
+            result['metadatas'].append([candidate[3] for candidate in candidates])
+        return result
+
+
+def write_string_tables(path, records: Iterable[Tuple[str, str, Dict[str, Any]]],
+                        filter_fields: Sequence[str] = ()) -> int:
+    """Write the ids, documents and metadatas tables of an index in vector order
+
+    For every field in filter_fields the rows holding each value are
+    stored as one partition, so filtered queries need not decode metadata.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    writers = [StringTableWriter(path / name) for name in ('ids', 'documents', 'metadatas')]
+    groups = {field: {} for field in filter_fields}
+    count = 0
+    for doc_id, document, metadata in records:
+        metadata = metadata or {}
+        writers[0].append(doc_id)
+        writers[1].append(document)
+        writers[2].append(json.dumps(metadata, ensure_ascii=False))
+        for field, values in groups.items():
+            if metadata.get(field) is not None:
+                values.setdefault(str(metadata[field]), []).append(count)
+        count += 1
+    for writer in writers:
+        writer.close()
+
+    if filter_fields:
+        # One array of rows, sliced per partition: {field: {value: [start, end]}}
+        partitions, rows = {}, []
+        for field, values in groups.items():
+            partitions[field] = {}
+            for value, value_rows in values.items():
+                partitions[field][value] = [len(rows), len(rows) + len(value_rows)]
+                rows.extend(value_rows)
+        np.save(path / 'partition_rows.npy', np.asarray(rows, dtype=np.int64))
+        with open(path / PARTITIONS_FILE, 'w', encoding='utf-8') as handle:
+            json.dump(partitions, handle, ensure_ascii=False)
+    return count
@@ -1,6 +1,43 @@
+import os
+import sys
+from pathlib import Path
+
 from django.apps import AppConfig
+from django.conf import settings
+
+# Programs whose processes serve HTTP traffic
+SERVER_PROGRAMS = {'gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi'}
+
+
+def _is_serving_process():
+    """Whether this process serves HTTP traffic rather than running a command, a worker or a script
+
+    Deployments opt in with YATRA_SERVING=1 in the server's environment;
+    otherwise only runserver and the servers in SERVER_PROGRAMS count.
+    """
+    if os.environ.get('YATRA_SERVING') == '1':
+        return True
+    argv = sys.argv
+    if not argv or not argv[0]:
+        return False
+    program = Path(argv[0])
+    # python -m gunicorn runs gunicorn/__main__.py
+    name = program.parent.name if program.name == '__main__.py' else program.name
+    if name in SERVER_PROGRAMS:
+        return True
+    if len(argv) > 1 and argv[1] == 'runserver':
+        # Only the autoreloader's child process serves requests
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+    return False
 
 
 class ChatbotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'chatbot'
\ No newline at end of file
+    name = 'chatbot'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'LLM_WARMUP_ON_STARTUP', False) and _is_serving_process():
+            from .llm_service import llm_service
+            llm_service.start_warmup()
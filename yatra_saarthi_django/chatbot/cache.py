@@ -0,0 +1,167 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for use as a cache key: case, punctuation and spacing are ignored
+
+    Only Unicode punctuation (categories P*) is removed, so combining marks
+    such as Devanagari vowel signs keep distinct words distinct.
+    """
+    text = unicodedata.normalize('NFC', text).casefold()
+    text = "".join(" " if unicodedata.category(char).startswith('P') else char for char in text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class LRUCache:
+    """Thread-safe, bounded in-process LRU cache with an optional TTL
+
+    Keeps hit, miss, eviction and expiration counters so cache
+    effectiveness can be reported by the metrics endpoint.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+KB_VERSION_KEY = 'yatra:kb_version'
+OFFLINE_DATA_VERSION_KEY = 'yatra:offline_data_version'
+
+
+def get_version(key: str) -> int:
+    """Current value of a version counter shared by all workers through the Django cache"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(key: str) -> int:
+    """Increment a shared version counter"""
+    get_version(key)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was evicted between the read and the increment
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def get_kb_version() -> int:
+    """Current knowledge base version"""
+    return get_version(KB_VERSION_KEY)
+
+
+def bump_kb_version() -> int:
+    """Mark the knowledge base as changed, invalidating every cached chat response"""
+    return bump_version(KB_VERSION_KEY)
+
+
+class ResponseCache:
+    """Chat responses shared across workers through the Django cache
+
+    Entries are keyed on the normalized message, the resolved role, the
+    detected language and the knowledge base version, so a knowledge base
+    change makes every earlier entry unreachable.
+    """
+
+    def __init__(self, timeout: Optional[int] = None):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, message: str, role: str, language: str) -> str:
+        digest = hashlib.sha1(normalize_text(message).encode('utf-8')).hexdigest()
+        return f"yatra:chat:{get_kb_version()}:{role}:{language}:{digest}"
+
+    def get(self, message: str, role: str, language: str) -> Optional[Dict[str, Any]]:
+        reply = cache.get(self.make_key(message, role, language))
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reply
+
+    def set(self, message: str, role: str, language: str, reply: Dict[str, Any]):
+        timeout = self.timeout if self.timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 600)
+        cache.set(self.make_key(message, role, language), reply, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "kb_version": get_kb_version(),
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,30 @@
+from django.conf import settings
+
+# Models only ever read by the API (Destination, EcoTip, LocalArtisan)
+READ_ONLY_MODELS = {'destination', 'ecotip', 'localartisan'}
+READ_ALIAS = 'read'
+
+
+class ReadOnlyDataRouter:
+    """Route reads of the read-only reference models to the 'read' alias
+
+    With WAL enabled these reads use their own connection and never wait
+    behind chat writes on the default connection. Writes, and every other
+    model, stay on 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'chatbot' and model._meta.model_name in READ_ONLY_MODELS \
+                and READ_ALIAS in settings.DATABASES:
+            return READ_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same database file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_ALIAS
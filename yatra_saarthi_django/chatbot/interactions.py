@@ -0,0 +1,183 @@
+import time
+from array import array
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import LRUCache
+from .models import InteractionEvent, UserInterest
+from .persistence import write_behind_queue
+
+# Positions of the per-user rolling counters; append only, never reorder,
+# or counters folded earlier will be read under the wrong names
+INTEREST_DIMENSIONS = [
+    'role:cultural_expert', 'role:spiritual_guide', 'role:eco_advocate', 'role:travel_planner',
+    'role:travel_companion',
+    'destination:badrinath', 'destination:kedarnath', 'destination:gangotri', 'destination:yamunotri',
+    'sentiment:stressed', 'sentiment:anxious', 'sentiment:excited', 'sentiment:peaceful', 'sentiment:neutral',
+]
+DIMENSION_INDEX = {name: position for position, name in enumerate(INTEREST_DIMENSIONS)}
+
+# Recommendation interests suggested by the roles a user's questions resolve to
+ROLE_INTERESTS = {
+    'role:spiritual_guide': 'spiritual',
+    'role:cultural_expert': 'cultural',
+    'role:eco_advocate': 'nature',
+    'role:travel_planner': 'adventure',
+}
+
+
+def empty_counters() -> array:
+    return array('f', [0.0] * len(INTEREST_DIMENSIONS))
+
+
+def load_counters(data: bytes) -> array:
+    """Counters from their stored bytes, padded when dimensions were added since"""
+    counters = array('f')
+    counters.frombytes(data)
+    counters.extend([0.0] * (len(INTEREST_DIMENSIONS) - len(counters)))
+    return counters
+
+
+class InteractionLog:
+    """Append-only log of chat turns folded into per-user interest counters
+
+    Each turn is recorded as a small InteractionEvent row through the
+    write-behind queue. ``fold`` (run periodically by the
+    fold_interactions command) adds new events to every user's rolling
+    counters, a fixed-size float array that decays with a half-life of
+    INTEREST_HALF_LIFE_DAYS. Reading a user's interests is then a single
+    cached lookup, independent of how much history the user has.
+    """
+
+    def __init__(self):
+        self.local_cache = LRUCache(
+            maxsize=getattr(settings, 'PROFILE_LOCAL_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'PROFILE_LOCAL_CACHE_TTL', 30),
+        )
+
+    @staticmethod
+    def cache_key(user_id: str) -> str:
+        return f"yatra:interest:{user_id}"
+
+    def record(self, user_id: str, role: str, destinations: Iterable[str], sentiment: str):
+        event = InteractionEvent(
+            user_id=user_id,
+            role=role,
+            destinations=','.join(destinations),
+            sentiment=sentiment,
+        )
+        # Best effort: when the queue is full the event is dropped (and counted
+        # as an overflow) rather than written inline, which async callers cannot do
+        write_behind_queue.put(event)
+
+    def counters(self, user_id: str) -> array:
+        counters = self.local_cache.get(user_id)
+        if counters is not None:
+            return counters
+
+        key = self.cache_key(user_id)
+        data = cache.get(key)
+        if data is None:
+            data = UserInterest.objects.filter(user_id=user_id).values_list('counters', flat=True).first()
+            data = bytes(data) if data is not None else b''
+            cache.set(key, data, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 3600))
+        counters = load_counters(data)
+        self.local_cache.set(user_id, counters)
+        return counters
+
+    def counters_many(self, user_ids: List[str]) -> Dict[str, array]:
+        """Counters of many users with one shared cache round-trip and one query for the misses"""
+        result = {}
+        for user_id in user_ids:
+            counters = self.local_cache.get(user_id)
+            if counters is not None:
+                result[user_id] = counters
+
+        missing = [user_id for user_id in user_ids if user_id not in result]
+        if missing:
+            shared = cache.get_many([self.cache_key(user_id) for user_id in missing])
+            stored = {}
+            for user_id in missing:
+                data = shared.get(self.cache_key(user_id))
+                if data is None:
+                    stored[user_id] = b''
+                else:
+                    result[user_id] = load_counters(data)
+            if stored:
+                for user_id, data in UserInterest.objects.filter(user_id__in=list(stored)).values_list('user_id', 'counters'):
+                    stored[user_id] = bytes(data)
+                cache.set_many({self.cache_key(user_id): data for user_id, data in stored.items()},
+                               timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 3600))
+                result.update((user_id, load_counters(data)) for user_id, data in stored.items())
+            for user_id in missing:
+                self.local_cache.set(user_id, result[user_id])
+        return result
+
+    def top_interests(self, user_id: str) -> List[str]:
+        """Recommendation interests the user asked about, strongest first"""
+        return self._rank(self.counters(user_id))
+
+    def top_interests_many(self, user_ids: List[str]) -> Dict[str, List[str]]:
+        return {user_id: self._rank(counters) for user_id, counters in self.counters_many(user_ids).items()}
+
+    @staticmethod
+    def _rank(counters: array) -> List[str]:
+        """Interests with a positive counter, strongest first"""
+        scored = [(counters[DIMENSION_INDEX[dimension]], interest) for dimension, interest in ROLE_INTERESTS.items()]
+        return [interest for score, interest in sorted(scored, reverse=True) if score > 0]
+
+    def fold(self, batch_size: int = 5000) -> Dict[str, Any]:
+        """Add every event logged since the last fold to the users' counters"""
+        started = time.perf_counter()
+        half_life = getattr(settings, 'INTEREST_HALF_LIFE_DAYS', 30) * 86400
+        watermark = UserInterest.objects.aggregate(last=Max('last_event_id'))['last'] or 0
+        high = InteractionEvent.objects.filter(id__gt=watermark).aggregate(last=Max('id'))['last']
+        if high is None:
+            return {"events": 0, "users": 0, "seconds": 0.0}
+
+        deltas = {}
+        events = InteractionEvent.objects.filter(id__gt=watermark, id__lte=high).values_list(
+            'user_id', 'role', 'destinations', 'sentiment'
+        )
+        event_count = 0
+        for user_id, role, destinations, sentiment in events.iterator(chunk_size=batch_size):
+            event_count += 1
+            delta = deltas.get(user_id)
+            if delta is None:
+                delta = deltas[user_id] = empty_counters()
+            names = [f"role:{role}", f"sentiment:{sentiment}"]
+            names += [f"destination:{name}" for name in destinations.split(',') if name]
+            for name in names:
+                position = DIMENSION_INDEX.get(name)
+                if position is not None:
+                    delta[position] += 1
+
+        now = timezone.now()
+        with transaction.atomic():
+            existing = UserInterest.objects.in_bulk(list(deltas), field_name='user_id')
+            created = []
+            for user_id, delta in deltas.items():
+                interest = existing.get(user_id)
+                if interest is None:
+                    created.append(UserInterest(user_id=user_id, counters=delta.tobytes(), last_event_id=high))
+                    continue
+                counters = load_counters(bytes(interest.counters))
+                decay = 0.5 ** ((now - interest.updated_at).total_seconds() / half_life)
+                interest.counters = array('f', (value * decay + added for value, added in zip(counters, delta))).tobytes()
+                interest.last_event_id = high
+                interest.updated_at = now
+            UserInterest.objects.bulk_create(created)
+            UserInterest.objects.bulk_update(existing.values(), ['counters', 'last_event_id', 'updated_at'])
+
+        cache.delete_many([self.cache_key(user_id) for user_id in deltas])
+        for user_id in deltas:
+            self.local_cache.delete(user_id)
+        return {"events": event_count, "users": len(deltas), "seconds": round(time.perf_counter() - started, 3)}
+
+
+interaction_log = InteractionLog()
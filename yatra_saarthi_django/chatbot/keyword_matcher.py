@@ -0,0 +1,132 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+# Every keyword table used for sentiment, role routing and intent matching.
+# Keywords match whole words only, so inflections are listed explicitly.
+KEYWORD_TABLES = {
+    # SentimentAnalysisService, in priority order
+    'sentiment:stressed': ['stress', 'stressed', 'stressful', 'worried', 'anxious', 'nervous', 'overwhelmed', 'tired'],
+    'sentiment:anxious': ['scared', 'fear', 'afraid', 'panic', 'worry', 'uncertain'],
+    'sentiment:excited': ['excited', 'happy', 'thrilled', 'amazing', 'wonderful', 'great'],
+    'sentiment:peaceful': ['calm', 'peaceful', 'relaxed', 'serene', 'tranquil'],
+
+    # PersonalizationService.determine_role, in priority order
+    'role:cultural_expert': ['culture', 'cultural', 'history', 'historical', 'tradition', 'traditions',
+                             'traditional', 'mythology', 'mythological'],
+    'role:spiritual_guide': ['spiritual', 'spirituality', 'meditation', 'meditate', 'prayer', 'prayers', 'pray', 'divine'],
+    'role:eco_advocate': ['eco', 'ecotourism', 'environment', 'environmental', 'sustainable', 'sustainability', 'green'],
+    'role:travel_planner': ['plan', 'plans', 'planning', 'itinerary', 'book', 'booking', 'travel', 'travelling',
+                            'traveling', 'route', 'routes'],
+
+    # ChatbotService._fallback_response and OfflineService.get_offline_response
+    'intent:weather': ['weather'],
+    'intent:eco_tips': ['eco', 'ecotourism', 'environment', 'sustainable', 'green', 'tip', 'tips'],
+    'intent:meditation': ['meditation', 'meditate', 'stress', 'stressed', 'relax', 'relaxed', 'relaxing', 'relaxation'],
+    'intent:yoga': ['yoga'],
+    'intent:homestay': ['homestay', 'homestays', 'accommodation', 'accommodations'],
+    'intent:travel': ['plan', 'plans', 'planning', 'itinerary', 'route', 'routes', 'travel', 'travelling', 'traveling'],
+    'intent:emergency': ['emergency'],
+
+    # Topics of the LLMService role responses
+    'topic:history': ['history', 'historical'],
+    'topic:mythology': ['mythology', 'mythological'],
+    'topic:traditions': ['tradition', 'traditions', 'traditional'],
+    'topic:meditation': ['meditation', 'meditate', 'peace', 'spiritual', 'divine'],
+    'topic:prayer': ['prayer', 'prayers', 'pray', 'worship', 'blessing', 'blessings'],
+    'topic:itinerary': ['itinerary', 'plan', 'plans', 'planning'],
+    'topic:accommodation': ['accommodation', 'accommodations', 'stay', 'staying'],
+
+    # Char Dham destinations
+    'destination:badrinath': ['badrinath'],
+    'destination:kedarnath': ['kedarnath'],
+    'destination:gangotri': ['gangotri'],
+    'destination:yamunotri': ['yamunotri'],
+}
+
+
+class KeywordMatches:
+    """Categories and keywords found in one message"""
+
+    def __init__(self, hits: Dict[str, List[str]]):
+        self.hits = hits
+
+    def has(self, category: str) -> bool:
+        return category in self.hits
+
+    def any(self, categories: Iterable[str]) -> bool:
+        return any(category in self.hits for category in categories)
+
+    def first(self, categories: Iterable[str]) -> Optional[str]:
+        """The first of the given categories (in priority order) that matched"""
+        return next((category for category in categories if category in self.hits), None)
+
+    def names(self, prefix: str) -> List[str]:
+        """Names of the matched categories with a prefix, e.g. 'destination:' -> ['kedarnath']"""
+        return [category[len(prefix):] for category in self.hits if category.startswith(prefix)]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over every keyword table
+
+    Scans a message once, whatever the number of keywords, and reports each
+    category with at least one whole-word hit ("great" does not match
+    inside "greatest").
+    """
+
+    def __init__(self, tables: Dict[str, List[str]]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                self._add(keyword.lower(), category)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, category: str):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((keyword, category))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Nodes are visited breadth-first, so the fallback's outputs are complete
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def match(self, text: str) -> KeywordMatches:
+        text = text.lower()
+        length = len(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = {}
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not output[node]:
+                continue
+            if end + 1 < length and text[end + 1].isalnum():
+                continue
+            for keyword, category in output[node]:
+                start = end - len(keyword) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    hits.setdefault(category, []).append(keyword)
+        return KeywordMatches(hits)
+
+
+keyword_matcher = KeywordMatcher(KEYWORD_TABLES)
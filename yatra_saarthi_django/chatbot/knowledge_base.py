@@ -0,0 +1,202 @@
+"""Documents for the RAG knowledge base
+
+The knowledge base is built from a small set of seed documents plus one
+document per ``Destination``, ``EcoTip`` and ``LocalArtisan`` row. Every
+document carries a content hash in its metadata so the vector store can be
+synced incrementally: only new or changed documents are re-embedded.
+
+Documents are tagged with a category, a location and the role they serve,
+so retrieval can be scoped to the active role and the destinations
+mentioned in the query.
+"""
+import hashlib
+import json
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from .models import Destination, EcoTip, LocalArtisan
+
+# Documents loaded with ``manage.py ingest_knowledge``; never touched by the sync
+SOURCE_INGEST = 'ingest'
+
+# Document sources that are owned by the sync and may be deleted by it
+SOURCE_SEED = 'seed'
+SOURCE_DESTINATION = 'destination'
+SOURCE_ECO_TIP = 'eco_tip'
+SOURCE_ARTISAN = 'artisan'
+SYNCED_SOURCES = (SOURCE_SEED, SOURCE_DESTINATION, SOURCE_ECO_TIP, SOURCE_ARTISAN)
+
+# Metadata fields used to scope retrieval; the ANN index keeps a partition per value
+FILTER_FIELDS = ('category', 'location', 'role')
+
+# Roles whose answers draw on one category of documents
+CATEGORY_ROLES = {
+    'eco_tips': 'eco_advocate',
+    'wellness': 'spiritual_guide',
+}
+
+SEED_DOCUMENTS = [
+    {
+        "id": "badrinath_info",
+        "content": "Badrinath is one of the four sacred Char Dham pilgrimage sites dedicated to Lord Vishnu. Located at 3,133 meters altitude, it's best visited from May to October. According to Hindu mythology, Lord Vishnu meditated here under a Badri tree. The temple is surrounded by snow-capped peaks and offers spiritual solace to millions of devotees.",
+        "category": "destination",
+        "location": "Badrinath",
+        "metadata": {"type": "pilgrimage", "altitude": "3133m", "deity": "Vishnu"}
+    },
+    {
+        "id": "kedarnath_info",
+        "content": "Kedarnath is a sacred temple dedicated to Lord Shiva, one of the twelve Jyotirlingas. Located at 3,583 meters altitude, it's accessible from May to October. Legend says the Pandavas built this temple to seek Lord Shiva's forgiveness after the Kurukshetra war. The temple survived the 2013 floods miraculously.",
+        "category": "destination",
+        "location": "Kedarnath",
+        "metadata": {"type": "pilgrimage", "altitude": "3583m", "deity": "Shiva"}
+    },
+    {
+        "id": "eco_tips_plastic",
+        "content": "Carry reusable water bottles and avoid single-use plastics. The Himalayas are fragile ecosystems that take decades to decompose plastic waste. Use biodegradable soaps and shampoos to protect mountain water sources. Pack out all trash following Leave No Trace principles.",
+        "category": "eco_tips",
+        "metadata": {"type": "sustainability", "focus": "waste_management"}
+    },
+    {
+        "id": "meditation_stress",
+        "content": "For stress relief during travel, try the 4-7-8 breathing technique: Inhale for 4 counts, hold for 7, exhale for 8. Practice progressive muscle relaxation starting from your toes. The mountain air and spiritual atmosphere enhance meditation effectiveness.",
+        "category": "wellness",
+        "metadata": {"type": "meditation", "condition": "stress"}
+    },
+    {
+        "id": "local_artisans_uttarakhand",
+        "content": "Uttarakhand is famous for wood carving, handwoven textiles, and stone sculptures. Support local artisans by purchasing authentic Garhwali shawls, wooden temple decorations, and traditional jewelry. Visit local markets near temples for genuine handicrafts.",
+        "category": "artisans",
+        "metadata": {"type": "crafts", "region": "Uttarakhand"}
+    },
+    {
+        "id": "multilingual_greetings",
+        "content": "Namaste (Hindi/Sanskrit), Namaskar (formal Hindi), Sat Sri Akal (Punjabi), Adaab (Urdu), Vanakkam (Tamil), Namaskara (Kannada). Learning local greetings shows respect for regional culture and enhances your spiritual journey experience.",
+        "category": "culture",
+        "metadata": {"type": "language", "focus": "greetings"}
+    }
+]
+
+
+def content_hash(content: str, metadata: Dict[str, Any]) -> str:
+    """Stable hash of a document's text and metadata"""
+    payload = json.dumps([content, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def tag_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize the location and add the role tag implied by the category"""
+    if metadata.get('location'):
+        metadata['location'] = str(metadata['location']).strip().lower()
+    role = CATEGORY_ROLES.get(metadata.get('category'))
+    if role:
+        metadata.setdefault('role', role)
+    return metadata
+
+
+def retrieval_scope(role: Optional[str] = None, destinations: Iterable[str] = ()) -> Dict[str, List[str]]:
+    """Allowed values per metadata field for a role and the destinations mentioned
+
+    Roles without a document category of their own are not scoped.
+    """
+    scope = {}
+    if role in CATEGORY_ROLES.values():
+        scope['role'] = [role]
+    destinations = [destination.lower() for destination in destinations]
+    if destinations:
+        scope['location'] = destinations
+    return scope
+
+
+def scope_where(scope: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+    """The scope as a vector store where clause, or None when unscoped"""
+    clauses = [{field: {'$in': list(values)}} for field, values in scope.items()]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def in_scope(metadata: Dict[str, Any], scope: Dict[str, List[str]]) -> bool:
+    return all((metadata or {}).get(field) in values for field, values in scope.items())
+
+
+def relaxed_scopes(scope: Dict[str, List[str]]) -> Iterator[Dict[str, List[str]]]:
+    """The scope, then each of its fields alone, then no scope
+
+    Retrieval tries them in turn until one matches documents, so an eco
+    question about a destination without eco tips still gets context.
+    """
+    yield scope
+    if len(scope) > 1:
+        for field, values in scope.items():
+            yield {field: values}
+    if scope:
+        yield {}
+
+
+def make_document(doc_id: str, content: str, source: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Build a knowledge base document with its source, filter tags and content hash"""
+    metadata = tag_metadata(dict(metadata or {}))
+    metadata['source'] = source
+    metadata['content_hash'] = content_hash(content, metadata)
+    return {"id": doc_id, "content": content, "metadata": metadata}
+
+
+def chunk_text(text: str, max_words: int = 200, overlap: int = 40) -> List[str]:
+    """Split text into overlapping chunks of at most ``max_words`` words"""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    
+    step = max(1, max_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + max_words]))
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def destination_document(destination: Destination) -> Dict[str, Any]:
+    content = (
+        f"{destination.name}: {destination.description}. "
+        f"Best time to visit: {destination.best_time}. Altitude: {destination.altitude}. "
+        f"Mythology: {destination.mythology}"
+    )
+    return make_document(f"destination:{destination.pk}", content, SOURCE_DESTINATION, {
+        "name": destination.name, "category": "destination", "location": destination.name
+    })
+
+
+def eco_tip_document(tip: EcoTip) -> Dict[str, Any]:
+    content = f"{tip.title}: {tip.description}"
+    return make_document(f"eco_tip:{tip.pk}", content, SOURCE_ECO_TIP, {"focus": tip.category, "category": "eco_tips"})
+
+
+def artisan_document(artisan: LocalArtisan) -> Dict[str, Any]:
+    content = (
+        f"{artisan.name} practises {artisan.craft_type} in {artisan.location}. "
+        f"{artisan.description} Contact: {artisan.contact_info}"
+    )
+    return make_document(f"artisan:{artisan.pk}", content, SOURCE_ARTISAN, {
+        "craft": artisan.craft_type, "category": "artisans", "location": artisan.location
+    })
+
+
+# Models mirrored into the knowledge base and their document builders
+MODEL_DOCUMENT_BUILDERS = {
+    Destination: destination_document,
+    EcoTip: eco_tip_document,
+    LocalArtisan: artisan_document,
+}
+
+
+def iter_documents() -> Iterator[Dict[str, Any]]:
+    """Yield every document the knowledge base should contain"""
+    for doc in SEED_DOCUMENTS:
+        metadata = dict(doc["metadata"], category=doc["category"])
+        if doc.get("location"):
+            metadata["location"] = doc["location"]
+        yield make_document(doc["id"], doc["content"], SOURCE_SEED, metadata)
+    
+    for model, builder in MODEL_DOCUMENT_BUILDERS.items():
+        for instance in model.objects.all().iterator():
+            yield builder(instance)
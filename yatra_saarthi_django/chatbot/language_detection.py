@@ -0,0 +1,200 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+# Unicode blocks of the scripts used by the supported languages. Devanagari
+# is shared by Hindi and Marathi, and Latin by English and Hinglish.
+SCRIPT_RANGES = [
+    ('devanagari', 0x0900, 0x097F),
+    ('bengali', 0x0980, 0x09FF),
+    ('gurmukhi', 0x0A00, 0x0A7F),
+    ('gujarati', 0x0A80, 0x0AFF),
+    ('tamil', 0x0B80, 0x0BFF),
+    ('telugu', 0x0C00, 0x0C7F),
+    ('kannada', 0x0C80, 0x0CFF),
+    ('malayalam', 0x0D00, 0x0D7F),
+    ('arabic', 0x0600, 0x06FF),
+    ('arabic', 0x0750, 0x077F),
+    ('arabic', 0xFB50, 0xFDFF),
+    ('arabic', 0xFE70, 0xFEFF),
+]
+
+SCRIPT_LANGUAGES = {
+    'bengali': 'bn',
+    'gurmukhi': 'pa',
+    'gujarati': 'gu',
+    'tamil': 'ta',
+    'telugu': 'te',
+    'kannada': 'kn',
+    'malayalam': 'ml',
+    'arabic': 'ur',
+}
+
+# Common words that tell Marathi apart from Hindi in Devanagari text
+MARATHI_MARKERS = {'आहे', 'आहेत', 'आणि', 'मध्ये', 'नाही', 'काय', 'कसे', 'कसा', 'तुम्ही', 'मला', 'आम्ही', 'होते', 'साठी', 'कुठे', 'आहोत', 'करा'}
+HINDI_MARKERS = {'है', 'हैं', 'और', 'में', 'नहीं', 'क्या', 'कैसे', 'आप', 'मुझे', 'हम', 'था', 'थे', 'के', 'की', 'का', 'लिए', 'कहाँ', 'करें'}
+
+# Training text for the Latin-script n-gram model. Romanized Hindi
+# (Hinglish) is answered in Hindi, so it is labelled 'hi'.
+LATIN_TRAINING_CORPUS = {
+    'en': [
+        "What is the weather like in Kedarnath today",
+        "How do I reach Badrinath from Rishikesh",
+        "Please suggest an itinerary for the Char Dham yatra",
+        "Where can I stay near the temple",
+        "Which is the best time to visit Gangotri",
+        "I am feeling stressed and tired after the long trek",
+        "Tell me about the history and mythology of these places",
+        "Are there any eco friendly homestays in the valley",
+        "How many days does the whole journey take",
+        "Can you recommend some meditation techniques",
+        "Is the road open after the heavy rain",
+        "What should I pack for a trip to the mountains",
+        "Thank you for the helpful information",
+        "Where can I buy local handicrafts and shawls",
+        "Is it safe to travel with elderly parents",
+        "How far is the helipad from the shrine",
+        "What are the emergency contact numbers",
+        "I would like to book a guide for the trek",
+        "Which festivals are celebrated during the summer",
+        "Good morning, I need help planning my trip",
+    ],
+    'hi': [
+        "Kedarnath ka mausam aaj kaisa hai",
+        "Rishikesh se Badrinath kaise pahunche",
+        "Char Dham yatra ke liye itinerary bata do",
+        "Mandir ke paas rukne ki jagah kahan milegi",
+        "Gangotri jane ka sahi samay kya hai",
+        "Lambi chadhai ke baad main bahut thak gaya hoon",
+        "In jagahon ka itihaas aur kahani batao",
+        "Kya ghaati mein koi accha homestay hai",
+        "Poori yatra mein kitne din lagenge",
+        "Mujhe dhyan karne ka tarika bataiye",
+        "Kya barish ke baad raasta khula hai",
+        "Pahad jane ke liye kya saman le jana chahiye",
+        "Bahut bahut dhanyavaad aapka",
+        "Yahan se shawl aur kuch saman kahan se khareedein",
+        "Kya budhe mata pita ke saath jana theek rahega",
+        "Helipad mandir se kitni door hai",
+        "Emergency ke liye kaunsa number milana hai",
+        "Mujhe trek ke liye guide chahiye",
+        "Garmi mein kaun kaun se tyohar manaye jaate hain",
+        "Namaste, mujhe apni yatra plan karni hai",
+    ],
+}
+
+_NON_LETTER_RE = re.compile(r"[^a-z\s]")
+# Devanagari letters and vowel signs, excluding the danda punctuation marks
+_DEVANAGARI_WORD_RE = re.compile(r"[\u0900-\u0963\u0966-\u097F]+")
+
+
+def script_counts(text: str) -> Counter:
+    """Count the letters of each script in the text"""
+    counts = Counter()
+    for char in text:
+        code = ord(char)
+        if code < 0x0250:
+            if char.isalpha():
+                counts['latin'] += 1
+            continue
+        for script, start, end in SCRIPT_RANGES:
+            if start <= code <= end:
+                counts[script] += 1
+                break
+    return counts
+
+
+class CharNgramModel:
+    """Character n-gram language models with add-one smoothing"""
+
+    def __init__(self, corpora: Dict[str, List[str]], orders=(1, 2, 3)):
+        self.orders = orders
+        counts = {lang: Counter() for lang in corpora}
+        for lang, texts in corpora.items():
+            for text in texts:
+                counts[lang].update(self.ngrams(text))
+
+        vocabulary = set()
+        for lang_counts in counts.values():
+            vocabulary.update(lang_counts)
+
+        self.log_probs = {}
+        self.unseen = {}
+        for lang, lang_counts in counts.items():
+            denominator = sum(lang_counts.values()) + len(vocabulary)
+            self.log_probs[lang] = {gram: math.log((count + 1) / denominator) for gram, count in lang_counts.items()}
+            self.unseen[lang] = math.log(1 / denominator)
+
+    def ngrams(self, text: str) -> List[str]:
+        text = _NON_LETTER_RE.sub(' ', text.lower())
+        grams = []
+        for word in text.split():
+            padded = f" {word} "
+            for n in self.orders:
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def scores(self, text: str) -> Dict[str, float]:
+        grams = self.ngrams(text)
+        return {
+            lang: sum(log_probs.get(gram, self.unseen[lang]) for gram in grams)
+            for lang, log_probs in self.log_probs.items()
+        }
+
+
+class LanguageDetector:
+    """Offline language detection for the supported Indian languages
+
+    Text in a distinct Indic or Arabic script is classified by its Unicode
+    block, Devanagari is split into Hindi and Marathi by marker words, and
+    Latin-script text is classified as English or Hinglish by a small
+    character n-gram model; anything but the default language must win by
+    latin_margin (mean log-likelihood per n-gram) over at least
+    min_latin_tokens words. No network calls are made.
+    """
+
+    def __init__(self, default: str = 'en', min_latin_tokens: int = 2, latin_margin: float = 0.3):
+        self.default = default
+        self.min_latin_tokens = min_latin_tokens
+        self.latin_margin = latin_margin
+        self.latin_model = CharNgramModel(LATIN_TRAINING_CORPUS)
+
+    def detect(self, text: str) -> str:
+        if not text:
+            return self.default
+
+        counts = script_counts(text)
+        if not counts:
+            return self.default
+
+        script = counts.most_common(1)[0][0]
+        if script == 'latin':
+            return self._detect_latin(text)
+        if script == 'devanagari':
+            return self._detect_devanagari(text)
+        return SCRIPT_LANGUAGES[script]
+
+    def _detect_devanagari(self, text: str) -> str:
+        words = _DEVANAGARI_WORD_RE.findall(text)
+        marathi = sum(word in MARATHI_MARKERS for word in words) + text.count('ळ')
+        hindi = sum(word in HINDI_MARKERS for word in words)
+        return 'mr' if marathi > hindi else 'hi'
+
+    def _detect_latin(self, text: str) -> str:
+        # Single words (place names, 'yoga', 'namaste') carry too little
+        # evidence, and a wrong guess costs a translation round-trip
+        if len(text.split()) < self.min_latin_tokens:
+            return self.default
+        grams = self.latin_model.ngrams(text)
+        if not grams:
+            return self.default
+        scores = self.latin_model.scores(text)
+        best = max(scores, key=scores.get)
+        # Compare per n-gram so the margin does not grow with text length
+        if (scores[best] - scores[self.default]) / len(grams) < self.latin_margin:
+            return self.default
+        return best
+
+
+language_detector = LanguageDetector()
@@ -1,173 +1,755 @@
+import asyncio
 import os
 import json
 import random
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
 from datetime import datetime
 import requests
-from sentence_transformers import SentenceTransformer
-import chromadb
-from googletrans import Translator
 import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .cache import LRUCache, normalize_text, bump_kb_version, get_kb_version
+from .keyword_matcher import keyword_matcher, KeywordMatches
+from .knowledge_base import in_scope, relaxed_scopes, retrieval_scope, scope_where
+from .language_detection import language_detector
+from .interactions import interaction_log
+from .profiles import profile_store
+from .query_classifier import QueryClassifier, ROLE_PROTOTYPES, SENTIMENT_PROTOTYPES
+from .recommendations import recommendation_index
+from .search_index import VersionedIndex, reciprocal_rank_fusion
+from .translation import translation_service
+from .vector_store import file_lock
 
 logger = logging.getLogger(__name__)
 
+# Lock file in KNOWLEDGE_BASE_DIR held by the process syncing the knowledge base
+SYNC_LOCK_FILE = 'sync.lock'
+
+# Readiness states reported by the health endpoint
+READINESS_COLD = 'cold'
+READINESS_LOADING = 'loading'
+READINESS_READY = 'ready'
+READINESS_DEGRADED = 'degraded'
+
+# Which path served a retrieval, reported with every response
+RETRIEVAL_LEXICAL = 'lexical'
+RETRIEVAL_HYBRID = 'hybrid'
+RETRIEVAL_VECTOR = 'vector'
+RETRIEVAL_NONE = 'none'
+
+# Runs CPU-bound embedding work for async callers, sized to leave cores free
+embedding_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'EMBEDDING_THREADS', 2), thread_name_prefix='embedding'
+)
+
+# Sentence ends in English and Devanagari text (danda)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?।])\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split a response into sentences for streaming"""
+    return [sentence for sentence in _SENTENCE_END_RE.split(text.strip()) if sentence]
+
+# A BM25 hit: (score, doc_id, (document, metadata))
+LexicalHit = Tuple[float, str, Tuple[str, Dict[str, Any]]]
+
+class QueryAnalysis:
+    """A user message prepared once per request
+
+    Holds the detected language, the English text, its keyword matches,
+    its BM25 hits and its embedding, plus the role and sentiment predicted
+    from that embedding, so routing, retrieval and sentiment share one
+    model call. The embedding is skipped when the BM25 hits are decisive.
+    """
+    
+    def __init__(self, text: str, detected_lang: str, english_query: str, matches: KeywordMatches,
+                 embedding: Optional[List[float]] = None, predicted: Optional[Dict[str, Optional[str]]] = None,
+                 lexical_hits: Optional[List[LexicalHit]] = None):
+        self.text = text
+        self.detected_lang = detected_lang
+        self.english_query = english_query
+        self.matches = matches
+        self.embedding = embedding
+        self.lexical_hits = lexical_hits
+        predicted = predicted or {}
+        self.predicted_role = predicted.get('role')
+        self.predicted_sentiment = predicted.get('sentiment')
+
 class LLMService:
-    """Advanced LLM service with RAG capabilities"""
+    """Advanced LLM service with RAG capabilities
+
+    The embedding model and vector store are heavy to build, so
+    they are created on first use (or by ``start_warmup`` in a background
+    thread) rather than at import time. The vector store is persisted under
+    ``settings.KNOWLEDGE_BASE_DIR`` and kept in sync with the tourism models.
+    """
     
     def __init__(self):
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.chroma_client = chromadb.Client()
-        self.translator = Translator()
-        self.collection = None
-        self.initialize_knowledge_base()
+        self._embedding_model = None
+        self._chroma_client = None
+        self._collection = None
+        self._load_lock = threading.Lock()
+        self._warmup_thread = None
+        self._sync_lock = threading.Lock()
+        self._sync_run_lock = threading.Lock()
+        self._sync_pending = False
+        self._sync_thread = None
+        self.query_embedding_cache = LRUCache(
+            maxsize=getattr(settings, 'QUERY_EMBEDDING_CACHE_SIZE', 2048),
+            ttl=getattr(settings, 'QUERY_EMBEDDING_CACHE_TTL', 3600)
+        )
+        self.query_classifier = QueryClassifier(
+            ROLE_PROTOTYPES, SENTIMENT_PROTOTYPES,
+            min_similarity=getattr(settings, 'QUERY_CLASSIFIER_MIN_SIMILARITY', 0.3)
+        )
+        # BM25 over the documents in the vector store, rebuilt when the knowledge base version changes
+        self.lexical_index = VersionedIndex(
+            self._lexical_documents, get_kb_version,
+            check_interval=getattr(settings, 'LEXICAL_INDEX_CHECK_INTERVAL', 5)
+        )
+        self.retrieval_paths = {RETRIEVAL_LEXICAL: 0, RETRIEVAL_HYBRID: 0, RETRIEVAL_VECTOR: 0, RETRIEVAL_NONE: 0}
+        self.readiness = READINESS_COLD
+        self.readiness_error = None
+        self.load_seconds = None
+        self.load_failures = 0
+        self._retry_at = 0.0
+    
+    @property
+    def embedding_model(self):
+        self.ensure_loaded()
+        return self._embedding_model
+    
+    @property
+    def chroma_client(self):
+        self.ensure_loaded()
+        return self._chroma_client
+    
+    @property
+    def collection(self):
+        self.ensure_loaded()
+        return self._collection
+    
+    def ensure_loaded(self):
+        """Load the embedding model and knowledge base if not done yet"""
+        if self.readiness in (READINESS_READY, READINESS_DEGRADED):
+            return
+        
+        with self._load_lock:
+            if self.readiness in (READINESS_READY, READINESS_DEGRADED):
+                return
+            
+            self.readiness = READINESS_LOADING
+            # The load syncs the knowledge base itself; only edits made
+            # after this point need another sync
+            with self._sync_lock:
+                self._sync_pending = False
+            started = time.monotonic()
+            try:
+                from sentence_transformers import SentenceTransformer
+                
+                self._embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.query_classifier.fit(self._embed)
+                self.initialize_knowledge_base()
+            except Exception as e:
+                logger.error(f"Error loading LLM service: {e}")
+                self.readiness_error = str(e)
+            
+            self.load_seconds = round(time.monotonic() - started, 3)
+            if self._collection is not None:
+                self.readiness = READINESS_READY
+                self.readiness_error = None
+                self.load_failures = 0
+                logger.info(f"LLM service ready in {self.load_seconds}s")
+                with self._sync_lock:
+                    if self._sync_pending:
+                        self._start_sync_thread()
+            else:
+                self.readiness = READINESS_DEGRADED
+                self.load_failures += 1
+                backoff = min(
+                    getattr(settings, 'LLM_RETRY_BACKOFF', 30) * 2 ** (self.load_failures - 1),
+                    getattr(settings, 'LLM_RETRY_BACKOFF_MAX', 600)
+                )
+                self._retry_at = time.monotonic() + backoff
+                logger.warning(f"LLM service degraded; load will be retried in {backoff}s")
+    
+    def retry_degraded_load(self) -> bool:
+        """Reload in the background if the last load failed and its backoff has elapsed
+
+        The backoff doubles with each consecutive failure, up to
+        LLM_RETRY_BACKOFF_MAX seconds.
+        """
+        with self._load_lock:
+            if self.readiness != READINESS_DEGRADED or time.monotonic() < self._retry_at:
+                return False
+            self.readiness = READINESS_COLD
+            self._warmup_thread = None
+        self.start_warmup()
+        return True
+    
+    def start_warmup(self):
+        """Load the service in a background thread so first chats are fast"""
+        if self.readiness != READINESS_COLD or self._warmup_thread is not None:
+            return
+        
+        self.readiness = READINESS_LOADING
+        self._warmup_thread = threading.Thread(
+            target=self.ensure_loaded, name='llm-warmup', daemon=True
+        )
+        self._warmup_thread.start()
     
     def initialize_knowledge_base(self):
         """Initialize the RAG knowledge base"""
         try:
-            # Create or get collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="yatra_saarthi_knowledge",
-                metadata={"description": "YatraSaarthi tourism knowledge base"}
-            )
+            self._collection = self._open_vector_store()
             
-            # Add initial knowledge if collection is empty
-            if self.collection.count() == 0:
-                self.populate_knowledge_base()
+            # Embed only what changed since the store was last synced
+            self._sync_knowledge_base()
                 
         except Exception as e:
             logger.error(f"Error initializing knowledge base: {e}")
+            self._collection = None
     
-    def populate_knowledge_base(self):
-        """Populate the knowledge base with tourism data"""
-        knowledge_data = [
-            {
-                "id": "badrinath_info",
-                "content": "Badrinath is one of the four sacred Char Dham pilgrimage sites dedicated to Lord Vishnu. Located at 3,133 meters altitude, it's best visited from May to October. According to Hindu mythology, Lord Vishnu meditated here under a Badri tree. The temple is surrounded by snow-capped peaks and offers spiritual solace to millions of devotees.",
-                "category": "destination",
-                "location": "Badrinath",
-                "metadata": {"type": "pilgrimage", "altitude": "3133m", "deity": "Vishnu"}
-            },
-            {
-                "id": "kedarnath_info",
-                "content": "Kedarnath is a sacred temple dedicated to Lord Shiva, one of the twelve Jyotirlingas. Located at 3,583 meters altitude, it's accessible from May to October. Legend says the Pandavas built this temple to seek Lord Shiva's forgiveness after the Kurukshetra war. The temple survived the 2013 floods miraculously.",
-                "category": "destination",
-                "location": "Kedarnath",
-                "metadata": {"type": "pilgrimage", "altitude": "3583m", "deity": "Shiva"}
-            },
-            {
-                "id": "eco_tips_plastic",
-                "content": "Carry reusable water bottles and avoid single-use plastics. The Himalayas are fragile ecosystems that take decades to decompose plastic waste. Use biodegradable soaps and shampoos to protect mountain water sources. Pack out all trash following Leave No Trace principles.",
-                "category": "eco_tips",
-                "metadata": {"type": "sustainability", "focus": "waste_management"}
-            },
-            {
-                "id": "meditation_stress",
-                "content": "For stress relief during travel, try the 4-7-8 breathing technique: Inhale for 4 counts, hold for 7, exhale for 8. Practice progressive muscle relaxation starting from your toes. The mountain air and spiritual atmosphere enhance meditation effectiveness.",
-                "category": "wellness",
-                "metadata": {"type": "meditation", "condition": "stress"}
-            },
-            {
-                "id": "local_artisans_uttarakhand",
-                "content": "Uttarakhand is famous for wood carving, handwoven textiles, and stone sculptures. Support local artisans by purchasing authentic Garhwali shawls, wooden temple decorations, and traditional jewelry. Visit local markets near temples for genuine handicrafts.",
-                "category": "artisans",
-                "metadata": {"type": "crafts", "region": "Uttarakhand"}
-            },
-            {
-                "id": "multilingual_greetings",
-                "content": "Namaste (Hindi/Sanskrit), Namaskar (formal Hindi), Sat Sri Akal (Punjabi), Adaab (Urdu), Vanakkam (Tamil), Namaskara (Kannada). Learning local greetings shows respect for regional culture and enhances your spiritual journey experience.",
-                "category": "culture",
-                "metadata": {"type": "language", "focus": "greetings"}
-            }
-        ]
-        
-        # Add documents to collection
-        for doc in knowledge_data:
-            self.collection.add(
-                documents=[doc["content"]],
-                metadatas=[doc["metadata"]],
-                ids=[doc["id"]]
+    def _open_vector_store(self):
+        """The vector store selected by settings.VECTOR_BACKEND
+
+        All backends expose the same collection API (get, upsert, delete,
+        query), so the rest of the service does not depend on the choice.
+        """
+        backend = getattr(settings, 'VECTOR_BACKEND', 'chroma')
+        if backend == 'ann':
+            from .ann_index import AnnVectorStore
+            return AnnVectorStore(
+                getattr(settings, 'ANN_INDEX_DIR', Path(settings.KNOWLEDGE_BASE_DIR) / 'ann_index'),
+                getattr(settings, 'VECTOR_INDEX_DIR', Path(settings.KNOWLEDGE_BASE_DIR) / 'numpy_index'),
+                nprobe=getattr(settings, 'ANN_NPROBE', 16),
+                refine=getattr(settings, 'ANN_REFINE', 4),
+                dtype=getattr(settings, 'VECTOR_INDEX_DTYPE', 'float32'),
+                retire_seconds=getattr(settings, 'VECTOR_FILE_RETIRE_SECONDS', 300)
+            )
+        if backend == 'numpy':
+            from .vector_store import NumpyVectorStore
+            return NumpyVectorStore(
+                getattr(settings, 'VECTOR_INDEX_DIR', Path(settings.KNOWLEDGE_BASE_DIR) / 'numpy_index'),
+                dtype=getattr(settings, 'VECTOR_INDEX_DTYPE', 'float32'),
+                retire_seconds=getattr(settings, 'VECTOR_FILE_RETIRE_SECONDS', 300)
             )
+        
+        import chromadb
+        self._chroma_client = chromadb.PersistentClient(path=str(settings.KNOWLEDGE_BASE_DIR))
+        return self._chroma_client.get_or_create_collection(
+            name="yatra_saarthi_knowledge",
+            metadata={"description": "YatraSaarthi tourism knowledge base", "hnsw:space": "cosine"}
+        )
+    
+    def _embed(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        return self._embedding_model.encode(texts, batch_size=batch_size, normalize_embeddings=True).tolist()
+    
+    def embed_texts(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Embed texts with the sentence-transformer model"""
+        self.ensure_loaded()
+        return self._embed(texts, batch_size)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing the cached vector for repeated questions"""
+        key = normalize_text(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embed_texts([query])[0]
+            self.query_embedding_cache.set(key, embedding)
+        return embedding
+    
+    def sync_knowledge_base(self) -> Dict[str, int]:
+        """Incrementally sync the vector store with the seed documents and the database"""
+        self.ensure_loaded()
+        return self._sync_knowledge_base()
+    
+    def _sync_knowledge_base(self) -> Dict[str, int]:
+        """Re-embed new or changed documents and remove deleted ones
+
+        Documents are compared by the content hash stored in their metadata,
+        so a restart with an unchanged database costs no embedding calls.
+        Every worker syncs on startup, so the whole read-compare-write runs
+        under a lock on the knowledge base directory: the others then find
+        the store up to date instead of writing the same changes to a chroma
+        directory that is not safe for concurrent writers.
+        """
+        from .knowledge_base import iter_documents, SYNCED_SOURCES
+        
+        stats = {"upserted": 0, "removed": 0}
+        if self._collection is None:
+            return stats
+        
+        lock_dir = Path(settings.KNOWLEDGE_BASE_DIR)
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        with self._sync_run_lock, file_lock(lock_dir / SYNC_LOCK_FILE):
+            try:
+                stored = self._collection.get(include=['metadatas'])
+                stored_hashes = {}
+                for doc_id, metadata in zip(stored['ids'], stored['metadatas']):
+                    metadata = metadata or {}
+                    if metadata.get('source') in SYNCED_SOURCES:
+                        stored_hashes[doc_id] = metadata.get('content_hash')
+            
+                changed = []
+                seen = set()
+                for doc in iter_documents():
+                    seen.add(doc["id"])
+                    if stored_hashes.get(doc["id"]) != doc["metadata"]["content_hash"]:
+                        changed.append(doc)
+                removed = [doc_id for doc_id in stored_hashes if doc_id not in seen]
+            
+                if changed:
+                    self._collection.upsert(
+                        ids=[doc["id"] for doc in changed],
+                        documents=[doc["content"] for doc in changed],
+                        metadatas=[doc["metadata"] for doc in changed],
+                        embeddings=self._embed([doc["content"] for doc in changed])
+                    )
+                if removed:
+                    self._collection.delete(ids=removed)
+            
+                stats = {"upserted": len(changed), "removed": len(removed)}
+                if changed or removed:
+                    bump_kb_version()
+                    self.lexical_index.invalidate()
+                    logger.info(f"Knowledge base synced: {stats}")
+            except Exception as e:
+                logger.error(f"Error syncing knowledge base: {e}")
+        
+        return stats
+    
+    def schedule_sync(self):
+        """Sync the knowledge base in a background thread, coalescing bursts of edits
+
+        Only a loaded service syncs here. Edits saved by a cold process (the
+        shell, migrations, the admin before the first chat) must not load the
+        model; the load syncs them, and edits made while it is loading are
+        synced once it is ready.
+        """
+        with self._sync_lock:
+            self._sync_pending = True
+            if self.readiness != READINESS_READY or self._sync_thread is not None:
+                return
+            self._start_sync_thread()
+    
+    def _start_sync_thread(self):
+        # Called with _sync_lock held
+        self._sync_thread = threading.Thread(
+            target=self._run_pending_syncs, name='knowledge-sync', daemon=True
+        )
+        self._sync_thread.start()
+    
+    def _run_pending_syncs(self):
+        while True:
+            with self._sync_lock:
+                if not self._sync_pending:
+                    self._sync_thread = None
+                    return
+                self._sync_pending = False
+            self.sync_knowledge_base()
     
     def detect_language(self, text: str) -> str:
         """Detect the language of input text"""
-        try:
-            detected = self.translator.detect(text)
-            return detected.lang
-        except:
-            return 'en'  # Default to English
+        return language_detector.detect(text)
     
-    def translate_text(self, text: str, target_lang: str = 'en') -> str:
+    def translate_text(self, text: str, target_lang: str = 'en', source_lang: str = 'auto') -> str:
         """Translate text to target language"""
-        try:
-            if target_lang == 'en':
-                return text
-            translated = self.translator.translate(text, dest=target_lang)
-            return translated.text
-        except:
-            return text
-    
-    def retrieve_relevant_context(self, query: str, n_results: int = 3) -> List[str]:
-        """Retrieve relevant context using RAG"""
-        try:
-            if not self.collection:
-                return []
-            
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results
+        return translation_service.translate(text, target_lang, source_lang)
+    
+    def analyze_query(self, user_message: str, detected_lang: Optional[str] = None,
+                      matches: Optional[KeywordMatches] = None) -> QueryAnalysis:
+        """Detect, translate, keyword-match and embed a message once for the whole request"""
+        if detected_lang is None:
+            detected_lang = self.detect_language(user_message)
+        
+        english_query = user_message
+        if detected_lang != 'en':
+            english_query = self.translate_text(user_message, 'en', detected_lang)
+        
+        return self._analyze_english(user_message, detected_lang, english_query, matches)
+    
+    async def aanalyze_query(self, user_message: str, detected_lang: Optional[str] = None,
+                             matches: Optional[KeywordMatches] = None) -> QueryAnalysis:
+        """Async variant of analyze_query; translation and embedding run off the event loop"""
+        if detected_lang is None:
+            detected_lang = self.detect_language(user_message)
+        
+        english_query = user_message
+        if detected_lang != 'en':
+            english_query = await sync_to_async(self.translate_text, thread_sensitive=False)(
+                user_message, 'en', detected_lang
             )
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            embedding_executor, self._analyze_english, user_message, detected_lang, english_query, matches
+        )
+    
+    def analyze_queries(self, user_messages: List[str]) -> List[QueryAnalysis]:
+        """analyze_query for many messages with batched model and translation calls
+
+        Messages are translated with one request per source language, and
+        every query embedding missing from the cache is computed in a
+        single forward pass.
+        """
+        self.ensure_loaded()
+        detected = [self.detect_language(message) for message in user_messages]
+        english = list(user_messages)
+        by_language = {}
+        for position, lang in enumerate(detected):
+            if lang != 'en':
+                by_language.setdefault(lang, []).append(position)
+        for lang, positions in by_language.items():
+            translated = translation_service.translate_batch([user_messages[p] for p in positions], 'en', lang)
+            for position, text in zip(positions, translated):
+                english[position] = text
+        
+        matches = [keyword_matcher.match(text) for text in english]
+        lexical = [None] * len(user_messages)
+        embeddings = [None] * len(user_messages)
+        predicted = [None] * len(user_messages)
+        if self.readiness == READINESS_READY:
+            missing = {}  # cache key -> positions
+            for position, text in enumerate(english):
+                lexical[position] = self.lexical_search(text)
+                if self.is_lexical_decisive(lexical[position]):
+                    continue
+                key = normalize_text(text)
+                embeddings[position] = self.query_embedding_cache.get(key)
+                if embeddings[position] is None:
+                    missing.setdefault(key, []).append(position)
             
-            return results['documents'][0] if results['documents'] else []
+            if missing:
+                try:
+                    texts = [english[positions[0]] for positions in missing.values()]
+                    for (key, positions), embedding in zip(missing.items(), self._embed(texts, batch_size=len(texts))):
+                        self.query_embedding_cache.set(key, embedding)
+                        for position in positions:
+                            embeddings[position] = embedding
+                except Exception as e:
+                    logger.error(f"Error embedding queries: {e}")
+            predicted = [
+                self.query_classifier.classify(embedding) if embedding is not None else None
+                for embedding in embeddings
+            ]
+        
+        return [
+            QueryAnalysis(*fields)
+            for fields in zip(user_messages, detected, english, matches, embeddings, predicted, lexical)
+        ]
+    
+    def _analyze_english(self, user_message: str, detected_lang: str, english_query: str,
+                         matches: Optional[KeywordMatches]) -> QueryAnalysis:
+        # Keyword matches of the original message only apply if it was not translated
+        if matches is None or english_query != user_message:
+            matches = keyword_matcher.match(english_query)
+        
+        # Only search and embed up front once the model is loaded; a cold
+        # service loads it on the retrieval path as before. A decisive BM25
+        # match skips the embedding: routing and sentiment then fall back to
+        # keywords
+        embedding = None
+        predicted = None
+        lexical_hits = None
+        if self.readiness == READINESS_READY:
+            lexical_hits = self.lexical_search(english_query)
+            if not self.is_lexical_decisive(lexical_hits):
+                try:
+                    embedding = self.embed_query(english_query)
+                    predicted = self.query_classifier.classify(embedding)
+                except Exception as e:
+                    logger.error(f"Error embedding query: {e}")
+        
+        return QueryAnalysis(user_message, detected_lang, english_query, matches, embedding, predicted, lexical_hits)
+    
+    def _lexical_documents(self):
+        """(id, text, (text, metadata)) triples of the documents in the vector store, for the BM25 index"""
+        if self._collection is None:
+            return []
+        stored = self._collection.get(include=['documents', 'metadatas'])
+        return [
+            (doc_id, document, (document, metadata or {}))
+            for doc_id, document, metadata in zip(stored['ids'], stored['documents'], stored['metadatas'])
+            if document
+        ]
+    
+    def lexical_search(self, query: str) -> List[LexicalHit]:
+        """BM25 hits for the query as (score, doc_id, (document, metadata)), best first
+
+        No hits when the vector store cannot list all its documents (the
+        ANN backend's offline corpus): hits among the listed ones alone could
+        look decisive and hide better matches in the rest.
+        """
+        if not getattr(self._collection, 'lists_all_documents', True):
+            return []
+        try:
+            return self.lexical_index.search(query, getattr(settings, 'LEXICAL_CANDIDATES', 10))
         except Exception as e:
-            logger.error(f"Error retrieving context: {e}")
+            logger.error(f"Error searching the lexical index: {e}")
             return []
     
-    def generate_response(self, user_message: str, user_context: Dict = None, role: str = "travel_companion") -> Dict[str, Any]:
+    @staticmethod
+    def is_lexical_decisive(hits: List[LexicalHit]) -> bool:
+        """Whether the best BM25 hit is strong and clearly ahead of the next one"""
+        if not hits or hits[0][0] < getattr(settings, 'LEXICAL_FAST_PATH_MIN_SCORE', 2.5):
+            return False
+        runner_up = hits[1][0] if len(hits) > 1 else 0.0
+        return hits[0][0] >= runner_up * getattr(settings, 'LEXICAL_FAST_PATH_MARGIN', 1.5)
+    
+    def retrieve(self, query: str, n_results: int = 3, embedding: Optional[List[float]] = None,
+                 lexical_hits: Optional[List[LexicalHit]] = None,
+                 scope: Optional[Dict[str, List[str]]] = None) -> Tuple[List[str], str]:
+        """Retrieve context documents and the path that served them
+
+        A decisive BM25 match is answered from the lexical index alone,
+        without embedding the query (unless the caller already did).
+        Otherwise vector results are fused with the BM25 hits by reciprocal
+        rank, or used alone when no term matched.
+        
+        A scope (see knowledge_base.retrieval_scope) restricts both searches
+        to matching documents and is relaxed when it matches none.
+        """
+        path = RETRIEVAL_NONE
+        documents = []
+        try:
+            if self.collection:
+                if lexical_hits is None:
+                    lexical_hits = self.lexical_search(query)
+                
+                for attempt in relaxed_scopes(scope or {}):
+                    hits = [hit for hit in lexical_hits if in_scope(hit[2][1], attempt)]
+                    if embedding is None and self.is_lexical_decisive(hits):
+                        path = RETRIEVAL_LEXICAL
+                        documents = [document for _, _, (document, _) in hits[:n_results]]
+                        break
+                    
+                    if embedding is None:
+                        embedding = self.embed_query(query)
+                    results = self.collection.query(
+                        query_embeddings=[embedding],
+                        n_results=max(n_results, len(hits)),
+                        where=scope_where(attempt)
+                    )
+                    ids = results['ids'][0] if results['ids'] else []
+                    by_id = dict(zip(ids, results['documents'][0] if results['documents'] else []))
+                    if hits:
+                        path = RETRIEVAL_HYBRID
+                        by_id.update((doc_id, document) for _, doc_id, (document, _) in hits)
+                        ranked = reciprocal_rank_fusion(
+                            [ids, [doc_id for _, doc_id, _ in hits]],
+                            k=getattr(settings, 'RRF_K', 60)
+                        )
+                    else:
+                        path = RETRIEVAL_VECTOR
+                        ranked = ids
+                    documents = [by_id[doc_id] for doc_id in ranked[:n_results]]
+                    if documents:
+                        break
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            documents = []
+        
+        self.retrieval_paths[path] += 1
+        return documents, path
+    
+    def retrieve_relevant_context(self, query: str, n_results: int = 3,
+                                  embedding: Optional[List[float]] = None) -> List[str]:
+        """Retrieve relevant context using RAG"""
+        return self.retrieve(query, n_results, embedding)[0]
+    
+    def retrieval_stats(self) -> Dict[str, Any]:
+        """Retrievals served per path; lexical ones cost no embedding call"""
+        total = sum(self.retrieval_paths.values())
+        return {
+            "paths": dict(self.retrieval_paths),
+            "embeddings_skipped_ratio": round(self.retrieval_paths[RETRIEVAL_LEXICAL] / total, 4) if total else None,
+            "lexical_index_rebuilds": self.lexical_index.rebuilds,
+        }
+    
+    def generate_response(self, user_message: str, user_context: Dict = None, role: str = "travel_companion",
+                          detected_lang: Optional[str] = None,
+                          matches: Optional[KeywordMatches] = None,
+                          analysis: Optional[QueryAnalysis] = None) -> Dict[str, Any]:
         """Generate intelligent response using LLM with RAG"""
         
-        # Detect language
-        detected_lang = self.detect_language(user_message)
+        # Detect, translate and embed unless the caller already did
+        if analysis is None:
+            analysis = self.analyze_query(user_message, detected_lang, matches)
+        detected_lang = analysis.detected_lang
         
-        # Translate to English for processing if needed
-        english_query = user_message
+        response = self._compose_response(analysis, role, user_context)
+        
+        # Translate response back if needed
         if detected_lang != 'en':
-            english_query = self.translate_text(user_message, 'en')
+            response['response'] = self.translate_text(response['response'], detected_lang, 'en')
         
-        # Retrieve relevant context
-        context_docs = self.retrieve_relevant_context(english_query)
+        return response
+    
+    def generate_responses(self, requests: List[Tuple[QueryAnalysis, str, Dict]]) -> List[Dict[str, Any]]:
+        """generate_response for many (analysis, role, user_context) requests
+
+        Replies are translated back with one request per target language.
+        A request that fails gets None in its place.
+        """
+        responses = []
+        for analysis, role, user_context in requests:
+            try:
+                responses.append(self._compose_response(analysis, role, user_context))
+            except Exception as e:
+                logger.error(f"Error generating response: {e}")
+                responses.append(None)
+        
+        by_language = {}
+        for position, response in enumerate(responses):
+            if response is not None and response['detected_language'] != 'en':
+                by_language.setdefault(response['detected_language'], []).append(position)
+        for lang, positions in by_language.items():
+            translated = translation_service.translate_batch([responses[p]['response'] for p in positions], lang, 'en')
+            for position, text in zip(positions, translated):
+                responses[position]['response'] = text
+        
+        return responses
+    
+    def stream_response(self, analysis: QueryAnalysis, role: str = "travel_companion",
+                        user_context: Dict = None) -> Iterator[Tuple[str, Any]]:
+        """generate_response as a stream of (event, data) pairs
+
+        Yields ('stage', name) before retrieval and generation, then
+        ('sentence', text) for each sentence of the reply, translated one
+        at a time so the first sentence does not wait for the rest, and
+        finally ('response', response) with the full reply.
+        """
+        yield 'stage', 'retrieving'
+        context_docs, retrieval_path = self._retrieve_for(analysis, role)
+        
+        yield 'stage', 'generating'
+        response = self._build_response(analysis, role, user_context, context_docs, retrieval_path)
+        
+        sentences = []
+        for sentence in split_sentences(response['response']):
+            if analysis.detected_lang != 'en':
+                sentence = self.translate_text(sentence, analysis.detected_lang, 'en')
+            sentences.append(sentence)
+            yield 'sentence', sentence
+        
+        response['response'] = " ".join(sentences)
+        yield 'response', response
+    
+    async def astream_response(self, analysis: QueryAnalysis, role: str = "travel_companion",
+                               user_context: Dict = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Async variant of stream_response; retrieval and translation run off the event loop"""
+        loop = asyncio.get_running_loop()
+        
+        yield 'stage', 'retrieving'
+        context_docs, retrieval_path = await loop.run_in_executor(
+            embedding_executor, self._retrieve_for, analysis, role
+        )
+        
+        yield 'stage', 'generating'
+        response = self._build_response(analysis, role, user_context, context_docs, retrieval_path)
         
+        sentences = []
+        for sentence in split_sentences(response['response']):
+            if analysis.detected_lang != 'en':
+                sentence = await sync_to_async(self.translate_text, thread_sensitive=False)(
+                    sentence, analysis.detected_lang, 'en'
+                )
+            sentences.append(sentence)
+            yield 'sentence', sentence
+        
+        response['response'] = " ".join(sentences)
+        yield 'response', response
+    
+    def _retrieve_for(self, analysis: QueryAnalysis, role: str) -> Tuple[List[str], str]:
+        return self.retrieve(
+            analysis.english_query, embedding=analysis.embedding, lexical_hits=analysis.lexical_hits,
+            scope=retrieval_scope(role, analysis.matches.names('destination:'))
+        )
+    
+    def _compose_response(self, analysis: QueryAnalysis, role: str, user_context: Optional[Dict]) -> Dict[str, Any]:
+        """Retrieve context and build the English response for an analyzed query"""
+        
+        # Retrieve relevant context
+        context_docs, retrieval_path = self._retrieve_for(analysis, role)
+        return self._build_response(analysis, role, user_context, context_docs, retrieval_path)
+    
+    def _build_response(self, analysis: QueryAnalysis, role: str, user_context: Optional[Dict],
+                        context_docs: List[str], retrieval_path: str) -> Dict[str, Any]:
         # Generate response based on role and context
         response = self._generate_contextual_response(
-            english_query, context_docs, role, user_context or {}
+            analysis.english_query, context_docs, role, user_context or {}, analysis.matches
         )
         
-        # Translate response back if needed
-        if detected_lang != 'en':
-            response['response'] = self.translate_text(response['response'], detected_lang)
-        
-        response['detected_language'] = detected_lang
+        response['detected_language'] = analysis.detected_lang
         response['context_used'] = len(context_docs) > 0
+        response['retrieval_path'] = retrieval_path
+        if not self._grounded(context_docs):
+            response['cacheable'] = False
         
         return response
     
-    def _generate_contextual_response(self, query: str, context: List[str], role: str, user_context: Dict) -> Dict[str, Any]:
+    def _grounded(self, context_docs: List[str]) -> bool:
+        """Whether a reply rests on retrieved context from a loaded service
+
+        Replies made without it are stopgaps; caching them would keep
+        serving them after the model or knowledge base recovers.
+        """
+        return bool(context_docs) and self.readiness == READINESS_READY
+    
+    async def agenerate_response(self, user_message: str, user_context: Dict = None, role: str = "travel_companion",
+                                 detected_lang: Optional[str] = None,
+                                 matches: Optional[KeywordMatches] = None,
+                                 analysis: Optional[QueryAnalysis] = None) -> Dict[str, Any]:
+        """Async variant of generate_response for the ASGI chat endpoint
+
+        Translation calls wait on the network in the default executor, and
+        embedding runs in the bounded embedding pool so CPU-heavy model calls
+        never block the event loop or oversubscribe the cores.
+        """
+        loop = asyncio.get_running_loop()
+        
+        if analysis is None:
+            analysis = await self.aanalyze_query(user_message, detected_lang, matches)
+        detected_lang = analysis.detected_lang
+        
+        context_docs, retrieval_path = await loop.run_in_executor(
+            embedding_executor, self._retrieve_for, analysis, role
+        )
+        response = self._build_response(analysis, role, user_context, context_docs, retrieval_path)
+        
+        if detected_lang != 'en':
+            response['response'] = await sync_to_async(self.translate_text, thread_sensitive=False)(
+                response['response'], detected_lang, 'en'
+            )
+        
+        return response
+    
+    def _generate_contextual_response(self, query: str, context: List[str], role: str, user_context: Dict,
+                                      matches: Optional[KeywordMatches] = None) -> Dict[str, Any]:
         """Generate response based on context and role"""
         
-        query_lower = query.lower()
+        matches = matches or keyword_matcher.match(query)
         
         # Role-based response generation
         if role == "cultural_expert":
-            return self._generate_cultural_response(query_lower, context)
+            return self._generate_cultural_response(matches, context)
         elif role == "spiritual_guide":
-            return self._generate_spiritual_response(query_lower, context)
+            return self._generate_spiritual_response(matches, context)
         elif role == "eco_advocate":
-            return self._generate_eco_response(query_lower, context)
+            return self._generate_eco_response(matches, context)
         elif role == "travel_planner":
-            return self._generate_travel_response(query_lower, context)
+            return self._generate_travel_response(matches, context)
         else:
-            return self._generate_general_response(query_lower, context)
+            return self._generate_general_response(matches, context)
     
-    def _generate_cultural_response(self, query: str, context: List[str]) -> Dict[str, Any]:
+    def _generate_cultural_response(self, matches: KeywordMatches, context: List[str]) -> Dict[str, Any]:
         """Generate culturally rich responses"""
         
         cultural_responses = {
@@ -177,7 +759,7 @@ class LLMService:
         }
         
         for key, response in cultural_responses.items():
-            if key in query:
+            if matches.has(f"topic:{key}"):
                 return {
                     "response": response,
                     "sentiment": "enlightened",
@@ -192,10 +774,10 @@ class LLMService:
             "confidence": 0.7
         }
     
-    def _generate_spiritual_response(self, query: str, context: List[str]) -> Dict[str, Any]:
+    def _generate_spiritual_response(self, matches: KeywordMatches, context: List[str]) -> Dict[str, Any]:
         """Generate spiritually focused responses"""
         
-        if any(word in query for word in ["meditation", "peace", "spiritual", "divine"]):
+        if matches.has("topic:meditation"):
             return {
                 "response": "In these sacred mountains, find a quiet spot facing the peaks. Close your eyes and breathe deeply. The ancient vibrations of countless prayers enhance your spiritual practice. Om Namah Shivaya resonates through these valleys.",
                 "sentiment": "peaceful",
@@ -203,7 +785,7 @@ class LLMService:
                 "confidence": 0.95
             }
         
-        if any(word in query for word in ["prayer", "worship", "blessing"]):
+        if matches.has("topic:prayer"):
             return {
                 "response": "Begin your prayers at dawn when the mountains glow golden. Offer water to the deity, light incense, and chant with devotion. The divine presence is strongest in the early morning hours.",
                 "sentiment": "devotional",
@@ -218,7 +800,7 @@ class LLMService:
             "confidence": 0.8
         }
     
-    def _generate_eco_response(self, query: str, context: List[str]) -> Dict[str, Any]:
+    def _generate_eco_response(self, matches: KeywordMatches, context: List[str]) -> Dict[str, Any]:
         """Generate eco-focused responses"""
         
         eco_tips = [
@@ -233,13 +815,14 @@ class LLMService:
             "response": f"🌱 {random.choice(eco_tips)} Sustainable tourism preserves these sacred places for future generations.",
             "sentiment": "responsible",
             "role": "eco_advocate",
-            "confidence": 0.85
+            "confidence": 0.85,
+            "cacheable": False  # random tip, a cached copy would always repeat it
         }
     
-    def _generate_travel_response(self, query: str, context: List[str]) -> Dict[str, Any]:
+    def _generate_travel_response(self, matches: KeywordMatches, context: List[str]) -> Dict[str, Any]:
         """Generate travel planning responses"""
         
-        if "itinerary" in query or "plan" in query:
+        if matches.has("topic:itinerary"):
             return {
                 "response": "Optimal Char Dham sequence: Yamunotri (2 days) → Gangotri (2 days) → Kedarnath (3 days) → Badrinath (3 days). Total: 12-14 days. Book helicopters in advance for Kedarnath. Carry warm clothes even in summer.",
                 "sentiment": "organized",
@@ -247,7 +830,7 @@ class LLMService:
                 "confidence": 0.9
             }
         
-        if "accommodation" in query or "stay" in query:
+        if matches.has("topic:accommodation"):
             return {
                 "response": "Book GMVN guesthouses or dharamshalas near temples. Private homestays offer authentic experiences. Advance booking essential during peak season (May-June, Sep-Oct).",
                 "sentiment": "helpful",
@@ -262,7 +845,7 @@ class LLMService:
             "confidence": 0.8
         }
     
-    def _generate_general_response(self, query: str, context: List[str]) -> Dict[str, Any]:
+    def _generate_general_response(self, matches: KeywordMatches, context: List[str]) -> Dict[str, Any]:
         """Generate general responses with context"""
         
         # Use context if available
@@ -284,63 +867,57 @@ class LLMService:
         }
 
 class PersonalizationService:
-    """Handle user personalization and dynamic role switching"""
-    
-    def __init__(self):
-        self.user_profiles = {}
-        self.interaction_history = {}
+    """Handle user personalization and dynamic role switching
+
+    Profiles live in the shared profile store, so any worker can serve any
+    user and per-process memory stays bounded.
+    """
     
     def update_user_profile(self, user_id: str, preferences: Dict):
         """Update user preferences"""
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {}
-        
-        self.user_profiles[user_id].update(preferences)
+        profile_store.update(user_id, preferences)
     
     def get_personalized_recommendations(self, user_id: str, category: str) -> List[str]:
         """Get personalized recommendations based on user profile"""
-        
-        profile = self.user_profiles.get(user_id, {})
-        interests = profile.get('interests', [])
-        
-        recommendations = {
-            'meditation': {
-                'spiritual': ["Guided meditation at temple premises", "Sunrise meditation facing peaks"],
-                'adventure': ["Walking meditation on trails", "Breathing exercises during treks"],
-                'nature': ["Forest meditation", "River-side mindfulness practice"]
-            },
-            'activities': {
-                'spiritual': ["Temple visits", "Aarti participation", "Scripture reading"],
-                'adventure': ["Trekking", "River rafting", "Rock climbing"],
-                'cultural': ["Local festivals", "Artisan workshops", "Traditional cooking"]
-            }
+        interests = self.rank_interests(profile_store.get(user_id), interaction_log.top_interests(user_id))
+        return recommendation_index.recommend(category, interests)
+    
+    def get_bulk_recommendations(self, user_ids: List[str], category: str) -> Dict[str, List[str]]:
+        """Recommendations for many users, with profiles and interests fetched in batches"""
+        profiles = profile_store.get_many(user_ids)
+        learned = interaction_log.top_interests_many(user_ids)
+        return {
+            user_id: recommendation_index.recommend(category, self.rank_interests(profiles[user_id], learned[user_id]))
+            for user_id in user_ids
         }
-        
-        if category in recommendations:
-            relevant_recs = []
-            for interest in interests:
-                if interest in recommendations[category]:
-                    relevant_recs.extend(recommendations[category][interest])
-            
-            return relevant_recs[:3] if relevant_recs else recommendations[category].get('spiritual', [])
-        
-        return []
     
-    def determine_role(self, query: str, user_context: Dict) -> str:
-        """Determine appropriate role based on query and context"""
-        
-        query_lower = query.lower()
+    @staticmethod
+    def rank_interests(profile: Dict, learned: List[str]) -> List[str]:
+        """Stated interests ordered by how much the user actually asks about them, then learned ones"""
+        stated = profile.get('interests', [])
+        interests = sorted(stated, key=lambda interest: learned.index(interest) if interest in learned else len(learned))
+        return interests + [interest for interest in learned if interest not in stated]
+    
+    # Checked in order; the keywords live in keyword_matcher.KEYWORD_TABLES
+    ROUTED_ROLES = ['cultural_expert', 'spiritual_guide', 'eco_advocate', 'travel_planner']
+    
+    def determine_role(self, query: str, user_context: Dict, matches: Optional[KeywordMatches] = None,
+                       predicted_role: Optional[str] = None) -> str:
+        """Determine appropriate role based on query and context
+
+        Explicit keywords win; otherwise the role predicted from the query
+        embedding is used, if any.
+        """
         
-        if any(word in query_lower for word in ['culture', 'history', 'tradition', 'mythology']):
-            return 'cultural_expert'
-        elif any(word in query_lower for word in ['spiritual', 'meditation', 'prayer', 'divine']):
-            return 'spiritual_guide'
-        elif any(word in query_lower for word in ['eco', 'environment', 'sustainable', 'green']):
-            return 'eco_advocate'
-        elif any(word in query_lower for word in ['plan', 'itinerary', 'book', 'travel', 'route']):
-            return 'travel_planner'
-        else:
-            return 'travel_companion'
+        matches = matches or keyword_matcher.match(query)
+        return self.keyword_role(matches) or predicted_role or 'travel_companion'
+    
+    def keyword_role(self, matches: KeywordMatches) -> Optional[str]:
+        """The role the query's keywords route to, or None if they do not decide it"""
+        for role in self.ROUTED_ROLES:
+            if matches.has(f"role:{role}"):
+                return role
+        return None
 
 # Global instances
 llm_service = LLMService()
@@ -0,0 +1,81 @@
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from chatbot.ann_index import IVFIndex, build_ivf_index
+
+
+def clustered_vectors(rng, count, dim, topics):
+    """Normalized vectors scattered around topic centres, like embeddings of a real corpus"""
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, topics, count)] + 1.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return latencies[len(latencies) // 2] * 1e3, latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3
+
+
+class Command(BaseCommand):
+    help = "Recall@k, query latency and bytes per vector of the IVF index against exact search"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=100_000, help='Synthetic vectors in the index')
+        parser.add_argument('--dim', type=int, default=384, help='Embedding dimension (all-MiniLM-L6-v2: 384)')
+        parser.add_argument('--topics', type=int, default=2000, help='Clusters in the synthetic corpus')
+        parser.add_argument('--queries', type=int, default=200, help='Queries timed per setting')
+        parser.add_argument('-k', type=int, default=10, help='Results per query')
+        parser.add_argument('--nlist', type=int, help='Inverted lists (default: 4 * sqrt(documents))')
+        parser.add_argument('--nprobe', default='1,4,16,64', help='Comma-separated nprobe values to compare')
+        parser.add_argument('--refine', default='1,4', help='Comma-separated refine factors to compare (1: int8 only)')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        k = options['k']
+        vectors = clustered_vectors(rng, options['documents'], options['dim'], options['topics'])
+        # Queries are perturbed corpus vectors: each has true neighbours in the corpus
+        queries = vectors[rng.integers(0, len(vectors), options['queries'])]
+        queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(options['dim'])
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact, latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            scores = vectors @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            latencies.append(time.perf_counter() - started)
+            exact.append(set(top.tolist()))
+        p50, p99 = percentiles(latencies)
+
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            meta = build_ivf_index(directory, vectors, nlist=options['nlist'])
+            build_seconds = time.perf_counter() - started
+            index = IVFIndex(directory)
+
+            self.stdout.write(
+                f"{meta['count']} vectors x {meta['dim']} dims, {meta['nlist']} lists, built in {build_seconds:.1f}s\n"
+                f"{'search':>20} {'recall@' + str(k):>10} {'p50':>9} {'p99':>9} {'bytes/vector':>13}\n"
+                f"{'exact f32':>20} {1.0:>10.3f} {p50:>7.3f}ms {p99:>7.3f}ms {vectors.itemsize * meta['dim']:>13}"
+            )
+            for refine in [int(value) for value in options['refine'].split(',')]:
+                # The float16 vectors are only read, and only count, when re-ranking
+                bytes_per_vector = index.bytes_per_vector()
+                if refine <= 1:
+                    bytes_per_vector -= index.refine_vectors.nbytes / len(index)
+                for nprobe in [int(value) for value in options['nprobe'].split(',')]:
+                    hits, latencies = 0, []
+                    for query, truth in zip(queries, exact):
+                        started = time.perf_counter()
+                        rows, _ = index.search(query, k, nprobe=nprobe, refine=refine)
+                        latencies.append(time.perf_counter() - started)
+                        hits += len(truth & set(rows.tolist()))
+                    p50, p99 = percentiles(latencies)
+                    self.stdout.write(
+                        f"{f'nprobe={nprobe} refine={refine}':>20} {hits / (k * len(queries)):>10.3f} "
+                        f"{p50:>7.3f}ms {p99:>7.3f}ms {bytes_per_vector:>13.1f}"
+                    )
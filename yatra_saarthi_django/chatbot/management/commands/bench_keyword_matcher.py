@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot.keyword_matcher import KEYWORD_TABLES, KeywordMatcher
+
+SAMPLE_MESSAGES = [
+    "What is the weather in Kedarnath this week?",
+    "I am feeling stressed after the long trek, any meditation tips?",
+    "Please plan a 12 day itinerary for the Char Dham yatra",
+    "Tell me the history and mythology of Badrinath temple",
+    "Where can I find an eco friendly homestay near Gangotri?",
+    "This is the greatest journey of my life, I am so happy",
+    "Is there an emergency helpline on the Yamunotri route?",
+    "Namaste, how are you today?",
+]
+
+
+def scaled_tables(factor):
+    """Keyword tables grown by adding synthetic keywords to every category"""
+    return {
+        category: keywords + [f"{keyword}x{copy}" for copy in range(1, factor) for keyword in keywords]
+        for category, keywords in KEYWORD_TABLES.items()
+    }
+
+
+def scan_substrings(tables, message):
+    """The previous approach: one lowercase and substring scan per table"""
+    return [category for category, keywords in tables.items()
+            if any(word in message.lower() for word in keywords)]
+
+
+class Command(BaseCommand):
+    help = "Compare per-message cost of per-table substring scans and the shared keyword automaton"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=2000, help='Passes over the sample messages')
+        parser.add_argument('--factors', default='1,4,16,64', help='Comma-separated table growth factors')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f"{'keywords':>9} {'substring scan':>16} {'automaton':>12} {'build':>10}")
+        for factor in [int(value) for value in options['factors'].split(',')]:
+            tables = scaled_tables(factor)
+            keyword_count = sum(len(keywords) for keywords in tables.values())
+
+            started = time.perf_counter()
+            matcher = KeywordMatcher(tables)
+            build_ms = (time.perf_counter() - started) * 1e3
+
+            naive_us = self._time(lambda message: scan_substrings(tables, message), repeat)
+            automaton_us = self._time(matcher.match, repeat)
+            self.stdout.write(
+                f"{keyword_count:>9} {naive_us:>14.1f}us {automaton_us:>10.1f}us {build_ms:>8.1f}ms"
+            )
+
+    def _time(self, function, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for message in SAMPLE_MESSAGES:
+                function(message)
+        return (time.perf_counter() - started) * 1e6 / (repeat * len(SAMPLE_MESSAGES))
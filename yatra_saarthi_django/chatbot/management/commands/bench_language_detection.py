@@ -0,0 +1,103 @@
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from chatbot.language_detection import LanguageDetector
+
+# Held-out labelled messages; none of them appear in the detector's training corpus
+LABELLED_SAMPLES = [
+    ("Is Yamunotri open in the month of May", 'en'),
+    ("How cold does it get at night in Badrinath", 'en'),
+    ("Suggest a vegetarian place to eat near Gangotri", 'en'),
+    ("My mother has knee pain, is there a pony service", 'en'),
+    ("Do I need a registration slip for the yatra", 'en'),
+    ("What time does the evening aarti start", 'en'),
+    ("Are ATMs available on the trek route", 'en'),
+    ("Please share some tips to avoid altitude sickness", 'en'),
+    ("Kedarnath", 'en'),
+    ("thanks a lot", 'en'),
+    ("Yamunotri mein mandir kab khulta hai", 'hi'),
+    ("Badrinath mein raat ko kitni thand hoti hai", 'hi'),
+    ("Gangotri ke paas shakahari khana kahan milega", 'hi'),
+    ("Meri maa ke ghutne mein dard hai, kya ghoda milega", 'hi'),
+    ("Kya yatra ke liye registration zaroori hai", 'hi'),
+    ("Shaam ki aarti kitne baje shuru hoti hai", 'hi'),
+    ("Raaste mein ATM milenge kya", 'hi'),
+    ("Pahadon mein tabiyat kharab na ho uske liye kya karein", 'hi'),
+    ("kedarnath kaise jaaye", 'hi'),
+    ("bahut shukriya", 'hi'),
+    ("केदारनाथ का मौसम कैसा है?", 'hi'),
+    ("मुझे बद्रीनाथ जाना है, रास्ता बताइए।", 'hi'),
+    ("मंदिर के पास ठहरने की जगह कहाँ है?", 'hi'),
+    ("केदारनाथचे हवामान कसे आहे?", 'mr'),
+    ("मला बद्रीनाथला जायचे आहे, रस्ता सांगा.", 'mr'),
+    ("मंदिराजवळ राहण्याची सोय कुठे आहे?", 'mr'),
+    ("ਕੇਦਾਰਨਾਥ ਦਾ ਮੌਸਮ ਕਿਹੋ ਜਿਹਾ ਹੈ?", 'pa'),
+    ("ਮੈਂ ਬਦਰੀਨਾਥ ਜਾਣਾ ਚਾਹੁੰਦਾ ਹਾਂ", 'pa'),
+    ("કેદારનાથનું હવામાન કેવું છે?", 'gu'),
+    ("મારે બદ્રીનાથ જવું છે", 'gu'),
+    ("கேதார்நாத் வானிலை எப்படி இருக்கிறது?", 'ta'),
+    ("நான் பத்ரிநாத் செல்ல விரும்புகிறேன்", 'ta'),
+    ("కేదార్‌నాథ్ వాతావరణం ఎలా ఉంది?", 'te'),
+    ("నేను బద్రీనాథ్ వెళ్లాలనుకుంటున్నాను", 'te'),
+    ("ಕೇದಾರನಾಥ ಹವಾಮಾನ ಹೇಗಿದೆ?", 'kn'),
+    ("ನಾನು ಬದರಿನಾಥಕ್ಕೆ ಹೋಗಬೇಕು", 'kn'),
+    ("കേദാർനാഥിലെ കാലാവസ്ഥ എങ്ങനെയാണ്?", 'ml'),
+    ("എനിക്ക് ബദരീനാഥിലേക്ക് പോകണം", 'ml'),
+    ("কেদারনাথের আবহাওয়া কেমন?", 'bn'),
+    ("আমি বদ্রীনাথ যেতে চাই", 'bn'),
+    ("کیدارناتھ کا موسم کیسا ہے؟", 'ur'),
+    ("میں بدری ناتھ جانا چاہتا ہوں", 'ur'),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure accuracy and latency of the offline language detector on a labelled sample"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='Timed passes over the sample')
+        parser.add_argument('--compare-remote', action='store_true',
+                            help='Also time googletrans detection (makes network calls)')
+
+    def handle(self, *args, **options):
+        detector = LanguageDetector()
+        self._report('local', detector.detect, options['repeat'])
+
+        if options['compare_remote']:
+            from googletrans import Translator
+            translator = Translator()
+            self._report('googletrans', lambda text: translator.detect(text).lang, 1)
+
+    def _report(self, name, detect, repeat):
+        errors = Counter()
+        per_language = Counter()
+        correct_per_language = Counter()
+        for text, expected in LABELLED_SAMPLES:
+            predicted = detect(text)
+            per_language[expected] += 1
+            if predicted == expected:
+                correct_per_language[expected] += 1
+            else:
+                errors[(expected, predicted)] += 1
+
+        timings = []
+        for _ in range(repeat):
+            for text, _expected in LABELLED_SAMPLES:
+                started = time.perf_counter()
+                detect(text)
+                timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+
+        correct = sum(correct_per_language.values())
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{name} detector"))
+        self.stdout.write(f"  accuracy: {correct}/{len(LABELLED_SAMPLES)} ({correct / len(LABELLED_SAMPLES):.1%})")
+        for lang in sorted(per_language):
+            self.stdout.write(f"    {lang}: {correct_per_language[lang]}/{per_language[lang]}")
+        for (expected, predicted), count in errors.most_common():
+            self.stdout.write(f"    {expected} misread as {predicted}: {count}")
+        self.stdout.write(
+            f"  latency: mean {statistics.mean(timings):.1f}us, "
+            f"p50 {timings[len(timings) // 2]:.1f}us, p99 {timings[int(len(timings) * 0.99)]:.1f}us"
+        )
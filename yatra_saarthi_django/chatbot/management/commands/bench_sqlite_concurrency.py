@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Connection setups compared by the benchmark: Django's SQLite defaults
+# (rollback journal, deferred transactions) and the configured profile
+PROFILES = {
+    'default': {'init_command': '', 'begin': 'BEGIN'},
+    'tuned': {'init_command': getattr(settings, 'SQLITE_INIT_COMMAND', ''), 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+def connect(path, init_command):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    for statement in init_command.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    return conn
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Mixed read/write throughput of SQLite with the default and the tuned connection profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--readers', type=int, default=8, help='Threads reading reference data')
+        parser.add_argument('--writers', type=int, default=4, help='Threads inserting chat messages')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'profile':>8} {'reads/s':>9} {'writes/s':>9} {'read p99':>10} {'write p99':>10} {'lock errors':>12}"
+        )
+        for name, profile in PROFILES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                result = self._run(os.path.join(directory, 'bench.sqlite3'), profile, options)
+            self.stdout.write(
+                f"{name:>8} {result['reads'] / options['seconds']:>9.0f} {result['writes'] / options['seconds']:>9.0f} "
+                f"{result['read_p99'] * 1e3:>8.2f}ms {result['write_p99'] * 1e3:>8.2f}ms {result['errors']:>12}"
+            )
+
+    def _run(self, path, profile, options):
+        setup = connect(path, profile['init_command'])
+        setup.execute("CREATE TABLE destination (id INTEGER PRIMARY KEY, name TEXT, description TEXT)")
+        setup.execute("CREATE TABLE message (id INTEGER PRIMARY KEY, session INTEGER, body TEXT, timestamp REAL)")
+        setup.executemany(
+            "INSERT INTO destination (name, description) VALUES (?, ?)",
+            [(f"Destination {i}", "A sacred site in the Garhwal Himalaya " * 5) for i in range(100)]
+        )
+        setup.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'errors': 0, 'read_latencies': [], 'write_latencies': []}
+
+        def reader():
+            conn = connect(path, profile['init_command'])
+            reads, errors, latencies = 0, 0, []
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute("SELECT id, name, description FROM destination").fetchall()
+                    reads += 1
+                    latencies.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors += 1
+            conn.close()
+            with lock:
+                result['reads'] += reads
+                result['errors'] += errors
+                result['read_latencies'].extend(latencies)
+
+        def writer(session):
+            conn = connect(path, profile['init_command'])
+            writes, errors, latencies = 0, 0, []
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute(profile['begin'])
+                    conn.execute("SELECT COUNT(*) FROM message WHERE session = ?", (session,)).fetchone()
+                    conn.execute(
+                        "INSERT INTO message (session, body, timestamp) VALUES (?, ?, ?)",
+                        (session, "How do I reach Kedarnath?", time.time())
+                    )
+                    conn.execute("COMMIT")
+                    writes += 1
+                    latencies.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                result['writes'] += writes
+                result['errors'] += errors
+                result['write_latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        result['read_p99'] = percentile(result['read_latencies'], 0.99)
+        result['write_p99'] = percentile(result['write_latencies'], 0.99)
+        return result
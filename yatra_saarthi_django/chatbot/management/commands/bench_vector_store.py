@@ -0,0 +1,117 @@
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chatbot.vector_store import NumpyVectorStore
+
+# Runs in a fresh interpreter, like a newly started worker: opens the store,
+# answers the queries and reports startup time, RSS and per-query latency
+WORKER_SCRIPT = r'''
+import json, sys, time
+import numpy as np
+
+def rss_mb():
+    with open('/proc/self/status') as handle:
+        for line in handle:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+backend, path, project_dir, queries_path, n_results = sys.argv[1:6]
+queries = np.load(queries_path)
+baseline = rss_mb()
+
+started = time.perf_counter()
+if backend == 'chroma':
+    import chromadb
+    store = chromadb.PersistentClient(path=path).get_collection('bench')
+else:
+    sys.path.insert(0, project_dir)
+    from chatbot.vector_store import NumpyVectorStore
+    store = NumpyVectorStore(path, dtype=backend.split(':')[1])
+store.query(query_embeddings=[queries[0].tolist()], n_results=int(n_results))
+startup = time.perf_counter() - started
+
+latencies = []
+for query in queries:
+    started = time.perf_counter()
+    store.query(query_embeddings=[query.tolist()], n_results=int(n_results))
+    latencies.append(time.perf_counter() - started)
+latencies.sort()
+
+print(json.dumps({
+    "startup_ms": startup * 1e3,
+    "rss_mb": rss_mb() - baseline,
+    "p50_ms": latencies[len(latencies) // 2] * 1e3,
+    "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = "Compare the chromadb and memory-mapped NumPy vector stores: startup, RSS per worker and query latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=5000, help='Synthetic documents in the store')
+        parser.add_argument('--dim', type=int, default=384, help='Embedding dimension (all-MiniLM-L6-v2: 384)')
+        parser.add_argument('--queries', type=int, default=500, help='Queries timed per backend')
+        parser.add_argument('--n-results', type=int, default=3, help='Results per query')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((options['documents'], options['dim'])).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = rng.standard_normal((options['queries'], options['dim'])).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        ids = [f"doc:{i}" for i in range(len(vectors))]
+        documents = [f"Synthetic knowledge base document {i}" for i in range(len(vectors))]
+        metadatas = [{"source": "bench", "category": "bench"} for _ in ids]
+
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            queries_path = directory / 'queries.npy'
+            np.save(queries_path, queries)
+
+            backends = []
+            for dtype in ('float32', 'float16'):
+                NumpyVectorStore(directory / dtype, dtype=dtype).upsert(ids, documents, metadatas, vectors)
+                backends.append((f"numpy:{dtype}", directory / dtype))
+
+            try:
+                import chromadb
+            except ImportError:
+                self.stdout.write("chromadb is not installed; benchmarking the NumPy store only")
+            else:
+                collection = chromadb.PersistentClient(path=str(directory / 'chroma')).create_collection(
+                    'bench', metadata={"hnsw:space": "cosine"}
+                )
+                for start in range(0, len(ids), 5000):
+                    collection.add(
+                        ids=ids[start:start + 5000],
+                        documents=documents[start:start + 5000],
+                        metadatas=metadatas[start:start + 5000],
+                        embeddings=vectors[start:start + 5000].tolist()
+                    )
+                backends.insert(0, ("chroma", directory / 'chroma'))
+
+            self.stdout.write(
+                f"{options['documents']} documents x {options['dim']} dims, {options['queries']} queries\n"
+                f"{'backend':>14} {'startup':>10} {'RSS':>9} {'p50':>9} {'p99':>9}"
+            )
+            for name, path in backends:
+                output = subprocess.run(
+                    [sys.executable, '-c', WORKER_SCRIPT, name, str(path), str(settings.BASE_DIR / 'yatra_saarthi_django'),
+                     str(queries_path), str(options['n_results'])],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                stats = json.loads(output.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{name:>14} {stats['startup_ms']:>8.1f}ms {stats['rss_mb']:>7.1f}MB "
+                    f"{stats['p50_ms']:>7.3f}ms {stats['p99_ms']:>7.3f}ms"
+                )
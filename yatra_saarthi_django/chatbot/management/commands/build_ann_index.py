@@ -0,0 +1,103 @@
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.ann_index import build_ivf_index, write_string_tables
+from chatbot.knowledge_base import FILTER_FIELDS
+from chatbot.llm_service import READINESS_READY, llm_service
+from chatbot.management.commands.ingest_knowledge import Command as IngestCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the approximate nearest-neighbour index (IVF, int8 codes) offline from a JSONL or CSV "
+        "file, chunked like ingest_knowledge. Embeddings are spilled to disk, so the corpus does not "
+        "need to fit in memory. Workers load the new index when they restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV file with one document per record')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Input format (default: from file extension)')
+        parser.add_argument('--output', help='Index directory (default: settings.ANN_INDEX_DIR)')
+        parser.add_argument('--batch-size', type=int, default=256, help='Chunks embedded per batch')
+        parser.add_argument('--chunk-words', type=int, default=200, help='Maximum words per chunk')
+        parser.add_argument('--chunk-overlap', type=int, default=40, help='Words shared by consecutive chunks')
+        parser.add_argument('--category', default='', help='Category stored on records that do not set one')
+        parser.add_argument('--nlist', type=int, help='Inverted lists (default: 4 * sqrt(chunks))')
+        parser.add_argument('--iterations', type=int, default=20, help='k-means iterations')
+        parser.add_argument('--sample-size', type=int, default=100_000, help='Vectors used to train k-means')
+        parser.add_argument('--refine-dtype', choices=['float16', 'float32', 'none'], default='float16',
+                            help='Dtype of the vectors kept to re-rank int8 candidates (none: int8 scores only)')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        input_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        output = Path(options['output'] or settings.ANN_INDEX_DIR)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        llm_service.ensure_loaded()
+        if llm_service.readiness != READINESS_READY:
+            raise CommandError(f"Embedding model unavailable: {llm_service.readiness_error}")
+        started = time.monotonic()
+
+        ingest = IngestCommand()
+        building = Path(tempfile.mkdtemp(prefix=f"{output.name}.", dir=output.parent))
+        try:
+            spill_path = building / 'vectors.f32'
+            dim = None
+            count = 0
+            with open(spill_path, 'wb') as spill, open(building / 'records.jsonl', 'w', encoding='utf-8') as staged:
+                pending = []
+                for record_number, record in enumerate(ingest._read_records(path, input_format)):
+                    pending.extend(ingest._record_chunks(record, record_number, path.stem, options))
+                    if len(pending) >= options['batch_size']:
+                        dim = self._embed_batch(pending, spill, staged, options['batch_size'])
+                        count += len(pending)
+                        pending = []
+                if pending:
+                    dim = self._embed_batch(pending, spill, staged, options['batch_size'])
+                    count += len(pending)
+            if not count:
+                raise CommandError("No documents in the input")
+            self.stdout.write(f"Embedded {count} chunks in {time.monotonic() - started:.1f}s")
+
+            with open(building / 'records.jsonl', encoding='utf-8') as staged:
+                write_string_tables(building, (tuple(json.loads(line)) for line in staged), FILTER_FIELDS)
+            vectors = np.memmap(spill_path, dtype=np.float32, mode='r', shape=(count, dim))
+            meta = build_ivf_index(building, vectors, nlist=options['nlist'], iterations=options['iterations'],
+                                   sample_size=options['sample_size'],
+                                   refine_dtype=None if options['refine_dtype'] == 'none' else options['refine_dtype'])
+            del vectors
+            spill_path.unlink()
+            (building / 'records.jsonl').unlink()
+
+            # Swap directories so that running workers keep their mapped files
+            previous = output.with_name(f"{output.name}.previous")
+            shutil.rmtree(previous, ignore_errors=True)
+            if output.exists():
+                output.rename(previous)
+            building.rename(output)
+            shutil.rmtree(previous, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {meta['nlist']} lists over {meta['count']} vectors in {time.monotonic() - started:.1f}s: {output}"
+        ))
+
+    def _embed_batch(self, documents, spill, staged, batch_size):
+        embeddings = np.asarray(
+            llm_service.embed_texts([doc["content"] for doc in documents], batch_size=batch_size), dtype=np.float32
+        )
+        spill.write(embeddings.tobytes())
+        for doc in documents:
+            staged.write(json.dumps([doc["id"], doc["content"], doc["metadata"]], ensure_ascii=False) + "\n")
+        return embeddings.shape[1]
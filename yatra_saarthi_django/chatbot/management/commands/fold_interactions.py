@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chatbot.interactions import interaction_log
+
+
+class Command(BaseCommand):
+    help = "Fold new interaction events into the per-user interest counters (run periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Events read from the database per chunk')
+
+    def handle(self, *args, **options):
+        stats = interaction_log.fold(batch_size=options['batch_size'])
+        self.stdout.write(f"Folded {stats['events']} events for {stats['users']} users in {stats['seconds']}s")
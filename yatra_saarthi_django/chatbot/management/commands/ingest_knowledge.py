@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.cache import bump_kb_version
+from chatbot.knowledge_base import SOURCE_INGEST, chunk_text, make_document
+from chatbot.llm_service import llm_service
+
+# Record fields holding the document text, in order of preference
+CONTENT_FIELDS = ('content', 'text', 'body')
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load documents into the RAG knowledge base from a JSONL or CSV file. "
+        "Long texts are chunked, embedded in batches and written in bulk; progress is "
+        "checkpointed so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV file with one document per record')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Input format (default: from file extension)')
+        parser.add_argument('--batch-size', type=int, default=64, help='Chunks embedded and written per batch')
+        parser.add_argument('--chunk-words', type=int, default=200, help='Maximum words per chunk')
+        parser.add_argument('--chunk-overlap', type=int, default=40, help='Words shared by consecutive chunks')
+        parser.add_argument('--category', default='', help='Category stored on records that do not set one')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        input_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        checkpoint_path = Path(options['checkpoint'] or f"{path}.checkpoint")
+        batch_size = options['batch_size']
+
+        collection = llm_service.collection
+        if collection is None:
+            raise CommandError(f"Knowledge base unavailable: {llm_service.readiness_error}")
+
+        checkpoint = {} if options['restart'] else self._read_checkpoint(checkpoint_path, path)
+        skip = checkpoint.get('records', 0)
+        if skip:
+            self.stdout.write(f"Resuming after {skip} records")
+
+        records_done = skip
+        chunks_done = checkpoint.get('chunks', 0)
+        run_chunks = 0
+        pending = []
+        started = time.monotonic()
+        run_records = 0
+
+        for record_number, record in enumerate(self._read_records(path, input_format)):
+            if record_number < skip:
+                continue
+
+            pending.extend(self._record_chunks(record, record_number, path.stem, options))
+            records_done = record_number + 1
+            run_records += 1
+
+            # Flush on record boundaries so the checkpoint never splits a record
+            if len(pending) >= batch_size:
+                self._write_batch(collection, pending, batch_size)
+                chunks_done += len(pending)
+                run_chunks += len(pending)
+                pending = []
+                self._write_checkpoint(checkpoint_path, path, records_done, chunks_done)
+                self._report(records_done, chunks_done, run_records, run_chunks, started)
+
+        if pending:
+            self._write_batch(collection, pending, batch_size)
+            chunks_done += len(pending)
+            run_chunks += len(pending)
+            self._write_checkpoint(checkpoint_path, path, records_done, chunks_done)
+
+        if run_chunks:
+            # Cached chat responses may have been built from the old corpus
+            bump_kb_version()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {run_records} records ({run_chunks} chunks) in {elapsed:.1f}s: "
+            f"{run_records / elapsed:.1f} docs/sec, {run_chunks / elapsed:.1f} chunks/sec "
+            f"({records_done} records, {chunks_done} chunks in total)"
+        ))
+
+    def _read_records(self, path, input_format):
+        """Stream records from the input file without loading it into memory"""
+        with open(path, newline='', encoding='utf-8') as handle:
+            if input_format == 'csv':
+                yield from csv.DictReader(handle)
+                return
+
+            for line_number, line in enumerate(handle, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise CommandError(f"Invalid JSON on line {line_number}: {e}")
+
+    def _record_chunks(self, record, record_number, default_prefix, options):
+        """Split one input record into knowledge base documents"""
+        content = next((record[field] for field in CONTENT_FIELDS if record.get(field)), '')
+        record_id = str(record.get('id') or f"{default_prefix}:{record_number}")
+
+        metadata = record.get('metadata') if isinstance(record.get('metadata'), dict) else {}
+        for key, value in record.items():
+            if key in CONTENT_FIELDS or key in ('id', 'metadata'):
+                continue
+            # The vector store only accepts scalar metadata values
+            if isinstance(value, (str, int, float, bool)) and value != '':
+                metadata.setdefault(key, value)
+        if options['category']:
+            metadata.setdefault('category', options['category'])
+        metadata['record_id'] = record_id
+
+        chunks = chunk_text(content, options['chunk_words'], options['chunk_overlap'])
+        documents = []
+        for index, chunk in enumerate(chunks):
+            chunk_metadata = dict(metadata, chunk=index)
+            documents.append(make_document(f"{record_id}#{index}", chunk, SOURCE_INGEST, chunk_metadata))
+        return documents
+
+    def _write_batch(self, collection, documents, batch_size):
+        contents = [doc["content"] for doc in documents]
+        collection.upsert(
+            ids=[doc["id"] for doc in documents],
+            documents=contents,
+            metadatas=[doc["metadata"] for doc in documents],
+            embeddings=llm_service.embed_texts(contents, batch_size=batch_size)
+        )
+
+    def _read_checkpoint(self, checkpoint_path, input_path):
+        if not checkpoint_path.exists():
+            return {}
+
+        with open(checkpoint_path, encoding='utf-8') as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('input') != str(input_path.resolve()):
+            raise CommandError(f"Checkpoint {checkpoint_path} belongs to another input; use --restart")
+        return checkpoint
+
+    def _write_checkpoint(self, checkpoint_path, input_path, records, chunks):
+        """Atomically record how many input records have been written"""
+        temp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({"input": str(input_path.resolve()), "records": records, "chunks": chunks}, handle)
+        os.replace(temp_path, checkpoint_path)
+
+    def _report(self, records_done, chunks_done, run_records, run_chunks, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f"{records_done} records, {chunks_done} chunks - "
+            f"{run_records / elapsed:.1f} docs/sec, {run_chunks / elapsed:.1f} chunks/sec"
+        )
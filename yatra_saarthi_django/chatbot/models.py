@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class ChatSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -7,6 +8,11 @@ class ChatSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='chatsession_updated_idx'),
+        ]
+    
     def __str__(self):
         return f"Session {self.session_id}"
 
@@ -14,11 +20,15 @@ class ChatMessage(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages')
     user_message = models.TextField()
     bot_response = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the message is built, not when it is saved: write-behind rows are inserted later
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     sentiment = models.CharField(max_length=50, null=True, blank=True)
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp', 'id'], name='chatmessage_session_ts_idx'),
+        ]
     
     def __str__(self):
         return f"Message at {self.timestamp}"
@@ -55,3 +65,32 @@ class LocalArtisan(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.craft_type}"
+
+class UserProfile(models.Model):
+    user_id = models.CharField(max_length=100, unique=True)
+    preferences = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Profile {self.user_id}"
+
+class InteractionEvent(models.Model):
+    """One chat turn of a known user; append-only, folded into UserInterest"""
+    user_id = models.CharField(max_length=100)
+    role = models.CharField(max_length=50)
+    destinations = models.CharField(max_length=200, blank=True)
+    sentiment = models.CharField(max_length=50)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    
+    def __str__(self):
+        return f"Interaction {self.user_id} at {self.timestamp}"
+
+class UserInterest(models.Model):
+    """Rolling interest counters of a user, a float32 array over INTEREST_DIMENSIONS"""
+    user_id = models.CharField(max_length=100, unique=True)
+    counters = models.BinaryField()
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Interests {self.user_id}"
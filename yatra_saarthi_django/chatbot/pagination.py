@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class SessionCursorPagination(CursorPagination):
+    """Chat sessions, most recently active first"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-updated_at', '-id')
+
+
+class MessageCursorPagination(CursorPagination):
+    """Messages of one session, newest first
+
+    Each page is a range scan on the (session, timestamp, id) index, so
+    fetching a page costs the same however long the conversation is.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-timestamp', '-id')
@@ -0,0 +1,277 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .cache import LRUCache
+from .models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def touch_sessions(session_pks: Iterable[int]):
+    """Mark sessions as active now with one UPDATE, for the most-recently-active session list
+
+    Needed because adding a message does not save its session, so
+    ``auto_now`` never moves ``updated_at``.
+    """
+    session_pks = set(session_pks)
+    if session_pks:
+        ChatSession.objects.filter(pk__in=session_pks).update(updated_at=timezone.now())
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue of unsaved model instances
+
+    A background thread writes queued instances with one bulk_create per
+    model once batch_size of them are waiting or the oldest has waited
+    flush_interval seconds. Whatever is still queued is flushed when the
+    process exits. ``after_write(model, instances)``, if given, runs after
+    each model's rows of a batch are written.
+    """
+
+    def __init__(self, maxsize: int = 10000, batch_size: int = 200, flush_interval: float = 1.0,
+                 after_write: Optional[Callable[[type, List[Any]], None]] = None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.after_write = after_write
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.overflows = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flush_seconds_total = 0.0
+        self.last_flush_seconds = None
+        self.max_flush_seconds = 0.0
+
+    def put(self, instance) -> bool:
+        """Queue an instance for writing; False when the queue is full and the caller must save it"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(instance)
+        except queue.Full:
+            self.overflows += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def flush(self):
+        """Write everything queued so far"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        """Stop the background thread and flush the remaining instances"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List[Any]):
+        by_model = {}
+        for instance in batch:
+            by_model.setdefault(type(instance), []).append(instance)
+
+        with self._write_lock:
+            close_old_connections()
+            started = time.perf_counter()
+            for model, instances in by_model.items():
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create(instances)
+                    self.flushed += len(instances)
+                except Exception as e:
+                    logger.error(f"Write-behind bulk insert of {len(instances)} {model.__name__} rows failed: {e}")
+                    instances = self._write_one_by_one(instances)
+                if self.after_write is not None and instances:
+                    try:
+                        self.after_write(model, instances)
+                    except Exception as e:
+                        logger.error(f"Write-behind after_write for {model.__name__} failed: {e}")
+
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.flush_seconds_total += elapsed
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def _write_one_by_one(self, instances: List[Any]) -> List[Any]:
+        """Save rows separately so that one bad row does not lose the whole batch; returns the saved rows"""
+        saved = []
+        for instance in instances:
+            try:
+                with transaction.atomic():
+                    instance.save(force_insert=True)
+                self.flushed += 1
+                saved.append(instance)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Dropping write-behind {type(instance).__name__} row: {e}")
+        return saved
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "overflows": self.overflows,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2) if self.last_flush_seconds is not None else None,
+            "avg_flush_ms": round(self.flush_seconds_total / self.flushes * 1000, 2) if self.flushes else None,
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+        }
+
+
+def _touch_message_sessions(model, instances):
+    if model is ChatMessage:
+        touch_sessions(instance.session_id for instance in instances)
+
+
+write_behind_queue = WriteBehindQueue(
+    maxsize=getattr(settings, 'WRITE_BEHIND_QUEUE_SIZE', 10000),
+    batch_size=getattr(settings, 'WRITE_BEHIND_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'WRITE_BEHIND_FLUSH_INTERVAL', 1.0),
+    after_write=_touch_message_sessions,
+)
+
+
+class ChatStore:
+    """Persists chat sessions and messages
+
+    With CHAT_WRITE_BEHIND enabled, session ids are resolved through an
+    in-process LRU and messages go through the write-behind queue, so a
+    chat request usually makes no database query of its own.
+    """
+
+    def __init__(self):
+        self.session_pks = LRUCache(maxsize=getattr(settings, 'CHAT_SESSION_CACHE_SIZE', 10000))
+
+    @property
+    def write_behind(self) -> bool:
+        return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+    def session_pk(self, session_id: str) -> int:
+        pk = self.session_pks.get(session_id)
+        if pk is None:
+            session, created = ChatSession.objects.get_or_create(
+                session_id=session_id,
+                defaults={'session_id': session_id}
+            )
+            pk = session.pk
+            self.session_pks.set(session_id, pk)
+        return pk
+
+    def save_message(self, session_id: str, user_message: str, bot_response: str, sentiment: str) -> ChatMessage:
+        """Record one exchange; with write-behind the row is written by a later flush"""
+        if not self.write_behind:
+            session, created = ChatSession.objects.get_or_create(
+                session_id=session_id,
+                defaults={'session_id': session_id}
+            )
+            chat_message = ChatMessage.objects.create(
+                session=session,
+                user_message=user_message,
+                bot_response=bot_response,
+                sentiment=sentiment
+            )
+            if not created:
+                touch_sessions([session.pk])
+            return chat_message
+
+        chat_message = ChatMessage(
+            session_id=self.session_pk(session_id),
+            user_message=user_message,
+            bot_response=bot_response,
+            sentiment=sentiment
+        )
+        if not write_behind_queue.put(chat_message):
+            chat_message.save()
+            touch_sessions([chat_message.session_id])
+        return chat_message
+
+    def save_messages(self, exchanges: List[Tuple[str, str, str, str]]) -> List[ChatMessage]:
+        """Record many (session_id, user_message, bot_response, sentiment) exchanges
+
+        Sessions are resolved with one query and created with one insert,
+        the messages are written with a single bulk_create, and the
+        sessions are marked active with a single update.
+        """
+        session_ids = list(dict.fromkeys(exchange[0] for exchange in exchanges))
+        pks = {}
+        for session_id in session_ids:
+            pk = self.session_pks.get(session_id)
+            if pk is not None:
+                pks[session_id] = pk
+        missing = [session_id for session_id in session_ids if session_id not in pks]
+        if missing:
+            existing = dict(ChatSession.objects.filter(session_id__in=missing).values_list('session_id', 'pk'))
+            new = [ChatSession(session_id=session_id) for session_id in missing if session_id not in existing]
+            if new:
+                ChatSession.objects.bulk_create(new, ignore_conflicts=True)
+                existing = dict(ChatSession.objects.filter(session_id__in=missing).values_list('session_id', 'pk'))
+            for session_id, pk in existing.items():
+                pks[session_id] = pk
+                self.session_pks.set(session_id, pk)
+
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(session_id=pks[session_id], user_message=user_message, bot_response=bot_response,
+                        sentiment=sentiment)
+            for session_id, user_message, bot_response, sentiment in exchanges
+        ])
+        touch_sessions(pks.values())
+        return messages
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            write_behind_queue.stats(),
+            enabled=self.write_behind,
+            session_cache=self.session_pks.stats(),
+        )
+
+
+chat_store = ChatStore()
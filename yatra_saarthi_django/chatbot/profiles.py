@@ -0,0 +1,90 @@
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import LRUCache
+from .models import UserProfile
+
+
+class ProfileStore:
+    """User profiles shared by every worker, with a bounded local tier
+
+    Profiles are stored in the database and read through the Django cache
+    and an in-process LRU. An update rewrites the database row and the
+    shared cache entry and drops the local copy; other workers pick it up
+    once their local entry expires (PROFILE_LOCAL_CACHE_TTL seconds).
+    """
+
+    def __init__(self):
+        self.local_cache = LRUCache(
+            maxsize=getattr(settings, 'PROFILE_LOCAL_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'PROFILE_LOCAL_CACHE_TTL', 30),
+        )
+
+    @staticmethod
+    def cache_key(user_id: str) -> str:
+        return f"yatra:profile:{user_id}"
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        profile = self.local_cache.get(user_id)
+        if profile is not None:
+            return profile
+
+        key = self.cache_key(user_id)
+        profile = cache.get(key)
+        if profile is None:
+            profile = UserProfile.objects.filter(user_id=user_id).values_list('preferences', flat=True).first() or {}
+            cache.set(key, profile, timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 3600))
+        self.local_cache.set(user_id, profile)
+        return profile
+
+    def get_many(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Profiles of many users with one shared cache round-trip and one query for the misses"""
+        profiles = {}
+        for user_id in user_ids:
+            profile = self.local_cache.get(user_id)
+            if profile is not None:
+                profiles[user_id] = profile
+
+        missing = [user_id for user_id in user_ids if user_id not in profiles]
+        if missing:
+            shared = cache.get_many([self.cache_key(user_id) for user_id in missing])
+            stored = {}
+            for user_id in missing:
+                profile = shared.get(self.cache_key(user_id))
+                if profile is None:
+                    stored[user_id] = {}
+                else:
+                    profiles[user_id] = profile
+            if stored:
+                stored.update(UserProfile.objects.filter(user_id__in=list(stored)).values_list('user_id', 'preferences'))
+                cache.set_many({self.cache_key(user_id): profile for user_id, profile in stored.items()},
+                               timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 3600))
+                profiles.update(stored)
+            for user_id in missing:
+                self.local_cache.set(user_id, profiles[user_id])
+        return profiles
+
+    def update(self, user_id: str, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge preferences into the stored profile and invalidate cached copies"""
+        with transaction.atomic():
+            profile, created = UserProfile.objects.get_or_create(user_id=user_id)
+            profile.preferences = dict(profile.preferences, **preferences)
+            profile.save(update_fields=['preferences', 'updated_at'])
+
+        cache.set(self.cache_key(user_id), profile.preferences,
+                  timeout=getattr(settings, 'PROFILE_CACHE_TIMEOUT', 24 * 3600))
+        self.local_cache.delete(user_id)
+        return profile.preferences
+
+    def invalidate(self, user_id: str):
+        cache.delete(self.cache_key(user_id))
+        self.local_cache.delete(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.local_cache.stats()
+
+
+profile_store = ProfileStore()
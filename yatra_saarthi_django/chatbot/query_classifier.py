@@ -0,0 +1,122 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Example queries per label; their normalized mean embedding is the label's centroid
+ROLE_PROTOTYPES = {
+    'cultural_expert': [
+        "Tell me the story behind this temple",
+        "What legends are associated with the Char Dham",
+        "Which festivals and rituals are celebrated here",
+        "Who built the shrine and when",
+        "What are the local customs of Garhwal",
+    ],
+    'spiritual_guide': [
+        "How can I find inner peace during the pilgrimage",
+        "Guide me through a short mantra chanting practice",
+        "I want to connect with God at the shrine",
+        "What is the significance of the evening aarti",
+        "How should I prepare my mind for darshan",
+    ],
+    'eco_advocate': [
+        "How can I reduce plastic waste on the trek",
+        "How do I travel without harming the mountains",
+        "Which homestays support the local community and nature",
+        "How do I dispose of rubbish responsibly in the Himalayas",
+        "What is the carbon footprint of a helicopter ride",
+    ],
+    'travel_planner': [
+        "How many days do I need for all four shrines",
+        "What is the best way to reach Kedarnath from Delhi",
+        "Suggest a schedule for visiting Badrinath and Gangotri",
+        "Where should I stay overnight on the way to Yamunotri",
+        "How do I get a helicopter ticket and registration",
+    ],
+    'travel_companion': [
+        "Hello, how are you",
+        "Thank you for your help",
+        "Can you help me with something",
+        "What can you do",
+        "Tell me something interesting",
+    ],
+}
+
+SENTIMENT_PROTOTYPES = {
+    'stressed': [
+        "I am exhausted and cannot cope with this trip",
+        "Everything is going wrong and I feel overwhelmed",
+        "The crowds and delays are getting on my nerves",
+    ],
+    'anxious': [
+        "I am afraid of the altitude and the steep climb",
+        "What if the road closes and we get stuck",
+        "I am not sure it is safe for my elderly parents",
+    ],
+    'excited': [
+        "I can't wait to see the temple, this is a dream come true",
+        "We are so happy to finally be going on the yatra",
+        "This trip is going to be fantastic",
+    ],
+    'peaceful': [
+        "Sitting by the river I feel completely at peace",
+        "The mountains make me feel calm and content",
+        "I feel serene and grateful after the darshan",
+    ],
+    'neutral': [
+        "What time does the temple open",
+        "How far is Gangotri from Uttarkashi",
+        "Is there a bank near the bus stand",
+    ],
+}
+
+
+class QueryClassifier:
+    """Nearest-centroid role and sentiment classification over a query embedding
+
+    Prototype sentences are embedded once when the model loads. Every label
+    centroid lives in one matrix, so classifying a query is a single
+    matrix-vector product over embeddings the request already computed.
+    A label is only predicted when its similarity reaches min_similarity.
+    """
+
+    def __init__(self, role_prototypes: Dict[str, List[str]], sentiment_prototypes: Dict[str, List[str]],
+                 min_similarity: float = 0.3):
+        self.groups = {'role': role_prototypes, 'sentiment': sentiment_prototypes}
+        self.min_similarity = min_similarity
+        self.labels = []  # (group, label) per centroid row
+        self.centroids = None
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    def fit(self, embed: Callable[[List[str]], Sequence[Sequence[float]]]):
+        """Embed every prototype in one batch and build the centroid matrix"""
+        import numpy as np
+
+        labels, texts, owners = [], [], []
+        for group, prototypes in self.groups.items():
+            for label, examples in prototypes.items():
+                labels.append((group, label))
+                texts.extend(examples)
+                owners.extend([len(labels) - 1] * len(examples))
+
+        embeddings = np.asarray(embed(texts), dtype=np.float32)
+        owners = np.asarray(owners)
+        centroids = np.stack([embeddings[owners == row].mean(axis=0) for row in range(len(labels))])
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+
+        self.labels = labels
+        self.centroids = centroids
+
+    def classify(self, embedding: Sequence[float]) -> Dict[str, Optional[str]]:
+        """Best label per group for a normalized query embedding, or None when nothing is close enough"""
+        if self.centroids is None:
+            return {group: None for group in self.groups}
+
+        import numpy as np
+
+        similarities = self.centroids @ np.asarray(embedding, dtype=np.float32)
+        best = {group: (None, self.min_similarity) for group in self.groups}
+        for (group, label), similarity in zip(self.labels, similarities.tolist()):
+            if similarity >= best[group][1]:
+                best[group] = (label, similarity)
+        return {group: label for group, (label, similarity) in best.items()}
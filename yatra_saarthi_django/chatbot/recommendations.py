@@ -0,0 +1,56 @@
+from typing import Dict, List, Sequence
+
+# Items recommended per category and interest, best first
+RECOMMENDATION_CATALOG = {
+    'meditation': {
+        'spiritual': ["Guided meditation at temple premises", "Sunrise meditation facing peaks"],
+        'adventure': ["Walking meditation on trails", "Breathing exercises during treks"],
+        'nature': ["Forest meditation", "River-side mindfulness practice"]
+    },
+    'activities': {
+        'spiritual': ["Temple visits", "Aarti participation", "Scripture reading"],
+        'adventure': ["Trekking", "River rafting", "Rock climbing"],
+        'cultural': ["Local festivals", "Artisan workshops", "Traditional cooking"]
+    }
+}
+
+
+class RecommendationIndex:
+    """Recommendation catalog compiled once into per-category interest -> items postings
+
+    For several interests the postings are merged: an item scores the
+    weight of every interest that lists it (1 for the strongest interest,
+    1/2 for the next, ...), so items shared by several interests rise and
+    duplicates collapse into one entry.
+    """
+
+    def __init__(self, catalog: Dict[str, Dict[str, List[str]]], default_interest: str = 'spiritual', limit: int = 3):
+        self.limit = limit
+        self.postings = {
+            category: {interest: tuple(items) for interest, items in interests.items()}
+            for category, interests in catalog.items()
+        }
+        self.defaults = {
+            category: list(interests.get(default_interest, ()))
+            for category, interests in self.postings.items()
+        }
+
+    def recommend(self, category: str, interests: Sequence[str]) -> List[str]:
+        """Top items for interests ordered strongest first; the default interest's items when none match"""
+        postings = self.postings.get(category)
+        if postings is None:
+            return []
+
+        scores = {}
+        for rank, interest in enumerate(interests):
+            weight = 1.0 / (rank + 1)
+            for item in postings.get(interest, ()):
+                # Insertion order breaks ties in favour of stronger interests and earlier items
+                scores[item] = scores.get(item, 0.0) + weight
+
+        if not scores:
+            return list(self.defaults[category])
+        return sorted(scores, key=scores.get, reverse=True)[:self.limit]
+
+
+recommendation_index = RecommendationIndex(RECOMMENDATION_CATALOG)
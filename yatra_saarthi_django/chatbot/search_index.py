@@ -0,0 +1,126 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Iterable, List, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from', 'how', 'i', 'in', 'is',
+    'it', 'me', 'my', 'of', 'on', 'or', 'the', 'there', 'this', 'to', 'what', 'when', 'where', 'which',
+    'who', 'with', 'you', 'your',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked lists of ids, best first: each id scores the sum of 1 / (k + rank)
+
+    Only ranks are used, so BM25 scores and cosine distances need no
+    common scale.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class InvertedIndex:
+    """In-memory inverted index with BM25 ranking
+
+    Built once from (doc_id, text, payload) triples and then read-only;
+    rebuild a new index to pick up changes. A query only touches the
+    postings of its own terms, so cost grows with matches, not corpus size.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, str, Any]] = (), k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.payloads = []
+        self.doc_lengths = []
+        self.postings = {}
+
+        for doc_id, text, payload in documents:
+            position = len(self.doc_ids)
+            tokens = tokenize(text)
+            self.doc_ids.append(doc_id)
+            self.payloads.append(payload)
+            self.doc_lengths.append(len(tokens))
+            for token, frequency in Counter(tokens).items():
+                self.postings.setdefault(token, []).append((position, frequency))
+
+        count = len(self.doc_ids)
+        self.average_length = sum(self.doc_lengths) / count if count else 0.0
+        self.idf = {
+            token: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, str, Any]]:
+        """Top documents for the query as (score, doc_id, payload), best first"""
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf[token]
+            for position, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.average_length or 1)
+                weight = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                scores[position] = scores.get(position, 0.0) + weight
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.doc_ids[position], self.payloads[position]) for position, score in best]
+
+
+class VersionedIndex:
+    """Process-local InvertedIndex rebuilt when a shared version counter changes
+
+    The version is read at most once per check interval, so searches between
+    checks are served from memory without touching the cache or database.
+    """
+
+    def __init__(self, build: Callable[[], Iterable[Tuple[str, str, Any]]], get_version: Callable[[], int],
+                 check_interval: float = 5.0):
+        self.build = build
+        self.get_version = get_version
+        self.check_interval = check_interval
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def get(self) -> InvertedIndex:
+        if self._index is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._index
+            version = self.get_version()
+            if self._index is None or version != self._version:
+                self._index = InvertedIndex(self.build())
+                self._version = version
+                self.rebuilds += 1
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self):
+        """Force a version check on the next search"""
+        self._checked_at = 0.0
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[float, str, Any]]:
+        return self.get().search(query, limit)
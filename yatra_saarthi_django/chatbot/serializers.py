@@ -32,11 +32,16 @@ class ChatRequestSerializer(serializers.Serializer):
     session_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
     context = serializers.JSONField(required=False, default=dict)
 
+class BatchChatItemSerializer(ChatRequestSerializer):
+    user_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    role = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
 class ChatResponseSerializer(serializers.Serializer):
     response = serializers.CharField()
     session_id = serializers.CharField()
     timestamp = serializers.DateTimeField()
     sentiment = serializers.CharField()
+    retrieval_path = serializers.CharField(allow_null=True, required=False)
 
 class WeatherRequestSerializer(serializers.Serializer):
     location = serializers.CharField(max_length=100)
@@ -1,8 +1,23 @@
+import gzip
+import hashlib
+import json
 import requests
 import random
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
 from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from requests.adapters import HTTPAdapter
 from .models import Destination, EcoTip, LocalArtisan
-from .llm_service import llm_service, personalization_service
+from .cache import response_cache, normalize_text, get_version, bump_version, OFFLINE_DATA_VERSION_KEY
+from .keyword_matcher import keyword_matcher
+from .search_index import VersionedIndex
+from .interactions import interaction_log
+from .llm_service import llm_service, personalization_service, split_sentences
 from .voice_service import voice_service, multilingual_service
 
 # Free APIs configuration
@@ -87,10 +102,112 @@ MEDITATION_RECOMMENDATIONS = {
     ]
 }
 
+def _build_weather_session():
+    """Keep-alive HTTP session for OpenWeather, pooled across requests in this process"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(settings, 'WEATHER_POOL_SIZE', 10))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 class WeatherService:
+    """Weather lookups cached per location with stale-while-revalidate
+
+    A fresh entry (younger than WEATHER_CACHE_TTL) is served from the shared
+    Django cache. An expired entry is still served for WEATHER_STALE_TTL more
+    seconds while a single background refresh runs across all workers.
+    """
+    session = _build_weather_session()
+    stats = {
+        "hits": 0,
+        "stale_hits": 0,
+        "misses": 0,
+        "upstream_calls": 0,
+        "upstream_errors": 0,
+        "background_refreshes": 0,
+    }
+    _fetch_locks = {}  # cache key -> [lock, threads holding or waiting for it]
+    _fetch_locks_guard = threading.Lock()
+    
     @staticmethod
     def get_weather_data(location):
         """Get weather data for a location"""
+        key = WeatherService._cache_key(location)
+        entry = cache.get(key)
+        if entry is not None:
+            if time.time() - entry["fetched_at"] < getattr(settings, 'WEATHER_CACHE_TTL', 600):
+                WeatherService.stats["hits"] += 1
+            else:
+                WeatherService.stats["stale_hits"] += 1
+                WeatherService._refresh_in_background(location)
+            return dict(entry["data"], location=location)
+        
+        WeatherService.stats["misses"] += 1
+        # Concurrent misses for one location in this process share a single upstream call
+        with WeatherService._fetch_lock(key):
+            entry = cache.get(key)
+            if entry is not None:
+                return dict(entry["data"], location=location)
+            return WeatherService._fetch_and_store(location)
+    
+    @staticmethod
+    def get_stats():
+        stats = dict(WeatherService.stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else None
+        return stats
+    
+    @staticmethod
+    def _cache_key(location):
+        return f"yatra:weather:{normalize_text(location)}"
+    
+    @staticmethod
+    @contextmanager
+    def _fetch_lock(key):
+        """Per-location lock, dropped once no thread holds or waits for it so the table stays small"""
+        with WeatherService._fetch_locks_guard:
+            entry = WeatherService._fetch_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with WeatherService._fetch_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del WeatherService._fetch_locks[key]
+    
+    @staticmethod
+    def _refresh_in_background(location):
+        """Start one refresh of a stale entry; the cache lock keeps other workers from doing the same"""
+        lock_key = f"{WeatherService._cache_key(location)}:refreshing"
+        if not cache.add(lock_key, True, timeout=30):
+            return
+        
+        def refresh():
+            try:
+                WeatherService._fetch_and_store(location)
+            finally:
+                cache.delete(lock_key)
+        
+        WeatherService.stats["background_refreshes"] += 1
+        threading.Thread(target=refresh, name='weather-refresh', daemon=True).start()
+    
+    @staticmethod
+    def _fetch_and_store(location):
+        data = WeatherService._fetch_weather_data(location)
+        if data:
+            timeout = getattr(settings, 'WEATHER_CACHE_TTL', 600) + getattr(settings, 'WEATHER_STALE_TTL', 3600)
+            cache.set(
+                WeatherService._cache_key(location),
+                {"data": data, "fetched_at": time.time()},
+                timeout=timeout
+            )
+        return data
+    
+    @staticmethod
+    def _fetch_weather_data(location):
+        """Fetch weather data for a location from OpenWeather"""
         try:
             if WEATHER_API_KEY == "your_openweather_api_key":
                 # Return mock data if no API key
@@ -107,7 +224,8 @@ class WeatherService:
                 "appid": WEATHER_API_KEY,
                 "units": "metric"
             }
-            response = requests.get(WEATHER_BASE_URL, params=params, timeout=5)
+            WeatherService.stats["upstream_calls"] += 1
+            response = WeatherService.session.get(WEATHER_BASE_URL, params=params, timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 return {
@@ -117,110 +235,360 @@ class WeatherService:
                     "wind_speed": data["wind"]["speed"],
                     "location": location
                 }
+            WeatherService.stats["upstream_errors"] += 1
         except Exception as e:
+            WeatherService.stats["upstream_errors"] += 1
             print(f"Weather API error: {e}")
         
         return None
 
 class SentimentAnalysisService:
+    # Checked in order; the keywords live in keyword_matcher.KEYWORD_TABLES
+    SENTIMENTS = ["stressed", "anxious", "excited", "peaceful"]
+    
     @staticmethod
-    def analyze_sentiment(text):
-        """Simple sentiment analysis based on keywords"""
-        text_lower = text.lower()
-        
-        stress_keywords = ["stress", "worried", "anxious", "nervous", "overwhelmed", "tired"]
-        anxiety_keywords = ["scared", "fear", "panic", "worry", "uncertain"]
-        excitement_keywords = ["excited", "happy", "thrilled", "amazing", "wonderful", "great"]
-        peaceful_keywords = ["calm", "peaceful", "relaxed", "serene", "tranquil"]
-        
-        if any(word in text_lower for word in stress_keywords):
-            return "stressed"
-        elif any(word in text_lower for word in anxiety_keywords):
-            return "anxious"
-        elif any(word in text_lower for word in excitement_keywords):
-            return "excited"
-        elif any(word in text_lower for word in peaceful_keywords):
-            return "peaceful"
-        
-        return "neutral"
+    def analyze_sentiment(text, matches=None, predicted_sentiment=None):
+        """Sentiment from keywords, else from the query embedding if one was predicted"""
+        matches = matches or keyword_matcher.match(text)
+        
+        for sentiment in SentimentAnalysisService.SENTIMENTS:
+            if matches.has(f"sentiment:{sentiment}"):
+                return sentiment
+        
+        return predicted_sentiment or "neutral"
 
 class ChatbotService:
     @staticmethod
     def generate_response(user_message, user_context=None, user_id=None, role=None):
         """Generate chatbot response based on user message"""
+        return ChatbotService.generate_reply(user_message, user_context, user_id, role)['response']
+    
+    # Cache key role of replies whose role the service picks from the query
+    # embedding, because neither the client nor the keywords chose one
+    AUTO_ROLE = 'auto'
+    
+    @staticmethod
+    def _route(user_message, role=None):
+        """Language, keyword matches and cache key role of a message, without translating or embedding it"""
+        detected_lang = llm_service.detect_language(user_message)
+        matches = keyword_matcher.match(user_message)
+        cache_role = role or personalization_service.keyword_role(matches) or ChatbotService.AUTO_ROLE
+        return detected_lang, matches, cache_role
+    
+    @staticmethod
+    def _resolve_role(user_message, user_context, cache_role, analysis):
+        """The reply role once the message has been analyzed on a cache miss"""
+        if cache_role != ChatbotService.AUTO_ROLE:
+            return cache_role
+        return personalization_service.determine_role(
+            user_message, user_context or {}, analysis.matches, analysis.predicted_role
+        )
+    
+    @staticmethod
+    def generate_reply(user_message, user_context=None, user_id=None, role=None):
+        """Generate the chatbot reply and sentiment, serving repeated questions from the response cache"""
         
-        # Determine role dynamically if not specified
-        if not role:
-            role = personalization_service.determine_role(user_message, user_context or {})
+        # Language detection and keyword routing are cheap, so the cache is
+        # checked before the message is translated or embedded
+        detected_lang, matches, cache_role = ChatbotService._route(user_message, role)
         
-        # Use advanced LLM service for response generation
-        try:
-            llm_response = llm_service.generate_response(
-                user_message, 
-                user_context or {}, 
-                role
-            )
+        reply = response_cache.get(user_message, cache_role, detected_lang)
+        if reply is None:
+            # One keyword scan and one embedding serve role routing, retrieval,
+            # sentiment and the fallback
+            analysis = llm_service.analyze_query(user_message, detected_lang, matches)
+            matches = analysis.matches
+            role = ChatbotService._resolve_role(user_message, user_context, cache_role, analysis)
             
-            # Add personalized recommendations if user_id provided
-            if user_id:
-                recommendations = personalization_service.get_personalized_recommendations(
-                    user_id, 'activities'
+            # Use advanced LLM service for response generation
+            try:
+                llm_response = llm_service.generate_response(
+                    user_message, 
+                    user_context or {}, 
+                    role,
+                    analysis=analysis
                 )
-                if recommendations:
-                    llm_response['recommendations'] = recommendations
+                reply = {
+                    "response": llm_response['response'],
+                    "retrieval_path": llm_response.get('retrieval_path'),
+                    "cacheable": llm_response.get('cacheable', True)
+                }
+            except Exception as e:
+                # Fallback to rule-based system
+                reply = ChatbotService._fallback_response(user_message, user_context, matches)
             
-            return llm_response['response']
+            ChatbotService._complete_reply(reply, user_message, role, detected_lang, analysis, cache_role)
+        else:
+            reply['cached'] = True
+        
+        ChatbotService._record_interaction(reply, user_id, matches)
+        ChatbotService._add_recommendations(reply, user_id)
+        return reply
+    
+    @staticmethod
+    async def agenerate_reply(user_message, user_context=None, user_id=None, role=None):
+        """Async variant of generate_reply; blocking stages run off the event loop"""
+        
+        detected_lang, matches, cache_role = ChatbotService._route(user_message, role)
+        
+        reply = await sync_to_async(response_cache.get, thread_sensitive=False)(user_message, cache_role, detected_lang)
+        if reply is None:
+            analysis = await llm_service.aanalyze_query(user_message, detected_lang, matches)
+            matches = analysis.matches
+            role = ChatbotService._resolve_role(user_message, user_context, cache_role, analysis)
             
-        except Exception as e:
-            # Fallback to rule-based system
-            return ChatbotService._fallback_response(user_message, user_context)
+            try:
+                llm_response = await llm_service.agenerate_response(
+                    user_message,
+                    user_context or {},
+                    role,
+                    analysis=analysis
+                )
+                reply = {
+                    "response": llm_response['response'],
+                    "retrieval_path": llm_response.get('retrieval_path'),
+                    "cacheable": llm_response.get('cacheable', True)
+                }
+            except Exception as e:
+                reply = await sync_to_async(ChatbotService._fallback_response, thread_sensitive=False)(
+                    user_message, user_context, matches
+                )
+            
+            await sync_to_async(ChatbotService._complete_reply, thread_sensitive=False)(
+                reply, user_message, role, detected_lang, analysis, cache_role
+            )
+        else:
+            reply['cached'] = True
+        
+        ChatbotService._record_interaction(reply, user_id, matches)
+        # Profile and interest lookups use the ORM and the cache
+        await sync_to_async(ChatbotService._add_recommendations, thread_sensitive=True)(reply, user_id)
+        return reply
     
     @staticmethod
-    def _fallback_response(user_message, user_context=None):
-        """Fallback rule-based response system"""
-        message_lower = user_message.lower()
+    def stream_reply(user_message, user_context=None, user_id=None, role=None):
+        """generate_reply as a stream of (event, data) pairs for server-sent events
+
+        Yields ('stage', name) as the pipeline progresses and ('sentence',
+        text) as each translated sentence is ready, and finally ('reply',
+        reply) with the completed reply. Cached replies are streamed at once.
+        """
+        yield 'stage', 'analyzing'
+        detected_lang, matches, cache_role = ChatbotService._route(user_message, role)
+        
+        reply = response_cache.get(user_message, cache_role, detected_lang)
+        if reply is not None:
+            reply['cached'] = True
+            for sentence in split_sentences(reply['response']):
+                yield 'sentence', sentence
+        else:
+            analysis = llm_service.analyze_query(user_message, detected_lang, matches)
+            matches = analysis.matches
+            role = ChatbotService._resolve_role(user_message, user_context, cache_role, analysis)
+            
+            sentences = []
+            try:
+                for event, data in llm_service.stream_response(analysis, role, user_context or {}):
+                    if event == 'response':
+                        reply = {
+                            "response": data['response'],
+                            "retrieval_path": data.get('retrieval_path'),
+                            "cacheable": data.get('cacheable', True)
+                        }
+                    else:
+                        if event == 'sentence':
+                            sentences.append(data)
+                        yield event, data
+            except Exception as e:
+                if sentences:
+                    # Keep what the client has already shown
+                    reply = {"response": " ".join(sentences), "cacheable": False}
+                else:
+                    reply = ChatbotService._fallback_response(user_message, user_context, matches)
+                    for sentence in split_sentences(reply['response']):
+                        yield 'sentence', sentence
+            
+            ChatbotService._complete_reply(reply, user_message, role, detected_lang, analysis, cache_role)
+        
+        ChatbotService._record_interaction(reply, user_id, matches)
+        ChatbotService._add_recommendations(reply, user_id)
+        yield 'reply', reply
+    
+    @staticmethod
+    async def astream_reply(user_message, user_context=None, user_id=None, role=None):
+        """Async variant of stream_reply; blocking stages run off the event loop"""
+        yield 'stage', 'analyzing'
+        detected_lang, matches, cache_role = ChatbotService._route(user_message, role)
+        
+        reply = await sync_to_async(response_cache.get, thread_sensitive=False)(
+            user_message, cache_role, detected_lang
+        )
+        if reply is not None:
+            reply['cached'] = True
+            for sentence in split_sentences(reply['response']):
+                yield 'sentence', sentence
+        else:
+            analysis = await llm_service.aanalyze_query(user_message, detected_lang, matches)
+            matches = analysis.matches
+            role = ChatbotService._resolve_role(user_message, user_context, cache_role, analysis)
+            
+            sentences = []
+            try:
+                async for event, data in llm_service.astream_response(analysis, role, user_context or {}):
+                    if event == 'response':
+                        reply = {
+                            "response": data['response'],
+                            "retrieval_path": data.get('retrieval_path'),
+                            "cacheable": data.get('cacheable', True)
+                        }
+                    else:
+                        if event == 'sentence':
+                            sentences.append(data)
+                        yield event, data
+            except Exception as e:
+                if sentences:
+                    reply = {"response": " ".join(sentences), "cacheable": False}
+                else:
+                    reply = await sync_to_async(ChatbotService._fallback_response, thread_sensitive=False)(
+                        user_message, user_context, matches
+                    )
+                    for sentence in split_sentences(reply['response']):
+                        yield 'sentence', sentence
+            
+            await sync_to_async(ChatbotService._complete_reply, thread_sensitive=False)(
+                reply, user_message, role, detected_lang, analysis, cache_role
+            )
+        
+        ChatbotService._record_interaction(reply, user_id, matches)
+        await sync_to_async(ChatbotService._add_recommendations, thread_sensitive=True)(reply, user_id)
+        yield 'reply', reply
+    
+    @staticmethod
+    def generate_replies(requests):
+        """generate_reply for many {message, context, user_id, role} requests, in order
+
+        Cached replies are served first; detection, translation and
+        embedding of the rest are batched across the requests, and failed
+        replies are handled per request.
+        """
+        replies = [None] * len(requests)
+        matches = [None] * len(requests)
+        pending = []
+        for position, request in enumerate(requests):
+            detected_lang, matches[position], cache_role = ChatbotService._route(request['message'], request.get('role'))
+            reply = response_cache.get(request['message'], cache_role, detected_lang)
+            if reply is None:
+                pending.append((position, cache_role))
+            else:
+                reply['cached'] = True
+                replies[position] = reply
+        
+        analyses = llm_service.analyze_queries([requests[position]['message'] for position, _ in pending]) if pending else []
+        roles = [
+            ChatbotService._resolve_role(requests[position]['message'], requests[position].get('context'), cache_role, analysis)
+            for (position, cache_role), analysis in zip(pending, analyses)
+        ]
+        responses = llm_service.generate_responses([
+            (analysis, role, requests[position].get('context') or {})
+            for (position, _), analysis, role in zip(pending, analyses, roles)
+        ])
+        for (position, cache_role), analysis, role, llm_response in zip(pending, analyses, roles, responses):
+            request = requests[position]
+            matches[position] = analysis.matches
+            if llm_response is None:
+                reply = ChatbotService._fallback_response(request['message'], request.get('context'), analysis.matches)
+            else:
+                reply = {
+                    "response": llm_response['response'],
+                    "retrieval_path": llm_response.get('retrieval_path'),
+                    "cacheable": llm_response.get('cacheable', True)
+                }
+            ChatbotService._complete_reply(reply, request['message'], role, analysis.detected_lang, analysis, cache_role)
+            replies[position] = reply
+        
+        for request, reply, request_matches in zip(requests, replies, matches):
+            ChatbotService._record_interaction(reply, request.get('user_id'), request_matches)
+            ChatbotService._add_recommendations(reply, request.get('user_id'))
+        return replies
+    
+    @staticmethod
+    def _complete_reply(reply, user_message, role, detected_lang, analysis, cache_role=None):
+        """Add sentiment, role and language to a fresh reply and cache it if allowed"""
+        reply['sentiment'] = SentimentAnalysisService.analyze_sentiment(
+            user_message, analysis.matches, analysis.predicted_sentiment
+        )
+        reply['role'] = role
+        reply['detected_language'] = detected_lang
+        if reply.pop('cacheable'):
+            response_cache.set(user_message, cache_role or role, detected_lang, reply)
+        reply['cached'] = False
+    
+    @staticmethod
+    def _record_interaction(reply, user_id, matches):
+        """Log the turn of a known user for interest-based recommendations"""
+        if user_id:
+            interaction_log.record(user_id, reply['role'], matches.names('destination:'), reply['sentiment'])
+    
+    @staticmethod
+    def _add_recommendations(reply, user_id):
+        """Add personalized recommendations if user_id provided"""
+        if user_id:
+            recommendations = personalization_service.get_personalized_recommendations(
+                user_id, 'activities'
+            )
+            if recommendations:
+                reply['recommendations'] = recommendations
+    
+    @staticmethod
+    def _fallback_response(user_message, user_context=None, matches=None):
+        """Fallback rule-based response system
+
+        Returns the response text and whether it may be cached; replies built
+        from live weather or a random choice must not be.
+        """
+        matches = matches or keyword_matcher.match(user_message)
         
         # Weather queries
-        if "weather" in message_lower:
+        if matches.has("intent:weather"):
             for location, data in CHAR_DHAM_DATA.items():
-                if location in message_lower or data["name"].lower() in message_lower:
+                if matches.has(f"destination:{location}"):
                     weather = WeatherService.get_weather_data(data["name"])
                     if weather:
-                        return f"Current weather in {data['name']}: {weather['temperature']}°C, {weather['description']}. Humidity: {weather['humidity']}%, Wind: {weather['wind_speed']} m/s. {data['name']} is best visited from {data['best_time']}."
+                        return {"response": f"Current weather in {data['name']}: {weather['temperature']}°C, {weather['description']}. Humidity: {weather['humidity']}%, Wind: {weather['wind_speed']} m/s. {data['name']} is best visited from {data['best_time']}.", "cacheable": False}
                     else:
-                        return f"I couldn't get current weather data for {data['name']}, but generally {data['name']} is best visited from {data['best_time']}."
+                        return {"response": f"I couldn't get current weather data for {data['name']}, but generally {data['name']} is best visited from {data['best_time']}.", "cacheable": False}
         
         # Char Dham information
         for location, data in CHAR_DHAM_DATA.items():
-            if location in message_lower or data["name"].lower() in message_lower:
-                return f"{data['name']}: {data['description']}. Located at {data['altitude']} altitude. Best time to visit: {data['best_time']}. Mythology: {data['mythology']}"
+            if matches.has(f"destination:{location}"):
+                return {"response": f"{data['name']}: {data['description']}. Located at {data['altitude']} altitude. Best time to visit: {data['best_time']}. Mythology: {data['mythology']}", "cacheable": True}
         
         # Eco-tourism tips
-        if any(word in message_lower for word in ["eco", "environment", "sustainable", "green", "tips"]):
+        if matches.has("intent:eco_tips"):
             tip = random.choice(ECO_TIPS)
-            return f"Here's an eco-friendly travel tip: {tip}. Sustainable tourism helps preserve these sacred places for future generations!"
+            return {"response": f"Here's an eco-friendly travel tip: {tip}. Sustainable tourism helps preserve these sacred places for future generations!", "cacheable": False}
         
         # Meditation recommendations
-        if "meditation" in message_lower or "stress" in message_lower or "relax" in message_lower:
-            sentiment = SentimentAnalysisService.analyze_sentiment(user_message)
+        if matches.has("intent:meditation"):
+            sentiment = SentimentAnalysisService.analyze_sentiment(user_message, matches)
             recommendations = MEDITATION_RECOMMENDATIONS.get(sentiment, MEDITATION_RECOMMENDATIONS["peaceful"])
             recommendation = random.choice(recommendations)
-            return f"Based on how you're feeling, I recommend: {recommendation}. Taking time for mindfulness can enhance your spiritual journey."
+            return {"response": f"Based on how you're feeling, I recommend: {recommendation}. Taking time for mindfulness can enhance your spiritual journey.", "cacheable": False}
         
         # Yoga recommendations
-        if "yoga" in message_lower:
-            return "For your spiritual journey, try these yoga practices: Morning Sun Salutations to energize, Mountain Pose for grounding, and Pranayama (breathing exercises) for mental clarity. Practice with respect for the sacred environment around you."
+        if matches.has("intent:yoga"):
+            return {"response": "For your spiritual journey, try these yoga practices: Morning Sun Salutations to energize, Mountain Pose for grounding, and Pranayama (breathing exercises) for mental clarity. Practice with respect for the sacred environment around you.", "cacheable": True}
         
         # Homestay information
-        if "homestay" in message_lower or "accommodation" in message_lower:
-            return "I recommend staying in local homestays to support the community and experience authentic culture. Look for family-run guesthouses in villages near the temples. They often provide home-cooked meals and valuable local insights."
+        if matches.has("intent:homestay"):
+            return {"response": "I recommend staying in local homestays to support the community and experience authentic culture. Look for family-run guesthouses in villages near the temples. They often provide home-cooked meals and valuable local insights.", "cacheable": True}
         
         # General travel planning
-        if any(word in message_lower for word in ["plan", "itinerary", "route", "travel"]):
-            return "For Char Dham Yatra, I recommend this sequence: Yamunotri → Gangotri → Kedarnath → Badrinath. Allow 10-12 days total. Start early in the season (May) for better weather. Book accommodations in advance and carry warm clothing even in summer."
+        if matches.has("intent:travel"):
+            return {"response": "For Char Dham Yatra, I recommend this sequence: Yamunotri → Gangotri → Kedarnath → Badrinath. Allow 10-12 days total. Start early in the season (May) for better weather. Book accommodations in advance and carry warm clothing even in summer.", "cacheable": True}
         
         # Default response
-        return "Namaste! I'm YatraSaarthi, your spiritual travel companion. I can help you with information about Char Dham temples, weather updates, eco-friendly travel tips, meditation guidance, and travel planning. What would you like to know about your spiritual journey?"
+        return {"response": "Namaste! I'm YatraSaarthi, your spiritual travel companion. I can help you with information about Char Dham temples, weather updates, eco-friendly travel tips, meditation guidance, and travel planning. What would you like to know about your spiritual journey?", "cacheable": True}
     
     @staticmethod
     def process_voice_input(audio_data, user_id=None):
@@ -373,6 +741,35 @@ class SustainabilityService:
         
         return tips.get(journey_type, tips['pilgrimage'])
 
+OFFLINE_BUNDLE_KEY = 'yatra:offline_bundle'
+
+EMERGENCY_CONTACTS = {
+    'police': '100',
+    'medical': '108',
+    'tourist_helpline': '1363'
+}
+
+
+def _offline_search_documents():
+    """Destinations, eco tips and artisans as (id, searchable text, answer) for the offline index"""
+    for dest in Destination.objects.all():
+        # The name is repeated so that naming a place outranks a passing mention
+        text = f"{dest.name} {dest.name} {dest.description} {dest.mythology} {dest.best_time}"
+        yield f"destination:{dest.pk}", text, f"{dest.name}: {dest.description} Best time: {dest.best_time}"
+    for tip in EcoTip.objects.all():
+        text = f"{tip.title} {tip.category} {tip.description}"
+        yield f"eco_tip:{tip.pk}", text, f"Eco tip - {tip.title}: {tip.description}"
+    for artisan in LocalArtisan.objects.all():
+        text = f"{artisan.name} {artisan.craft_type} {artisan.location} {artisan.description}"
+        yield f"artisan:{artisan.pk}", text, f"{artisan.name} ({artisan.craft_type}), {artisan.location}: {artisan.description}"
+
+
+offline_index = VersionedIndex(
+    _offline_search_documents,
+    lambda: get_version(OFFLINE_DATA_VERSION_KEY),
+    check_interval=getattr(settings, 'OFFLINE_INDEX_CHECK_INTERVAL', 5.0),
+)
+
 class OfflineService:
     """Handle offline functionality and data caching"""
     
@@ -382,11 +779,7 @@ class OfflineService:
         essential_data = {
             'destinations': list(Destination.objects.all().values()),
             'eco_tips': list(EcoTip.objects.all().values()),
-            'emergency_contacts': {
-                'police': '100',
-                'medical': '108',
-                'tourist_helpline': '1363'
-            },
+            'emergency_contacts': EMERGENCY_CONTACTS,
             'basic_phrases': {
                 'help': {'hi': 'मदद', 'en': 'help'},
                 'water': {'hi': 'पानी', 'en': 'water'},
@@ -397,21 +790,60 @@ class OfflineService:
         
         return essential_data
     
+    @staticmethod
+    def get_offline_bundle():
+        """Offline data materialized as versioned JSON and gzip bytes
+
+        Cached under the current offline data version, so serving it costs
+        no database queries and a change to a Destination, EcoTip or
+        LocalArtisan moves every worker to a new key instead of relying on a
+        delete that a concurrent rebuild could undo.
+        """
+        # Read before building: a change during the build bumps the version
+        # past this key, so a bundle built from old rows is never served as new
+        data_version = get_version(OFFLINE_DATA_VERSION_KEY)
+        bundle = cache.get(f"{OFFLINE_BUNDLE_KEY}:{data_version}")
+        if bundle is None:
+            bundle = OfflineService.build_offline_bundle(data_version)
+        return bundle
+    
+    @staticmethod
+    def build_offline_bundle(data_version=None):
+        """Serialize the essential data and store it with its content hash as version"""
+        if data_version is None:
+            data_version = get_version(OFFLINE_DATA_VERSION_KEY)
+        body = json.dumps(
+            OfflineService.cache_essential_data(),
+            cls=DjangoJSONEncoder, ensure_ascii=False, sort_keys=True
+        ).encode('utf-8')
+        bundle = {
+            "version": hashlib.sha256(body).hexdigest()[:16],
+            "json": body,
+            "gzip": gzip.compress(body, compresslevel=9),
+        }
+        cache.set(
+            f"{OFFLINE_BUNDLE_KEY}:{data_version}", bundle,
+            timeout=getattr(settings, 'OFFLINE_BUNDLE_TIMEOUT', 24 * 3600)
+        )
+        return bundle
+    
+    @staticmethod
+    def invalidate_offline_data():
+        """Move to a new offline bundle and have every worker rebuild its search index"""
+        bump_version(OFFLINE_DATA_VERSION_KEY)
+        offline_index.invalidate()
+    
     @staticmethod
     def get_offline_response(query):
-        """Generate response using cached data only"""
-        cached_data = OfflineService.cache_essential_data()
-        
-        query_lower = query.lower()
+        """Answer from the in-memory offline index, without database queries"""
+        matches = keyword_matcher.match(query)
         
-        if 'emergency' in query_lower:
-            contacts = cached_data['emergency_contacts']
+        if matches.has('intent:emergency'):
+            contacts = EMERGENCY_CONTACTS
             return f"Emergency contacts: Police: {contacts['police']}, Medical: {contacts['medical']}, Tourist Helpline: {contacts['tourist_helpline']}"
         
-        if any(dest in query_lower for dest in ['badrinath', 'kedarnath', 'gangotri', 'yamunotri']):
-            destinations = cached_data['destinations']
-            for dest in destinations:
-                if dest['name'].lower() in query_lower:
-                    return f"{dest['name']}: {dest['description']} Best time: {dest['best_time']}"
+        results = offline_index.search(query, limit=1)
+        if results:
+            return results[0][2]
         
-        return "I'm currently offline. I can help with basic destination info and emergency contacts. For detailed assistance, please connect to internet."
\ No newline at end of file
+        return "I'm currently offline. I can help with basic destination info and emergency contacts. For detailed assistance, please connect to internet."
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .knowledge_base import MODEL_DOCUMENT_BUILDERS
+from .llm_service import llm_service
+from .models import Destination, EcoTip, LocalArtisan, UserProfile
+from .profiles import profile_store
+
+
+def knowledge_source_changed(sender, raw=False, **kwargs):
+    """Re-sync the knowledge base once a mirrored row is saved or deleted"""
+    if raw:
+        # Fixtures are picked up by the sync that runs when the service loads
+        return
+    transaction.on_commit(llm_service.schedule_sync)
+
+
+for model in MODEL_DOCUMENT_BUILDERS:
+    post_save.connect(knowledge_source_changed, sender=model, dispatch_uid=f'kb_save_{model.__name__}')
+    post_delete.connect(knowledge_source_changed, sender=model, dispatch_uid=f'kb_delete_{model.__name__}')
+
+
+def offline_data_changed(sender, **kwargs):
+    """Drop the offline bundle and search index once destinations, eco tips or artisans change"""
+    # Imported here: services pulls in the voice stack, too heavy for app loading
+    from .services import OfflineService
+    transaction.on_commit(OfflineService.invalidate_offline_data)
+
+
+for model in (Destination, EcoTip, LocalArtisan):
+    post_save.connect(offline_data_changed, sender=model, dispatch_uid=f'offline_save_{model.__name__}')
+    post_delete.connect(offline_data_changed, sender=model, dispatch_uid=f'offline_delete_{model.__name__}')
+
+
+def user_profile_changed(sender, instance, **kwargs):
+    """Drop cached copies of a profile edited outside the profile store (e.g. in the admin)"""
+    transaction.on_commit(lambda: profile_store.invalidate(instance.user_id))
+
+
+post_save.connect(user_profile_changed, sender=UserProfile, dispatch_uid='profile_save')
+post_delete.connect(user_profile_changed, sender=UserProfile, dispatch_uid='profile_delete')
@@ -0,0 +1,587 @@
+import fcntl
+import gzip
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .ann_index import AnnVectorStore, build_ivf_index, write_string_tables
+from .apps import _is_serving_process
+from .cache import LRUCache, normalize_text
+from .keyword_matcher import keyword_matcher
+from .language_detection import LanguageDetector
+from .llm_service import LLMService, QueryAnalysis, personalization_service, SYNC_LOCK_FILE, READINESS_COLD, READINESS_DEGRADED, READINESS_LOADING, READINESS_READY, llm_service
+from .models import ChatMessage, ChatSession, EcoTip
+from .persistence import chat_store, write_behind_queue
+from .services import ChatbotService, WeatherService
+from .vector_store import NumpyVectorStore
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chatbot-tests'}}
+
+
+# The 'read' alias mirrors 'default' but on its own connection, which would
+# not see the rows a test creates inside its transaction
+@override_settings(CACHES=LOCMEM_CACHES, DATABASE_ROUTERS=[])
+class APITestCase(TestCase):
+    """Request-level tests against a degraded LLM service: replies come from the rule-based fallback, no model is loaded"""
+
+    def setUp(self):
+        cache.clear()
+        # Session primary keys cached by an earlier test point at rolled-back rows
+        for patcher in [mock.patch.object(llm_service, 'readiness', READINESS_DEGRADED),
+                        mock.patch.object(chat_store, 'session_pks', LRUCache())]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_json(self, path, data):
+        return self.client.post(path, json.dumps(data), content_type='application/json')
+
+
+class LanguageDetectorTests(SimpleTestCase):
+    def setUp(self):
+        self.detector = LanguageDetector()
+
+    def test_short_english_queries_and_place_names_stay_english(self):
+        for text in ['char dham itinerary', 'yoga', 'Kedarnath', 'Yamunotri', 'hi', 'namaste']:
+            with self.subTest(text=text):
+                self.assertEqual(self.detector.detect(text), 'en')
+
+    def test_english_sentences(self):
+        for text in ['best time to visit kedarnath', 'where is the temple', 'plan my trip to gangotri']:
+            with self.subTest(text=text):
+                self.assertEqual(self.detector.detect(text), 'en')
+
+    def test_hinglish_sentences(self):
+        for text in ['Kedarnath ka mausam kaisa hai', 'mandir kahan hai', 'mujhe guide chahiye', 'kitna door hai']:
+            with self.subTest(text=text):
+                self.assertEqual(self.detector.detect(text), 'hi')
+
+    def test_scripts(self):
+        self.assertEqual(self.detector.detect('मुझे केदारनाथ के बारे में बताओ'), 'hi')
+        self.assertEqual(self.detector.detect('मला केदारनाथ बद्दल माहिती हवी आहे'), 'mr')
+        self.assertEqual(self.detector.detect('கேதார்நாத் எங்கே உள்ளது'), 'ta')
+
+
+class ServingProcessTests(SimpleTestCase):
+    def is_serving(self, argv, **environ):
+        with mock.patch('sys.argv', argv), mock.patch.dict('os.environ', environ, clear=True):
+            return _is_serving_process()
+
+    def test_servers(self):
+        self.assertTrue(self.is_serving(['/venv/bin/gunicorn', 'yatra_saarthi_django.wsgi']))
+        self.assertTrue(self.is_serving(['/venv/lib/python3.11/site-packages/uvicorn/__main__.py', 'app']))
+        self.assertTrue(self.is_serving(['manage.py', 'runserver', '--noreload']))
+        self.assertTrue(self.is_serving(['manage.py', 'runserver'], RUN_MAIN='true'))
+        self.assertTrue(self.is_serving(['custom-entrypoint'], YATRA_SERVING='1'))
+
+    def test_commands_workers_and_scripts(self):
+        self.assertFalse(self.is_serving(['manage.py', 'runserver']))
+        self.assertFalse(self.is_serving(['manage.py', 'migrate']))
+        self.assertFalse(self.is_serving(['/venv/bin/django-admin', 'migrate']))
+        self.assertFalse(self.is_serving(['/venv/lib/python3.11/site-packages/django/__main__.py', 'shell']))
+        self.assertFalse(self.is_serving(['/venv/bin/celery', '-A', 'proj', 'worker']))
+        self.assertFalse(self.is_serving(['scripts/import_data.py']))
+        self.assertFalse(self.is_serving(['']))
+
+
+def unit_vectors(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LexicalSearchTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        self.service = LLMService()
+
+    def test_searches_a_store_that_lists_all_documents(self):
+        self.service._collection = NumpyVectorStore(self.path / 'numpy')
+        self.service._collection.upsert(['d1'], ['Kedarnath temple opens in May'], [{}], unit_vectors(1))
+        self.assertEqual([hit[1] for hit in self.service.lexical_search('kedarnath temple')], ['d1'])
+
+    def test_skips_the_ann_backend_offline_corpus(self):
+        # A live document matching the query must not shadow the base corpus, which BM25 cannot see
+        write_string_tables(self.path / 'ann', [(f'base{i}', 'Kedarnath trek guide', {}) for i in range(20)])
+        build_ivf_index(self.path / 'ann', unit_vectors(20), nlist=2)
+        store = AnnVectorStore(self.path / 'ann', self.path / 'delta')
+        store.upsert(['live'], ['Kedarnath temple opens in May'], [{}], unit_vectors(1, seed=1))
+        self.service._collection = store
+        self.assertEqual(self.service.lexical_search('kedarnath temple'), [])
+
+
+class NumpyVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        self.store = NumpyVectorStore(self.path, retire_seconds=0)
+        self.vectors = unit_vectors(3)
+        self.store.upsert(['a', 'b', 'c'], ['A', 'B', 'C'], [{'city': 'Delhi'}, {'city': 'Agra'}, {'city': 'Delhi'}],
+                          self.vectors)
+
+    def test_query_returns_nearest_first(self):
+        result = self.store.query([self.vectors[1]], n_results=2)
+        self.assertEqual(result['ids'][0][0], 'b')
+        self.assertAlmostEqual(result['distances'][0][0], 0.0, places=5)
+
+    def test_where_filter_scores_only_matching_rows(self):
+        result = self.store.query([self.vectors[1]], n_results=3, where={'city': {'$in': ['Delhi']}})
+        self.assertEqual(sorted(result['ids'][0]), ['a', 'c'])
+
+    def test_upsert_replaces_and_delete_removes(self):
+        self.store.upsert(['b', 'd'], ['B2', 'D'], [{}, {}], unit_vectors(2, seed=1))
+        self.store.delete(['a'])
+        result = self.store.get()
+        self.assertEqual(result['ids'], ['b', 'c', 'd'])
+        self.assertEqual(result['documents'], ['B2', 'C', 'D'])
+
+    def test_other_process_writes_are_picked_up(self):
+        NumpyVectorStore(self.path).delete(['c'])
+        self.assertEqual(self.store.count(), 2)
+
+    def test_snapshot_is_unchanged_by_later_writes(self):
+        snapshot = self.store.snapshot()
+        self.store.delete(['a', 'b'])
+        self.assertEqual(snapshot.ids, ['a', 'b', 'c'])
+        self.assertEqual(len(snapshot.vectors), 3)
+        self.assertEqual(snapshot.query([self.vectors[0]], n_results=1)['ids'], [['a']])
+        self.assertEqual(self.store.get()['ids'], ['c'])
+
+    def test_retired_vectors_files_are_removed(self):
+        self.store.upsert(['d'], ['D'], [{}], unit_vectors(1, seed=1))
+        self.store.upsert(['e'], ['E'], [{}], unit_vectors(1, seed=2))
+        self.assertEqual(len(list(self.path.glob('vectors-*.npy'))), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KnowledgeSyncLockTests(SimpleTestCase):
+    def test_sync_holds_the_directory_lock(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(KNOWLEDGE_BASE_DIR=Path(directory)):
+            locked = []
+
+            def stored(include):
+                # Another process cannot take the lock while the sync compares and writes
+                with open(Path(directory) / SYNC_LOCK_FILE) as handle:
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        locked.append(True)
+                return {'ids': [], 'metadatas': []}
+
+            service = LLMService()
+            service._collection = mock.Mock(get=mock.Mock(side_effect=stored))
+            with mock.patch('chatbot.knowledge_base.iter_documents', return_value=[]):
+                service._sync_knowledge_base()
+            self.assertEqual(locked, [True])
+
+
+class AnnIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name)
+        self.vectors = unit_vectors(400, dim=32)
+        records = [(f'd{i}', f'doc {i}', {'city': ['Delhi', 'Agra'][i % 2]}) for i in range(400)]
+        write_string_tables(self.path / 'ann', records, filter_fields=('city',))
+        build_ivf_index(self.path / 'ann', self.vectors, nlist=8)
+        self.store = AnnVectorStore(self.path / 'ann', self.path / 'delta')
+        self.queries = unit_vectors(20, dim=32, seed=1)
+
+    def exact_top(self, query, k, rows=None):
+        rows = np.arange(len(self.vectors)) if rows is None else rows
+        scores = self.vectors[rows] @ query
+        return rows[np.argsort(-scores)[:k]]
+
+    def test_exhaustive_refined_search_finds_the_exact_top_k(self):
+        # Re-ranked on float16 vectors, so near ties may swap places
+        index = self.store.index
+        for query in self.queries:
+            rows, scores = index.search(query, 10, nprobe=8)
+            self.assertEqual(set(rows.tolist()), set(self.exact_top(query, 10).tolist()))
+            np.testing.assert_allclose(scores, self.vectors[rows] @ query, atol=1e-3)
+
+    def test_refine_raises_recall_over_int8_scores(self):
+        index = self.store.index
+        hits = {1: 0, 4: 0}
+        for query in self.queries:
+            truth = set(self.exact_top(query, 10).tolist())
+            for refine in hits:
+                hits[refine] += len(truth & set(index.search(query, 10, nprobe=8, refine=refine)[0].tolist()))
+        self.assertGreaterEqual(hits[4], hits[1])
+        self.assertEqual(hits[4], 10 * len(self.queries))
+
+    def test_search_rows_stays_within_rows(self):
+        rows = np.arange(0, 400, 3)
+        found, _ = self.store.index.search_rows(self.queries[0], 5, rows)
+        self.assertEqual(set(found.tolist()), set(self.exact_top(self.queries[0], 5, rows).tolist()))
+
+    def test_live_changes_shadow_and_mask_the_base(self):
+        query = self.queries[0]
+        best = f'd{self.exact_top(query, 1)[0]}'
+        self.store.upsert([best], ['changed'], [{'city': 'Delhi'}], [-query])
+        result = self.store.query([query], n_results=5)
+        self.assertNotIn(best, result['ids'][0])
+        second = result['ids'][0][0]
+        self.store.delete([second])
+        self.assertNotIn(second, self.store.query([query], n_results=5)['ids'][0])
+
+    def test_where_filter_uses_partitions(self):
+        result = self.store.query([self.queries[0]], n_results=5, where={'city': 'Agra'})
+        self.assertEqual({metadata['city'] for metadata in result['metadatas'][0]}, {'Agra'})
+        expected = self.exact_top(self.queries[0], 5, np.arange(1, 400, 2))
+        self.assertEqual(set(result['ids'][0]), {f'd{row}' for row in expected})
+
+    def test_bytes_per_vector_counts_every_loaded_row_array(self):
+        with tempfile.TemporaryDirectory() as directory:
+            records = [(f'd{i}', f'doc {i}', {'city': 'Delhi' if i % 2 else 'Agra'}) for i in range(40)]
+            write_string_tables(directory, records, filter_fields=('city',))
+            build_ivf_index(directory, unit_vectors(40), nlist=4)
+            store = AnnVectorStore(directory, Path(directory) / 'delta')
+            index = store.index
+            arrays = [index.codes, index.order, index.positions, index.centroids, index.offsets, index.scales,
+                      index.refine_vectors]
+            self.assertAlmostEqual(index.bytes_per_vector(), sum(array.nbytes for array in arrays) / 40)
+            extra = store.partition_rows.nbytes + sum(
+                table.offsets.nbytes for table in (store.ids, store.documents, store.metadatas))
+            self.assertAlmostEqual(store.bytes_per_vector(), index.bytes_per_vector() + extra / 40)
+
+
+class NormalizeTextTests(SimpleTestCase):
+    def test_ignores_case_punctuation_and_spacing(self):
+        self.assertEqual(normalize_text('  Best time, to visit   KEDARNATH?! '), 'best time to visit kedarnath')
+        self.assertEqual(normalize_text('केदारनाथ कैसे जाएं?'), normalize_text('केदारनाथ  कैसे जाएं।'))
+
+    def test_keeps_devanagari_vowel_signs(self):
+        for first, second in [('काल', 'कुल'), ('मंदिर कब खुलेगा', 'मंदिर कब खुला'), ('दिन', 'दान'), ('रास्ता', 'रिश्ता')]:
+            with self.subTest(first=first, second=second):
+                self.assertNotEqual(normalize_text(first), normalize_text(second))
+
+    def test_composed_and_decomposed_forms_match(self):
+        self.assertEqual(normalize_text('\u0928\u093c'), normalize_text('\u0929'))
+        self.assertEqual(normalize_text('Cafe\u0301'), normalize_text('café'))
+
+
+class SessionActivityTests(APITestCase):
+    def assert_touched(self, session_id, before):
+        self.assertGreater(ChatSession.objects.get(session_id=session_id).updated_at, before)
+
+    def age_session(self, session_id):
+        before = timezone.now() - timedelta(days=1)
+        ChatSession.objects.filter(session_id=session_id).update(updated_at=before)
+        return before
+
+    def test_async_chat_bumps_existing_session(self):
+        ChatSession.objects.create(session_id='s1')
+        before = self.age_session('s1')
+        response = self.post_json('/api/chat/async/', {'message': 'Tell me about Kedarnath', 'session_id': 's1'})
+        self.assertEqual(response.status_code, 200)
+        self.assert_touched('s1', before)
+
+    def test_chat_bumps_existing_session(self):
+        ChatSession.objects.create(session_id='s1')
+        before = self.age_session('s1')
+        self.post_json('/api/chat/', {'message': 'Tell me about Kedarnath', 'session_id': 's1'})
+        self.assert_touched('s1', before)
+
+    def test_write_behind_flush_bumps_session(self):
+        ChatSession.objects.create(session_id='s1')
+        before = self.age_session('s1')
+        # Flushed below, in the test's transaction, instead of by the background thread
+        with override_settings(CHAT_WRITE_BEHIND=True), mock.patch.object(write_behind_queue, '_ensure_started'):
+            chat_store.save_message('s1', 'hello', 'namaste', 'neutral')
+            self.assertEqual(ChatMessage.objects.count(), 0)
+            write_behind_queue.flush()
+        self.assertEqual(ChatMessage.objects.count(), 1)
+        self.assert_touched('s1', before)
+
+    def test_save_messages_bumps_sessions(self):
+        ChatSession.objects.create(session_id='s1')
+        before = self.age_session('s1')
+        chat_store.save_messages([('s1', 'a', 'b', 'neutral'), ('s2', 'c', 'd', 'neutral')])
+        self.assert_touched('s1', before)
+        self.assertEqual(ChatMessage.objects.filter(session__session_id='s2').count(), 1)
+
+    def test_session_list_is_most_recently_active_first(self):
+        for session_id in ['old', 'new']:
+            ChatSession.objects.create(session_id=session_id)
+            self.age_session(session_id)
+        chat_store.save_message('old', 'hello', 'namaste', 'neutral')
+        response = self.client.get('/api/sessions/', {'page_size': 1})
+        self.assertEqual([session['session_id'] for session in response.json()['results']], ['old'])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([session['session_id'] for session in response.json()['results']], ['new'])
+
+
+class MessageHistoryTests(APITestCase):
+    def test_cursor_pages_walk_the_history_newest_first(self):
+        # Saved in one batch, so timestamps may tie and the id decides the order
+        chat_store.save_messages([('s1', f'q{i}', f'a{i}', 'neutral') for i in range(5)])
+        chat_store.save_message('other', 'q', 'a', 'neutral')
+        seen = []
+        url, params = '/api/sessions/s1/messages/', {'page_size': 2}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()['results']), 2)
+            seen.extend(message['user_message'] for message in response.json()['results'])
+            url, params = response.json()['next'], None
+        self.assertEqual(seen, ['q4', 'q3', 'q2', 'q1', 'q0'])
+
+    def test_unknown_session(self):
+        self.assertEqual(self.client.get('/api/sessions/missing/messages/').status_code, 404)
+
+
+class ReadinessTests(APITestCase):
+    def test_cold_service_starts_loading_and_is_not_ready(self):
+        llm_service.readiness = READINESS_COLD
+        with mock.patch.object(llm_service, 'start_warmup') as start_warmup:
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        start_warmup.assert_called_once_with()
+
+    def test_degraded_service_is_not_ready_and_retries_after_backoff(self):
+        with mock.patch.object(llm_service, '_retry_at', 0.0), mock.patch.object(llm_service, 'start_warmup') as start_warmup:
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        start_warmup.assert_called_once_with()
+
+    def test_degraded_service_waits_for_backoff(self):
+        with mock.patch.object(llm_service, '_retry_at', float('inf')), mock.patch.object(llm_service, 'start_warmup') as start_warmup:
+            response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        start_warmup.assert_not_called()
+
+    def test_ready_and_loading(self):
+        llm_service.readiness = READINESS_READY
+        self.assertEqual(self.client.get('/api/health/ready/').status_code, 200)
+        llm_service.readiness = READINESS_LOADING
+        self.assertEqual(self.client.get('/api/health/ready/').status_code, 503)
+
+
+def analyze(user_message, detected_lang=None, matches=None):
+    """An English message analyzed without the model"""
+    return QueryAnalysis(user_message, 'en', user_message, keyword_matcher.match(user_message))
+
+
+class ResponseCacheTests(APITestCase):
+    message = 'How should I meditate at Kedarnath?'
+
+    def reply_twice(self):
+        with mock.patch.object(llm_service, 'analyze_query', side_effect=analyze) as analyze_query:
+            first = ChatbotService.generate_reply(self.message, role='spiritual_guide')
+            second = ChatbotService.generate_reply(self.message, role='spiritual_guide')
+        return first, second, analyze_query
+
+    def test_grounded_reply_is_served_from_cache(self):
+        llm_service.readiness = READINESS_READY
+        with mock.patch.object(llm_service, '_retrieve_for', return_value=(['Kedarnath temple'], 'lexical')):
+            first, second, analyze_query = self.reply_twice()
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['response'], first['response'])
+        # A hit needs neither translation nor an embedding
+        analyze_query.assert_called_once()
+
+    def test_reply_without_context_is_not_cached(self):
+        llm_service.readiness = READINESS_READY
+        with mock.patch.object(llm_service, '_retrieve_for', return_value=([], 'none')):
+            _, second, analyze_query = self.reply_twice()
+        self.assertFalse(second['cached'])
+        self.assertEqual(analyze_query.call_count, 2)
+
+    def test_reply_from_degraded_service_is_not_cached(self):
+        with mock.patch.object(llm_service, '_retrieve_for', return_value=(['Kedarnath temple'], 'lexical')):
+            _, second, _ = self.reply_twice()
+        self.assertFalse(second['cached'])
+
+
+class AsyncResponseTests(APITestCase):
+    def test_async_response_matches_sync_response(self):
+        llm_service.readiness = READINESS_READY
+        message = 'How should I meditate at Kedarnath?'
+        with mock.patch.object(llm_service, '_retrieve_for', return_value=(['Kedarnath temple'], 'lexical')):
+            expected = llm_service.generate_response(message, role='spiritual_guide', analysis=analyze(message))
+            response = async_to_sync(llm_service.agenerate_response)(message, role='spiritual_guide',
+                                                                     analysis=analyze(message))
+        self.assertEqual(response, expected)
+        self.assertEqual(response['retrieval_path'], 'lexical')
+
+
+class OfflineBundleTests(APITestCase):
+    def get(self, **headers):
+        return self.client.get('/api/offline/', **headers)
+
+    def test_gzip_and_identity_bodies_have_their_own_etags(self):
+        plain = self.get()
+        zipped = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertNotEqual(plain['ETag'], zipped['ETag'])
+        self.assertIn('Accept-Encoding', zipped['Vary'])
+
+    def test_gzip_refused_with_zero_quality(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+        json.loads(response.content)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # The identity ETag does not validate the gzip body
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip').status_code, 200)
+
+    def test_data_change_moves_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            EcoTip.objects.create(title='Carry a bottle', description='Refill it at the springs', category='waste')
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BatchChatTests(APITestCase):
+    def test_replies_in_message_order_and_saves_each_turn(self):
+        messages = [{'message': 'Tell me about Kedarnath'}, {'message': 'Eco tips please', 'session_id': 's1'},
+                    {'message': 'Tell me about Kedarnath'}]
+        response = self.post_json('/api/chat/batch/', {'messages': messages})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[1]['session_id'], 's1')
+        self.assertEqual(results[0]['response'], results[2]['response'])
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        self.assertEqual(ChatMessage.objects.get(session__session_id='s1').user_message, 'Eco tips please')
+
+    def test_rejects_malformed_bodies(self):
+        for body in [[{'message': 'hi'}], {'messages': []}, {'messages': 'hi'}, {'messages': [{}]},
+                     {'messages': [{'message': 'hi'}] * 101}]:
+            self.assertEqual(self.post_json('/api/chat/batch/', body).status_code, 400, body)
+        self.assertEqual(ChatMessage.objects.count(), 0)
+
+    def test_async_chat_rejects_non_object_bodies(self):
+        for body in ['[]', '"hi"', '{']:
+            response = self.client.post('/api/chat/async/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+def parse_events(body):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class StreamingChatTests(APITestCase):
+    def assert_stream(self, events, session_id):
+        names = [event for event, _ in events]
+        self.assertEqual(names[0], 'stage')
+        self.assertEqual(names[-1], 'done')
+        self.assertIn('sentence', names)
+        done = events[-1][1]
+        self.assertEqual(done['session_id'], session_id)
+        sentences = [data['text'] for event, data in events if event == 'sentence']
+        self.assertEqual(ChatMessage.objects.get(session__session_id=session_id).bot_response, ' '.join(sentences))
+
+    def test_post_streams_stages_sentences_and_done(self):
+        response = self.post_json('/api/chat/stream/', {'message': 'Tell me about Kedarnath', 'session_id': 's1'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assert_stream(parse_events(b''.join(response.streaming_content).decode('utf-8')), 's1')
+
+    def test_get_takes_query_parameters(self):
+        response = self.client.get('/api/chat/stream/', {'message': 'Tell me about Kedarnath', 'session_id': 's2'})
+        self.assert_stream(parse_events(b''.join(response.streaming_content).decode('utf-8')), 's2')
+
+    async def test_asgi_stream(self):
+        response = await self.async_client.post(
+            '/api/chat/stream/', {'message': 'Tell me about Kedarnath', 'session_id': 's3'},
+            content_type='application/json'
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        events = parse_events(body)
+        self.assertEqual([event for event, _ in events][-1], 'done')
+        self.assertEqual(await ChatMessage.objects.filter(session__session_id='s3').acount(), 1)
+
+    def test_rejects_invalid_requests(self):
+        for body in ['[]', '{', '{}']:
+            response = self.client.post('/api/chat/stream/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class BulkRecommendationsTests(APITestCase):
+    def test_matches_single_user_recommendations(self):
+        personalization_service.update_user_profile('u1', {'interests': ['meditation', 'temples']})
+        response = self.post_json('/api/personalization/bulk/', {'user_ids': ['u1', 'u2', 'u1'], 'category': 'activities'})
+        self.assertEqual(response.status_code, 200)
+        recommendations = response.json()['recommendations']
+        self.assertEqual(sorted(recommendations), ['u1', 'u2'])
+        self.assertTrue(recommendations['u1'])
+        for user_id in ['u1', 'u2']:
+            self.assertEqual(recommendations[user_id],
+                             personalization_service.get_personalized_recommendations(user_id, 'activities'))
+
+    def test_rejects_malformed_bodies(self):
+        for body in [['u1'], {'user_ids': []}, {'user_ids': 'u1'}, {'user_ids': ['u'] * 1001}]:
+            self.assertEqual(self.post_json('/api/personalization/bulk/', body).status_code, 400, body)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, WEATHER_CACHE_TTL=600, WEATHER_STALE_TTL=3600)
+class WeatherCacheTests(SimpleTestCase):
+    data = {'temperature': 12, 'description': 'Clear sky', 'humidity': 50, 'wind_speed': 3.0}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_share_one_fetch_and_release_the_lock(self):
+        def fetch(location):
+            time.sleep(0.05)
+            return dict(self.data)
+
+        with mock.patch.object(WeatherService, '_fetch_weather_data', side_effect=fetch) as fetch_weather:
+            threads = [threading.Thread(target=WeatherService.get_weather_data, args=('Kedarnath',)) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        fetch_weather.assert_called_once_with('Kedarnath')
+        self.assertEqual(WeatherService._fetch_locks, {})
+
+    def test_failed_fetch_releases_the_lock(self):
+        with mock.patch.object(WeatherService, '_fetch_weather_data', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                WeatherService.get_weather_data('Badrinath')
+        self.assertEqual(WeatherService._fetch_locks, {})
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        cache.set(WeatherService._cache_key('Gangotri'), {'data': self.data, 'fetched_at': time.time() - 700})
+        with mock.patch.object(WeatherService, '_fetch_weather_data') as fetch_weather, \
+                mock.patch('chatbot.services.threading.Thread') as thread:
+            first = WeatherService.get_weather_data('Gangotri')
+            WeatherService.get_weather_data('Gangotri')
+        self.assertEqual(first, dict(self.data, location='Gangotri'))
+        fetch_weather.assert_not_called()
+        thread.assert_called_once()
+
+    def test_fresh_entry_is_served_from_cache(self):
+        with mock.patch.object(WeatherService, '_fetch_weather_data', return_value=dict(self.data)) as fetch_weather:
+            WeatherService.get_weather_data('Yamunotri')
+            self.assertEqual(WeatherService.get_weather_data('yamunotri')['temperature'], 12)
+        fetch_weather.assert_called_once()
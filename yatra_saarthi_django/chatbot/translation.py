@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, Any, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Joins a batch into one upstream request; chosen to survive translation untouched
+BATCH_SEPARATOR = "\n|||\n"
+BATCH_SPLIT_RE = re.compile(r"\s*\|\|\|\s*")
+
+
+class TranslationService:
+    """Cached translation layer shared by the LLM and multilingual services
+
+    Translations are looked up in a bounded in-process LRU first, then in
+    the Django cache (persistent and shared by all workers), keyed by
+    (text hash, source language, target language). Misses in a batch are
+    sent upstream together in a single request.
+    """
+
+    def __init__(self):
+        self._translator = None
+        self._translator_lock = threading.Lock()
+        self.local_cache = LRUCache(maxsize=getattr(settings, 'TRANSLATION_LOCAL_CACHE_SIZE', 4096))
+        self.shared_hits = 0
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+
+    @property
+    def translator(self):
+        if self._translator is None:
+            with self._translator_lock:
+                if self._translator is None:
+                    from googletrans import Translator
+                    self._translator = Translator()
+        return self._translator
+
+    @staticmethod
+    def cache_key(text: str, source_lang: str, target_lang: str) -> str:
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return f"yatra:tr:{source_lang}:{target_lang}:{digest}"
+
+    def translate(self, text: str, target_lang: str = 'en', source_lang: str = 'auto') -> str:
+        """Translate one string, falling back to the original text on errors"""
+        return self.translate_batch([text], target_lang, source_lang)[0]
+
+    def translate_batch(self, texts: List[str], target_lang: str = 'en', source_lang: str = 'auto') -> List[str]:
+        """Translate many strings, sending all cache misses upstream in one request"""
+        results = list(texts)
+        pending = {}  # cache key -> (text, positions)
+        for position, text in enumerate(texts):
+            if not text or not text.strip() or source_lang == target_lang:
+                continue
+
+            key = self.cache_key(text, source_lang, target_lang)
+            translated = self.local_cache.get(key)
+            if translated is not None:
+                results[position] = translated
+            else:
+                pending.setdefault(key, (text, []))[1].append(position)
+
+        if not pending:
+            return results
+
+        shared = cache.get_many(list(pending))
+        self.shared_hits += len(shared)
+        for key, translated in shared.items():
+            self.local_cache.set(key, translated)
+            for position in pending.pop(key)[1]:
+                results[position] = translated
+
+        if not pending:
+            return results
+
+        keys = list(pending)
+        try:
+            translations = self._translate_upstream([pending[key][0] for key in keys], source_lang, target_lang)
+        except Exception as e:
+            self.upstream_errors += 1
+            logger.error(f"Translation error: {e}")
+            return results
+
+        fresh = {}
+        for key, translated in zip(keys, translations):
+            fresh[key] = translated
+            self.local_cache.set(key, translated)
+            for position in pending[key][1]:
+                results[position] = translated
+        cache.set_many(fresh, timeout=getattr(settings, 'TRANSLATION_CACHE_TIMEOUT', 30 * 24 * 3600))
+
+        return results
+
+    def _translate_upstream(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        """Translate texts with a single request to the translation API
+
+        The texts are joined with a separator and split again afterwards; if
+        the separator does not survive, each text is translated on its own.
+        """
+        self.upstream_requests += 1
+        if len(texts) == 1:
+            return [self.translator.translate(texts[0], src=source_lang, dest=target_lang).text]
+
+        joined = self.translator.translate(BATCH_SEPARATOR.join(texts), src=source_lang, dest=target_lang).text
+        parts = BATCH_SPLIT_RE.split(joined.strip())
+        if len(parts) == len(texts):
+            return parts
+
+        logger.warning(f"Batch translation split into {len(parts)} parts for {len(texts)} texts, retrying one by one")
+        self.upstream_requests += len(texts)
+        return [self.translator.translate(text, src=source_lang, dest=target_lang).text for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        local = self.local_cache.stats()
+        return {
+            "local_hits": local["hits"],
+            "shared_hits": self.shared_hits,
+            "local_size": local["size"],
+            "upstream_requests": self.upstream_requests,
+            "upstream_errors": self.upstream_errors,
+        }
+
+
+translation_service = TranslationService()
@@ -11,9 +11,13 @@ router.register(r'sessions', views.ChatSessionViewSet)
 urlpatterns = [
     # API endpoints
     path('chat/', views.ChatAPIView.as_view(), name='chat'),
+    path('chat/async/', views.AsyncChatAPIView.as_view(), name='chat-async'),
+    path('chat/batch/', views.BatchChatAPIView.as_view(), name='chat-batch'),
+    path('chat/stream/', views.StreamingChatView.as_view(), name='chat-stream'),
     path('voice-chat/', views.VoiceChatAPIView.as_view(), name='voice-chat'),
     path('role-switch/', views.RoleSwitchAPIView.as_view(), name='role-switch'),
     path('personalization/', views.PersonalizationAPIView.as_view(), name='personalization'),
+    path('personalization/bulk/', views.BulkRecommendationsAPIView.as_view(), name='personalization-bulk'),
     path('sustainability/', views.SustainabilityAPIView.as_view(), name='sustainability'),
     path('offline/', views.OfflineAPIView.as_view(), name='offline'),
     path('multilingual/', views.MultilingualAPIView.as_view(), name='multilingual'),
@@ -21,6 +25,8 @@ urlpatterns = [
     path('weather/<str:location>/', views.WeatherAPIView.as_view(), name='weather-location'),
     path('meditation/', views.MeditationAPIView.as_view(), name='meditation'),
     path('health/', views.health_check, name='health'),
+    path('health/ready/', views.readiness_check, name='health-ready'),
+    path('metrics/', views.metrics, name='metrics'),
     path('info/', views.api_info, name='api-info'),
     
     # ViewSet routes
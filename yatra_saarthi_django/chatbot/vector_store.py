@@ -0,0 +1,308 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+META_FILE = 'meta.json'
+LOCK_FILE = 'write.lock'
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path, shared by every process, until the block exits"""
+    with open(path, 'a') as handle:
+        if fcntl is not None:
+            # Released when the handle is closed
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def filter_positions(where: Dict[str, Any], lookup: Callable[[str, Any], np.ndarray]) -> np.ndarray:
+    """Sorted positions matching a chromadb-style where clause
+
+    Supports equality, $eq, $in and $and; ``lookup(field, value)`` returns
+    the sorted positions of the documents with that value.
+    """
+    parts = []
+    for field, condition in where.items():
+        if field == '$and':
+            parts.extend(filter_positions(clause, lookup) for clause in condition)
+        elif isinstance(condition, dict) and '$in' in condition:
+            values = [lookup(field, value) for value in condition['$in']]
+            parts.append(np.unique(np.concatenate(values)) if values else np.zeros(0, dtype=np.int64))
+        elif isinstance(condition, dict) and '$eq' in condition:
+            parts.append(lookup(field, condition['$eq']))
+        elif isinstance(condition, dict):
+            raise ValueError(f"Unsupported where operator: {condition}")
+        else:
+            parts.append(lookup(field, condition))
+    if not parts:
+        raise ValueError("Empty where clause")
+    result = parts[0]
+    for part in parts[1:]:
+        result = np.intersect1d(result, part, assume_unique=True)
+    return result
+
+
+class VectorSnapshot:
+    """One loaded version of a NumpyVectorStore
+
+    Never modified once published, so a reader that takes it once sees
+    ids, documents, metadata and vectors from the same version even while
+    a refresh swaps in the next one. Field indexes are built on first use.
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], vectors: np.ndarray,
+                 mtime=None):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.mtime = mtime
+        self.positions: Dict[str, int] = {doc_id: position for position, doc_id in enumerate(ids)}
+        self._field_indexes: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    def lookup(self, field: str, value: Any) -> np.ndarray:
+        """Positions of the documents whose metadata has field == value, indexed on first use"""
+        index = self._field_indexes.get(field)
+        if index is None:
+            groups = {}
+            for position, metadata in enumerate(self.metadatas):
+                if field in metadata:
+                    groups.setdefault(metadata[field], []).append(position)
+            index = {key: np.asarray(positions, dtype=np.int64) for key, positions in groups.items()}
+            self._field_indexes[field] = index
+        return index.get(value, np.zeros(0, dtype=np.int64))
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ('metadatas', 'documents')) -> Dict[str, Any]:
+        positions = range(len(self.ids)) if ids is None else [self.positions[i] for i in ids if i in self.positions]
+        result = {'ids': [self.ids[p] for p in positions]}
+        if 'metadatas' in include:
+            result['metadatas'] = [self.metadatas[p] for p in positions]
+        if 'documents' in include:
+            result['documents'] = [self.documents[p] for p in positions]
+        return result
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        vectors = self.vectors
+        positions = None
+        if where and len(self.ids):
+            positions = filter_positions(where, self.lookup)
+            vectors = vectors[positions]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        if not len(vectors):
+            for _ in queries:
+                for key in result:
+                    result[key].append([])
+            return result
+
+        scores = queries @ vectors.T if vectors.dtype == np.float32 else queries @ vectors.T.astype(np.float32)
+        k = min(n_results, scores.shape[1])
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            distances = [float(1 - score) for score in row[top]]
+            if positions is not None:
+                top = positions[top]
+            result['ids'].append([self.ids[p] for p in top])
+            result['documents'].append([self.documents[p] for p in top])
+            result['metadatas'].append([self.metadatas[p] for p in top])
+            result['distances'].append(distances)
+        return result
+
+
+class NumpyVectorStore:
+    """Exact vector search over a memory-mapped NumPy matrix
+
+    Normalized embeddings are kept in a ``.npy`` file (float32, or float16
+    to halve its size at the cost of converting the matrix on every
+    query) that every worker maps read-only, so the pages are
+    shared through the OS page cache instead of copied per process. Ids,
+    documents and metadata live in a JSON sidecar. A query is one matrix
+    product over all vectors, which for a few thousand documents is faster
+    than an ANN index and needs no server. A ``where`` filter selects the
+    matching rows from a per-field value index first, so a filtered query
+    only scores its partition.
+
+    Implements the subset of the chromadb collection API used by the
+    service (get, upsert, delete, query, count). Writes rewrite the files
+    under a new name and swap the sidecar atomically; readers notice the
+    new sidecar on their next query. Writers in every process hold a lock
+    on the directory from reading the current version to swapping in the
+    next, and a replaced vectors file is kept for ``retire_seconds`` so
+    that a reader that has just read the old sidecar can still load it.
+    Meant for corpora that fit one rewrite per sync, not for streaming
+    ingestion of millions of rows.
+
+    Each version is loaded into a VectorSnapshot that replaces the previous
+    one in a single assignment; every read works on one snapshot.
+    """
+
+    def __init__(self, path, dtype: str = 'float32', retire_seconds: float = 300):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.retire_seconds = retire_seconds
+        self._lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._snapshot = VectorSnapshot([], [], [], np.zeros((0, 0), dtype=self.dtype))
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.snapshot()
+
+    @property
+    def meta_path(self) -> Path:
+        return self.path / META_FILE
+
+    def snapshot(self) -> VectorSnapshot:
+        """The latest version, reloaded first if another process has written one"""
+        try:
+            stat = os.stat(self.meta_path)
+        except FileNotFoundError:
+            return self._snapshot
+        # The sidecar is replaced, never edited in place, so a new inode means a new version
+        mtime = (stat.st_ino, stat.st_mtime_ns)
+        snapshot = self._snapshot
+        if mtime == snapshot.mtime:
+            return snapshot
+
+        with self._lock:
+            if mtime == self._snapshot.mtime:
+                return self._snapshot
+            with open(self.meta_path, encoding='utf-8') as handle:
+                meta = json.load(handle)
+            if meta['ids']:
+                vectors = np.load(self.path / meta['vectors'], mmap_mode='r')
+            else:
+                vectors = np.zeros((0, meta.get('dim', 0)), dtype=self.dtype)
+            self._snapshot = VectorSnapshot(meta['ids'], meta['documents'], meta['metadatas'], vectors, mtime)
+            return self._snapshot
+
+    @contextmanager
+    def write_lock(self):
+        """Serialize writers to this directory across threads and processes"""
+        with self._writer_lock, file_lock(self.path / LOCK_FILE):
+            yield
+
+    def count(self) -> int:
+        return len(self.snapshot().ids)
+
+    def get(self, ids: Optional[Sequence[str]] = None, include: Sequence[str] = ('metadatas', 'documents')) -> Dict[str, Any]:
+        return self.snapshot().get(ids, include)
+
+    def upsert(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]],
+               embeddings: Sequence[Sequence[float]]):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+        with self.write_lock():
+            # Apply the batch to the latest version, which another process may have written
+            self._upsert(self.snapshot(), ids, documents, metadatas, embeddings)
+
+    def _upsert(self, current: VectorSnapshot, ids, documents, metadatas, embeddings):
+        new_ids, new_documents, new_metadatas = list(current.ids), list(current.documents), list(current.metadatas)
+        vectors = np.array(current.vectors, dtype=self.dtype) if len(current.ids) else None
+        appended = []
+        positions = dict(current.positions)
+        for doc_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            position = positions.get(doc_id)
+            if position is None:
+                positions[doc_id] = len(new_ids)
+                new_ids.append(doc_id)
+                new_documents.append(document)
+                new_metadatas.append(metadata or {})
+                appended.append(embedding)
+            elif position < len(current.ids):
+                new_documents[position] = document
+                new_metadatas[position] = metadata or {}
+                vectors[position] = embedding
+            else:
+                # Repeated id within this batch
+                new_documents[position] = document
+                new_metadatas[position] = metadata or {}
+                appended[position - len(current.ids)] = embedding
+
+        if appended:
+            appended = np.asarray(appended, dtype=self.dtype)
+            vectors = appended if vectors is None else np.concatenate([vectors, appended])
+        self._write(current, new_ids, new_documents, new_metadatas, vectors)
+
+    def delete(self, ids: Sequence[str]):
+        with self.write_lock():
+            self._delete(self.snapshot(), ids)
+
+    def _delete(self, current: VectorSnapshot, ids: Sequence[str]):
+        removed = {current.positions[doc_id] for doc_id in ids if doc_id in current.positions}
+        if not removed:
+            return
+        keep = [position for position in range(len(current.ids)) if position not in removed]
+        self._write(
+            current,
+            [current.ids[p] for p in keep],
+            [current.documents[p] for p in keep],
+            [current.metadatas[p] for p in keep],
+            np.array(current.vectors[keep], dtype=self.dtype) if keep else None,
+        )
+
+    def _write(self, current: VectorSnapshot, ids, documents, metadatas, vectors):
+        """Write a new vectors file, then atomically point the sidecar at it
+
+        Called with write_lock held.
+        """
+        with self._lock:
+            name = f"vectors-{uuid.uuid4().hex[:12]}.npy"
+            dim = int(vectors.shape[1]) if vectors is not None else int(current.vectors.shape[1])
+            if vectors is not None:
+                np.save(self.path / name, np.ascontiguousarray(vectors, dtype=self.dtype))
+
+            previous, retired = None, {}
+            if self.meta_path.exists():
+                with open(self.meta_path, encoding='utf-8') as handle:
+                    meta = json.load(handle)
+                previous, retired = meta.get('vectors'), meta.get('retired', {})
+            now = time.time()
+            if previous and previous != name:
+                retired[previous] = now
+            expired = [old for old, retired_at in retired.items() if now - retired_at >= self.retire_seconds]
+            for old in expired:
+                del retired[old]
+
+            tmp_path = self.path / f"{META_FILE}.{uuid.uuid4().hex[:12]}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump({
+                    'vectors': name,
+                    'dtype': self.dtype.name,
+                    'dim': dim,
+                    'ids': ids,
+                    'documents': documents,
+                    'metadatas': metadatas,
+                    'retired': retired,
+                }, handle, ensure_ascii=False)
+            os.replace(tmp_path, self.meta_path)
+
+            # Removing a file another worker still maps is safe: the mapping
+            # keeps it alive until that worker reloads. Files retired more
+            # recently may not have been loaded yet by a reader of the old sidecar
+            for old in expired:
+                try:
+                    os.remove(self.path / old)
+                except OSError:
+                    pass
+        self.snapshot()
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              include: Sequence[str] = ('documents', 'metadatas', 'distances'),
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        """Top n_results by cosine similarity, shaped like a chromadb query result"""
+        return self.snapshot().query(query_embeddings, n_results, where)
@@ -1,3 +1,15 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status, viewsets
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
@@ -9,14 +21,19 @@ import uuid
 from .models import ChatSession, ChatMessage, Destination, EcoTip, LocalArtisan
 from .serializers import (
     ChatSessionSerializer, ChatMessageSerializer, DestinationSerializer,
-    EcoTipSerializer, LocalArtisanSerializer, ChatRequestSerializer,
+    EcoTipSerializer, LocalArtisanSerializer, ChatRequestSerializer, BatchChatItemSerializer,
     ChatResponseSerializer, WeatherRequestSerializer, WeatherResponseSerializer,
     MeditationRequestSerializer, MeditationResponseSerializer
 )
 from .services import ChatbotService, WeatherService, MeditationService, SentimentAnalysisService
 from .services import SustainabilityService, OfflineService
-from .llm_service import personalization_service
+from .cache import response_cache
+from .persistence import chat_store, touch_sessions
+from .pagination import SessionCursorPagination, MessageCursorPagination
+from .profiles import profile_store
+from .llm_service import llm_service, personalization_service, READINESS_COLD, READINESS_READY
 from .voice_service import voice_service, multilingual_service
+from .translation import translation_service
 
 class ChatAPIView(APIView):
     """Main chat endpoint"""
@@ -34,30 +51,22 @@ class ChatAPIView(APIView):
             if not session_id:
                 session_id = str(uuid.uuid4())
             
-            session, created = ChatSession.objects.get_or_create(
-                session_id=session_id,
-                defaults={'session_id': session_id}
-            )
-            
             # Generate response
-            bot_response = ChatbotService.generate_response(
+            reply = ChatbotService.generate_reply(
                 user_message, user_context, user_id, role
             )
-            sentiment = SentimentAnalysisService.analyze_sentiment(user_message)
+            bot_response = reply['response']
+            sentiment = reply['sentiment']
             
             # Save message
-            chat_message = ChatMessage.objects.create(
-                session=session,
-                user_message=user_message,
-                bot_response=bot_response,
-                sentiment=sentiment
-            )
+            chat_message = chat_store.save_message(session_id, user_message, bot_response, sentiment)
             
             response_data = {
                 "response": bot_response,
                 "session_id": session_id,
                 "timestamp": chat_message.timestamp,
-                "sentiment": sentiment
+                "sentiment": sentiment,
+                "retrieval_path": reply.get('retrieval_path')
             }
             
             response_serializer = ChatResponseSerializer(response_data)
@@ -65,6 +74,210 @@ class ChatAPIView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChatAPIView(View):
+    """Async chat endpoint for ASGI deployments
+
+    Same contract as ChatAPIView. The session lookup runs concurrently with
+    response generation, blocking stages run in thread pools, and the
+    session and message rows are written through the async ORM (or queued
+    when write-behind is enabled).
+    """
+    
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = ChatRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        user_message = serializer.validated_data['message']
+        session_id = serializer.validated_data.get('session_id') or str(uuid.uuid4())
+        user_context = serializer.validated_data.get('context', {})
+        
+        if chat_store.write_behind:
+            reply = await ChatbotService.agenerate_reply(
+                user_message, user_context, data.get('user_id'), data.get('role')
+            )
+            chat_message = await sync_to_async(chat_store.save_message)(
+                session_id, user_message, reply['response'], reply['sentiment']
+            )
+        else:
+            (session, created), reply = await asyncio.gather(
+                ChatSession.objects.aget_or_create(
+                    session_id=session_id,
+                    defaults={'session_id': session_id}
+                ),
+                ChatbotService.agenerate_reply(
+                    user_message, user_context, data.get('user_id'), data.get('role')
+                )
+            )
+            
+            chat_message = await ChatMessage.objects.acreate(
+                session=session,
+                user_message=user_message,
+                bot_response=reply['response'],
+                sentiment=reply['sentiment']
+            )
+            if not created:
+                await sync_to_async(touch_sessions)([session.pk])
+        
+        response_serializer = ChatResponseSerializer({
+            "response": reply['response'],
+            "session_id": session_id,
+            "timestamp": chat_message.timestamp,
+            "sentiment": reply['sentiment'],
+            "retrieval_path": reply.get('retrieval_path')
+        })
+        return JsonResponse(response_serializer.data, status=status.HTTP_200_OK)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class StreamingChatView(View):
+    """Chat over server-sent events
+
+    Takes the ChatAPIView request as a JSON POST body, or as query
+    parameters on GET for EventSource clients. The first event is sent
+    before any work starts, so time to first byte does not depend on the
+    pipeline. Events:
+
+    - ``stage``: {"stage": name} as the pipeline progresses
+    - ``sentence``: {"text": sentence} for each sentence of the reply,
+      already translated
+    - ``done``: session id, timestamp, sentiment, role and language once
+      the message is saved
+
+    Under ASGI the stream is an async generator whose blocking stages run
+    in thread pools; Django would read a sync iterator to the end before
+    sending it. Under WSGI a sync generator is streamed by the server.
+    """
+    
+    async def get(self, request):
+        return self._stream(request, request.GET.dict())
+    
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._stream(request, data)
+    
+    def _stream(self, request, data):
+        serializer = ChatRequestSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        events = self._aevents if isinstance(request, ASGIRequest) else self._events
+        response = StreamingHttpResponse(
+            events(
+                serializer.validated_data['message'],
+                serializer.validated_data.get('session_id') or str(uuid.uuid4()),
+                serializer.validated_data.get('context', {}),
+                data.get('user_id'),
+                data.get('role')
+            ),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @staticmethod
+    async def _aevents(user_message, session_id, user_context, user_id, role):
+        async for event, data in ChatbotService.astream_reply(user_message, user_context, user_id, role):
+            if event == 'reply':
+                reply = data
+            else:
+                yield StreamingChatView._format_event(event, data)
+        
+        chat_message = await sync_to_async(chat_store.save_message)(
+            session_id, user_message, reply['response'], reply['sentiment']
+        )
+        yield StreamingChatView._format_done(session_id, chat_message, reply)
+    
+    @staticmethod
+    def _events(user_message, session_id, user_context, user_id, role):
+        for event, data in ChatbotService.stream_reply(user_message, user_context, user_id, role):
+            if event == 'reply':
+                reply = data
+            else:
+                yield StreamingChatView._format_event(event, data)
+        
+        chat_message = chat_store.save_message(session_id, user_message, reply['response'], reply['sentiment'])
+        yield StreamingChatView._format_done(session_id, chat_message, reply)
+    
+    @staticmethod
+    def _format_event(event, data):
+        return StreamingChatView._format(event, {"stage": data} if event == 'stage' else {"text": data})
+    
+    @staticmethod
+    def _format_done(session_id, chat_message, reply):
+        return StreamingChatView._format('done', {
+            "session_id": session_id,
+            "timestamp": chat_message.timestamp,
+            "sentiment": reply['sentiment'],
+            "role": reply['role'],
+            "detected_language": reply['detected_language'],
+            "cached": reply['cached'],
+            "retrieval_path": reply.get('retrieval_path'),
+            "recommendations": reply.get('recommendations', []),
+        })
+    
+    @staticmethod
+    def _format(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+
+class BatchChatAPIView(APIView):
+    """Many chat messages in one request, e.g. queued questions from kiosk or SMS gateways
+
+    Results are returned in the order of the messages.
+    """
+    
+    MAX_MESSAGES = 100
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        items = request.data.get('messages')
+        if not isinstance(items, list) or not items:
+            return Response({"error": "messages must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.MAX_MESSAGES:
+            return Response({"error": f"At most {self.MAX_MESSAGES} messages per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = BatchChatItemSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({"messages": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        requests = serializer.validated_data
+        for item in requests:
+            item['session_id'] = item.get('session_id') or str(uuid.uuid4())
+        
+        replies = ChatbotService.generate_replies(requests)
+        chat_messages = chat_store.save_messages([
+            (item['session_id'], item['message'], reply['response'], reply['sentiment'])
+            for item, reply in zip(requests, replies)
+        ])
+        
+        response_serializer = ChatResponseSerializer([
+            {
+                "response": reply['response'],
+                "session_id": item['session_id'],
+                "timestamp": chat_message.timestamp,
+                "sentiment": reply['sentiment'],
+                "retrieval_path": reply.get('retrieval_path')
+            }
+            for item, reply, chat_message in zip(requests, replies, chat_messages)
+        ], many=True)
+        return Response({"results": response_serializer.data}, status=status.HTTP_200_OK)
+
 class VoiceChatAPIView(APIView):
     """Voice chat endpoint"""
     
@@ -134,6 +347,30 @@ class PersonalizationAPIView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class BulkRecommendationsAPIView(APIView):
+    """Recommendations for many users in one request, e.g. for push notification jobs"""
+    
+    MAX_USERS = 1000
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+        user_ids = request.data.get('user_ids')
+        category = request.data.get('category', 'activities')
+        
+        if not isinstance(user_ids, list) or not user_ids:
+            return Response({"error": "user_ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > self.MAX_USERS:
+            return Response({"error": f"At most {self.MAX_USERS} user_ids per request"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        return Response({
+            "category": category,
+            "recommendations": personalization_service.get_bulk_recommendations(user_ids, category),
+            "timestamp": datetime.now().isoformat()
+        }, status=status.HTTP_200_OK)
+
 class SustainabilityAPIView(APIView):
     """Sustainability and eco-tourism endpoint"""
     
@@ -162,14 +399,51 @@ class SustainabilityAPIView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def accepts_encoding(accept_encoding, coding):
+    """Whether an Accept-Encoding header allows the content coding, honouring q=0"""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    quality = qualities.get(coding, qualities.get('*', 0.0))
+    return quality > 0
+
+
 class OfflineAPIView(APIView):
     """Offline functionality endpoint"""
     
     def get(self, request):
         try:
-            # Return cached essential data
-            cached_data = OfflineService.cache_essential_data()
-            return Response(cached_data, status=status.HTTP_200_OK)
+            # Serve the precomputed bundle; clients revalidate with If-None-Match.
+            # The gzip and identity bodies differ byte for byte, so each has its own ETag
+            bundle = OfflineService.get_offline_bundle()
+            gzipped = accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'gzip')
+            etag = f'"{bundle["version"]}-gzip"' if gzipped else f'"{bundle["version"]}"'
+            
+            if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                response = HttpResponseNotModified()
+            elif gzipped:
+                response = HttpResponse(bundle["gzip"], content_type='application/json; charset=utf-8')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(bundle["json"], content_type='application/json; charset=utf-8')
+            
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            patch_vary_headers(response, ['Accept-Encoding'])
+            return response
             
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -220,6 +494,23 @@ class MultilingualAPIView(APIView):
                     "target_language": target_lang
                 }, status=status.HTTP_200_OK)
             
+            elif action == 'translate_batch':
+                texts = request.data.get('texts')
+                source_lang = request.data.get('source_lang', 'auto')
+                target_lang = request.data.get('target_lang', 'en')
+                
+                if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                    return Response({"error": "texts must be a list of strings"}, status=status.HTTP_400_BAD_REQUEST)
+                
+                translated = multilingual_service.translate_batch(texts, source_lang, target_lang)
+                
+                return Response({
+                    "original_texts": texts,
+                    "translated_texts": translated,
+                    "source_language": source_lang,
+                    "target_language": target_lang
+                }, status=status.HTTP_200_OK)
+            
             elif action == 'greeting':
                 language = request.data.get('language', 'en')
                 greeting = multilingual_service.get_localized_greeting(language)
@@ -302,14 +593,16 @@ class ChatSessionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ChatSession.objects.all()
     serializer_class = ChatSessionSerializer
     lookup_field = 'session_id'
+    pagination_class = SessionCursorPagination
     
     @action(detail=True, methods=['get'])
     def messages(self, request, session_id=None):
-        """Get all messages for a session"""
+        """Get the messages of a session, newest first, one cursor page at a time"""
         session = get_object_or_404(ChatSession, session_id=session_id)
-        messages = session.messages.all()
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(session.messages.all(), request, view=self)
+        serializer = ChatMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
 def health_check(request):
@@ -317,6 +610,44 @@ def health_check(request):
     return Response({
         "status": "healthy",
         "service": "YatraSaarthi Django API",
+        "readiness": llm_service.readiness,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@api_view(['GET'])
+def readiness_check(request):
+    """Readiness probe: 503 until the LLM service has loaded, and while a failed load is retried
+
+    A cold worker starts loading on the first probe, since a load balancer
+    gating on this endpoint sends no chat request that would load it. A
+    degraded worker only has the rule-based fallback, so it is kept out of
+    rotation; each probe retries the load once its backoff has elapsed.
+    """
+    if llm_service.readiness == READINESS_COLD:
+        llm_service.start_warmup()
+    else:
+        llm_service.retry_degraded_load()
+    readiness = llm_service.readiness
+    return Response({
+        "readiness": readiness,
+        "load_seconds": llm_service.load_seconds,
+        "load_failures": llm_service.load_failures,
+        "error": llm_service.readiness_error,
+        "timestamp": datetime.now().isoformat()
+    }, status=status.HTTP_200_OK if readiness == READINESS_READY else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@api_view(['GET'])
+def metrics(request):
+    """Cache and pipeline counters for this worker process"""
+    return Response({
+        "readiness": llm_service.readiness,
+        "query_embedding_cache": llm_service.query_embedding_cache.stats(),
+        "retrieval": llm_service.retrieval_stats(),
+        "response_cache": response_cache.stats(),
+        "translation": translation_service.stats(),
+        "weather": WeatherService.get_stats(),
+        "chat_persistence": chat_store.stats(),
+        "profiles": profile_store.stats(),
         "timestamp": datetime.now().isoformat()
     })
 
@@ -329,9 +660,13 @@ def api_info(request):
         "description": "Advanced multilingual AI chatbot with LLM, RAG, and voice support for spiritual and eco-tourism in India",
         "endpoints": {
             "chat": "/api/chat/",
+            "chat_async": "/api/chat/async/",
+            "chat_batch": "/api/chat/batch/",
+            "chat_stream": "/api/chat/stream/",
             "voice_chat": "/api/voice-chat/",
             "role_switch": "/api/role-switch/",
             "personalization": "/api/personalization/",
+            "personalization_bulk": "/api/personalization/bulk/",
             "sustainability": "/api/sustainability/",
             "offline": "/api/offline/",
             "multilingual": "/api/multilingual/",
@@ -342,5 +677,7 @@ def api_info(request):
             "artisans": "/api/artisans/",
             "sessions": "/api/sessions/",
             "health": "/api/health/",
+            "readiness": "/api/health/ready/",
+            "metrics": "/api/metrics/",
         }
     })
\ No newline at end of file
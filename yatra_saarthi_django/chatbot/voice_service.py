@@ -1,13 +1,16 @@
 import os
 import json
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import speech_recognition as sr
 import pyttsx3
 from googletrans import Translator
 import threading
 import queue
 
+from .language_detection import language_detector
+from .translation import translation_service
+
 logger = logging.getLogger(__name__)
 
 class VoiceService:
@@ -188,7 +191,6 @@ class MultilingualService:
     """Handle multilingual support and translation"""
     
     def __init__(self):
-        self.translator = Translator()
         self.supported_languages = {
             'en': 'English',
             'hi': 'Hindi',
@@ -220,23 +222,29 @@ class MultilingualService:
     
     def detect_language(self, text: str) -> str:
         """Detect language of input text"""
-        try:
-            detected = self.translator.detect(text)
-            return detected.lang if detected.lang in self.supported_languages else 'en'
-        except:
-            return 'en'
+        detected = language_detector.detect(text)
+        return detected if detected in self.supported_languages else 'en'
     
     def translate_text(self, text: str, source_lang: str, target_lang: str) -> str:
         """Translate text between languages"""
-        try:
-            if source_lang == target_lang:
-                return text
-            
-            result = self.translator.translate(text, src=source_lang, dest=target_lang)
-            return result.text
-        except Exception as e:
-            logger.error(f"Translation error: {e}")
-            return text
+        return translation_service.translate(text, target_lang, source_lang)
+    
+    def translate_batch(self, texts: List[str], source_lang: str, target_lang: str) -> List[str]:
+        """Translate many texts, one upstream request per source language"""
+        if source_lang != 'auto':
+            return translation_service.translate_batch(texts, target_lang, source_lang)
+        
+        # Group by detected language so each upstream request has a single source
+        positions_by_lang = {}
+        for position, text in enumerate(texts):
+            positions_by_lang.setdefault(self.detect_language(text), []).append(position)
+        
+        results = list(texts)
+        for lang, positions in positions_by_lang.items():
+            translated = translation_service.translate_batch([texts[p] for p in positions], target_lang, lang)
+            for position, text in zip(positions, translated):
+                results[position] = text
+        return results
     
     def get_localized_greeting(self, language: str) -> str:
         """Get greeting in specified language"""
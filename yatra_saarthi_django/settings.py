@@ -71,18 +71,50 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatra_saarthi_django.wsgi.application'
+ASGI_APPLICATION = 'yatra_saarthi_django.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# WAL lets readers run alongside the single writer; busy_timeout makes a
+# writer wait for the lock instead of failing with "database is locked"
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA mmap_size=134217728'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            # Take the write lock when a transaction starts, not halfway through it
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Read-only connection to the same file for reference data (see chatbot.db_routers)
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND + ';PRAGMA query_only=ON',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['chatbot.db_routers.ReadOnlyDataRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,3 +178,101 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+
+# LLM service settings
+# Load the embedding model and knowledge base in a background thread when a
+# server process starts, instead of on the first chat request. Server
+# processes are runserver, gunicorn, uvicorn, daphne, hypercorn and uwsgi,
+# or any process started with YATRA_SERVING=1 in its environment.
+LLM_WARMUP_ON_STARTUP = True
+# A failed load leaves the service degraded (rule-based replies only); the
+# readiness probe retries it after LLM_RETRY_BACKOFF seconds, doubling per
+# consecutive failure up to LLM_RETRY_BACKOFF_MAX
+LLM_RETRY_BACKOFF = 30
+LLM_RETRY_BACKOFF_MAX = 600
+
+# Directory of the persistent vector store backing the RAG knowledge base
+KNOWLEDGE_BASE_DIR = BASE_DIR / 'knowledge_base'
+
+# In-process LRU cache of query embeddings used by RAG retrieval
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+QUERY_EMBEDDING_CACHE_TTL = 3600  # seconds
+
+# Shared by all worker processes on this host; chat responses, translations
+# and the knowledge base version live here. Use Redis for multi-host setups.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+# Seconds a deterministic chat response is reused for identical questions
+RESPONSE_CACHE_TIMEOUT = 600
+
+# Threads available to async chat requests for CPU-bound embedding
+EMBEDDING_THREADS = 2
+
+# Weather cache: entries are fresh for WEATHER_CACHE_TTL seconds, then served
+# stale for up to WEATHER_STALE_TTL more while one background refresh runs
+WEATHER_CACHE_TTL = 600
+WEATHER_STALE_TTL = 3600
+WEATHER_POOL_SIZE = 10
+
+# Seconds between checks for offline data changes by the offline search index
+OFFLINE_INDEX_CHECK_INTERVAL = 5
+# Seconds a built offline bundle is kept; a data change moves to a new key at once
+OFFLINE_BUNDLE_TIMEOUT = 24 * 3600
+
+# Write-behind chat persistence: messages are queued in-process and written
+# with bulk_create in batches; queued rows are lost if the process is killed
+CHAT_WRITE_BEHIND = False
+CHAT_SESSION_CACHE_SIZE = 10000
+WRITE_BEHIND_QUEUE_SIZE = 10000
+WRITE_BEHIND_BATCH_SIZE = 200
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0
+
+# User profiles: shared cache entries, plus a bounded per-process LRU whose
+# entries may lag an update made by another worker by up to the local TTL
+PROFILE_CACHE_TIMEOUT = 24 * 3600
+PROFILE_LOCAL_CACHE_SIZE = 10000
+PROFILE_LOCAL_CACHE_TTL = 30
+
+# Interest counters folded from the interaction log lose half their weight
+# every INTEREST_HALF_LIFE_DAYS
+INTEREST_HALF_LIFE_DAYS = 30
+
+# Minimum cosine similarity between a query and a role or sentiment centroid
+# for the embedding-based prediction to be used
+QUERY_CLASSIFIER_MIN_SIMILARITY = 0.3
+
+# Vector store for retrieval: 'chroma', 'numpy' for the memory-mapped exact
+# index under VECTOR_INDEX_DIR ('float16' halves its size but is slower to
+# query), or 'ann' for the IVF index built offline by build_ann_index into
+# ANN_INDEX_DIR, with live changes kept in the exact index
+VECTOR_BACKEND = 'chroma'
+VECTOR_INDEX_DIR = KNOWLEDGE_BASE_DIR / 'numpy_index'
+VECTOR_INDEX_DTYPE = 'float32'
+# Seconds a replaced vectors file is kept for workers still loading it
+VECTOR_FILE_RETIRE_SECONDS = 300
+ANN_INDEX_DIR = KNOWLEDGE_BASE_DIR / 'ann_index'
+# Inverted lists scanned per query: higher is more accurate and slower
+ANN_NPROBE = 16
+# Candidates per result re-scored against the index's float16 vectors; 1 uses
+# the int8 scores alone
+ANN_REFINE = 4
+
+# Hybrid retrieval: BM25 hits fused with vector results by reciprocal rank
+# (RRF_K damps the weight of top ranks). A best BM25 hit scoring at least
+# LEXICAL_FAST_PATH_MIN_SCORE and LEXICAL_FAST_PATH_MARGIN times the next
+# one is served without embedding the query
+LEXICAL_CANDIDATES = 10
+LEXICAL_FAST_PATH_MIN_SCORE = 2.5
+LEXICAL_FAST_PATH_MARGIN = 1.5
+RRF_K = 60
+# Seconds between knowledge base version checks by the BM25 index
+LEXICAL_INDEX_CHECK_INTERVAL = 5